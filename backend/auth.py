@@ -1,24 +1,50 @@
 from fastapi import HTTPException, Depends, status
 from fastapi.security import OAuth2PasswordBearer
-from passlib.context import CryptContext
-from jose import JWTError, jwt
 from datetime import datetime, timedelta
-import boto3
 import os
+import time
 import logging
 
-logger = logging.getLogger(__name__)
+from backend.services.user_store import get_user_repository
+from backend.services.password_hasher import get_password_hasher, HasherOverloaded
+from backend.services import metrics
 
-# DynamoDB setup
-dynamodb = boto3.resource("dynamodb", region_name="ap-east-1")
-user_table = dynamodb.Table("user_passwords")
+logger = logging.getLogger(__name__)
 
 # Password hashing and JWT configuration
-pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
+# passlib 和 jose(会加载 cryptography)导入较慢，第一次用到时才导入，启动后由 main 在后台线程预热
+_pwd_context = None
 SECRET_KEY = os.getenv("JWT_SECRET", "your_secret_key")
 ALGORITHM = "HS256"
 ACCESS_TOKEN_EXPIRE_MINUTES = 30
 
+# get_current_user 的用户记录缓存，避免每个 HTTP 请求都查一次用户库
+USER_CACHE_TTL = float(os.getenv("USER_CACHE_TTL", "60"))
+USER_CACHE_MAX = 10000
+_user_cache = {}  # username -> (expires_at, user)
+_cache_hits = metrics.auth_cache_total.labels("hit")
+_cache_misses = metrics.auth_cache_total.labels("miss")
+
+class TokenError(Exception):
+    """token 无法解码或校验失败"""
+
+
+def get_pwd_context():
+    global _pwd_context
+    if _pwd_context is None:
+        from passlib.context import CryptContext
+        _pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
+    return _pwd_context
+
+
+def decode_token(token: str) -> dict:
+    """校验并解码 JWT，失败时抛 TokenError"""
+    from jose import JWTError, jwt
+    try:
+        return jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
+    except JWTError as e:
+        raise TokenError(str(e)) from e
+
 # OAuth2 for token-based authentication
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="/api/v1/login")
 
@@ -29,12 +55,12 @@ async def get_current_user(token: str = Depends(oauth2_scheme)):
         headers={"WWW-Authenticate": "Bearer"},
     )
     try:
-        payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
+        payload = decode_token(token)
         username: str = payload.get("sub")
         if username is None:
             logger.error("Username not found in token payload")
             raise credentials_exception
-    except JWTError as e:
+    except TokenError as e:
         logger.error(f"JWT decode error: {str(e)}")
         raise credentials_exception
 
@@ -44,23 +70,54 @@ async def get_current_user(token: str = Depends(oauth2_scheme)):
     if username == "test2":
         return {"username": "test2", "email": "test2@example.com"}
 
-    # Check in DynamoDB
-    response = user_table.get_item(Key={"username": username})
-    user = response.get("Item")
+    now = time.monotonic()
+    cached = _user_cache.get(username)
+    if cached and cached[0] > now:
+        _cache_hits.inc()
+        return cached[1]
+    _cache_misses.inc()
+
+    # Check in user store
+    user = await get_user_repository().get_user(username)
     if not user:
-        logger.error(f"User {username} not found in DynamoDB")
+        logger.error(f"User {username} not found in user store")
         raise credentials_exception
+    if len(_user_cache) >= USER_CACHE_MAX:
+        _user_cache.clear()
+    _user_cache[username] = (now + USER_CACHE_TTL, user)
     logger.info(f"User {username} authenticated successfully")
     return user
 
 def verify_password(plain_password, hashed_password):
-    return pwd_context.verify(plain_password, hashed_password)
+    return get_pwd_context().verify(plain_password, hashed_password)
 
 def get_password_hash(password):
-    return pwd_context.hash(password)
+    return get_pwd_context().hash(password)
+
+def _hasher_busy():
+    return HTTPException(
+        status_code=status.HTTP_429_TOO_MANY_REQUESTS,
+        detail="Server is busy, please retry shortly",
+        headers={"Retry-After": "1"},
+    )
+
+async def verify_password_async(plain_password, hashed_password):
+    """在 bcrypt 线程池中校验密码，队列满时返回 429"""
+    try:
+        return await get_password_hasher().verify(plain_password, hashed_password)
+    except HasherOverloaded:
+        raise _hasher_busy()
+
+async def get_password_hash_async(password):
+    """在 bcrypt 线程池中计算密码哈希，队列满时返回 429"""
+    try:
+        return await get_password_hasher().hash(password)
+    except HasherOverloaded:
+        raise _hasher_busy()
 
 def create_access_token(data: dict, expires_delta: timedelta = None):
     to_encode = data.copy()
     expire = datetime.utcnow() + (expires_delta or timedelta(minutes=ACCESS_TOKEN_EXPIRE_MINUTES))
     to_encode.update({"exp": expire})
+    from jose import jwt
     return jwt.encode(to_encode, SECRET_KEY, algorithm=ALGORITHM)
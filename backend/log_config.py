@@ -0,0 +1,148 @@
+# backend/log_config.py
+
+import atexit
+import json
+import logging
+import logging.handlers
+import os
+import queue
+import threading
+import time
+
+# 全局默认级别
+LOG_LEVEL = os.getenv("LOG_LEVEL", "INFO")
+# 按子系统覆盖级别，例如 "backend.services.go_game=DEBUG,backend.main=WARNING"
+LOG_LEVELS = os.getenv("LOG_LEVELS", "")
+# 输出格式: text(key=value) 或 json(每行一个对象)
+LOG_FORMAT = os.getenv("LOG_FORMAT", "text")
+# 每步棋这类高频事件，每 N 次只记录 1 次
+LOG_SAMPLE_EVERY = int(os.getenv("LOG_SAMPLE_EVERY", "50"))
+
+DEFAULT_LEVELS = {
+    "engineio.server": "WARNING",
+    "socketio.server": "WARNING",
+}
+
+# LogRecord 自带的属性，剩下的都是 extra={...} 传进来的结构化字段
+_RESERVED = set(vars(logging.LogRecord("", 0, "", 0, "", (), None))) | {"message", "asctime"}
+
+_listener = None
+_setup_lock = threading.Lock()
+
+
+def _extra_fields(record: logging.LogRecord) -> dict:
+    return {k: v for k, v in record.__dict__.items() if k not in _RESERVED}
+
+
+class StructuredFormatter(logging.Formatter):
+    """
+    text: `时间 级别 logger - 消息 key=value ...`
+    json: {"ts", "level", "logger", "msg", ...extra}
+    """
+
+    def __init__(self, fmt: str = "text"):
+        super().__init__()
+        self.fmt = fmt
+
+    def format(self, record: logging.LogRecord) -> str:
+        message = record.getMessage()
+        fields = _extra_fields(record)
+        if self.fmt == "json":
+            data = {
+                "ts": round(record.created, 3),
+                "level": record.levelname,
+                "logger": record.name,
+                "msg": message,
+            }
+            data.update(fields)
+            if record.exc_info:
+                data["exc"] = self.formatException(record.exc_info)
+            return json.dumps(data, default=str, ensure_ascii=False)
+
+        ts = time.strftime("%Y-%m-%d %H:%M:%S", time.localtime(record.created))
+        line = f"{ts},{int(record.msecs):03d} - {record.name} - {record.levelname} - {message}"
+        if fields:
+            line += " " + " ".join(f"{k}={v}" for k, v in fields.items())
+        if record.exc_info:
+            line += "\n" + self.formatException(record.exc_info)
+        return line
+
+
+def _parse_levels(spec: str) -> dict:
+    levels = {}
+    for item in spec.split(","):
+        item = item.strip()
+        if not item or "=" not in item:
+            continue
+        name, level = item.split("=", 1)
+        levels[name.strip()] = level.strip().upper()
+    return levels
+
+
+def setup_logging(level: str = None, levels: str = None, fmt: str = None, start: bool = True):
+    """
+    配置根日志:
+      - 根 logger 只挂一个 QueueHandler，写文件/终端在后台线程 QueueListener 里完成，
+        热路径上的 logger.xxx() 只做级别判断和入队
+      - DEFAULT_LEVELS + LOG_LEVELS 设置各子系统级别
+    start=False 时只挂 QueueHandler，不启动后台线程(导入 backend.main 时用)；
+    之前的日志留在队列里，start_logging() 启动后依次输出。重复调用是安全的。
+    """
+    global _listener
+    with _setup_lock:
+        root = logging.getLogger()
+        root.setLevel((level or LOG_LEVEL).upper())
+
+        all_levels = dict(DEFAULT_LEVELS)
+        all_levels.update(_parse_levels(LOG_LEVELS if levels is None else levels))
+        for name, lvl in all_levels.items():
+            logging.getLogger(name).setLevel(lvl)
+
+        if _listener is None:
+            stream_handler = logging.StreamHandler()
+            stream_handler.setFormatter(StructuredFormatter(fmt or LOG_FORMAT))
+
+            log_queue = queue.SimpleQueue()
+            for handler in list(root.handlers):
+                root.removeHandler(handler)
+            root.addHandler(logging.handlers.QueueHandler(log_queue))
+            _listener = logging.handlers.QueueListener(log_queue, stream_handler, respect_handler_level=True)
+
+    if start:
+        start_logging()
+
+
+def start_logging():
+    """启动 QueueListener 后台线程(服务启动事件里调用)；已启动时什么都不做"""
+    with _setup_lock:
+        if _listener is None or _listener._thread is not None:
+            return
+        _listener.start()
+        atexit.register(_listener.stop)
+
+
+class Sampler:
+    """
+    按 key 计数的采样器：每个 key 每 every 次返回一次 True。
+    用于每步棋、每次广播这类高频日志，配合 logger.isEnabledFor() 使用。
+    """
+
+    def __init__(self, every: int = LOG_SAMPLE_EVERY):
+        self.every = max(1, every)
+        self._counts = {}
+
+    def __call__(self, key: str) -> bool:
+        n = self._counts.get(key, 0)
+        self._counts[key] = n + 1
+        return n % self.every == 0
+
+
+sample = Sampler()
+
+
+def board_to_text(board) -> str:
+    """把棋盘渲染成文本，仅在 DEBUG 日志里使用"""
+    return "\n".join(
+        " ".join("B" if cell == "black" else "W" if cell == "white" else "." for cell in row)
+        for row in board
+    )
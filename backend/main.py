@@ -1,30 +1,45 @@
 # backend/main.py
 
-from fastapi import FastAPI, Depends, HTTPException
+from fastapi import FastAPI, Depends, HTTPException, Response
 from fastapi.middleware.cors import CORSMiddleware
 from pydantic import BaseModel
 from uuid import uuid4
 import logging
+import os
+import threading
+import time
 import socketio
-from jose import JWTError, jwt
-
-from backend.auth import SECRET_KEY, ALGORITHM, get_password_hash, verify_password, create_access_token, user_table, get_current_user
-from backend.services.match_service import get_matches
-from routers.matches import router as matches_router
-from routers.rooms import router as rooms_router, broadcast_update
 
+from backend.models import RoomEvent, MatchEvent, JoinGameEvent, MoveEvent, ResignEvent, StatusEvent
+from backend.auth import decode_token, TokenError, get_password_hash_async, verify_password_async, create_access_token, get_current_user
+from backend.services.user_store import get_user_repository
+from backend.services.password_hasher import get_password_hasher, close_password_hasher
+from backend.services import metrics
+from backend.services import game_snapshot
+from backend.services.replay_log import publish_game_update, stamped_snapshot, resync_message
+from backend.services.match_service import start_cleanup_thread, matches
+from backend.routers.matches import router as matches_router
+from backend.routers.rooms import router as rooms_router, broadcast_update, send_lobby_snapshot, send_room_snapshot, on_matches_finished, on_rooms_reaped, rooms
+from backend.routers.matchmaking import router as matchmaking_router
+from backend.services.rate_limiter import get_rate_limiter
+from backend.services.socket_dispatch import init_socket_dispatcher, SocketRequest
+from backend.services.compute_pool import get_compute_pool
+from backend.services.position_cache import load_position_cache, save_position_cache
+from backend.services.finalization import get_finalization_pipeline, archive_games
+from backend.services.ratings import rate_games, load_ratings, save_ratings
+from backend.services.matchmaking import init_matchmaker, create_paired_match
+from backend.services.bot_player import init_bot_manager, BOT_PREFIX
+from backend.services.room_reaper import init_room_reaper
+from backend.services.hibernation import init_hibernator
+
+from backend.log_config import setup_logging, start_logging, sample
+
+# 导入时只挂 QueueHandler，输出线程在 startup_event 里启动
+setup_logging(start=False)
 logger = logging.getLogger(__name__)
-logging.basicConfig(level=logging.INFO)
-logger.setLevel(logging.INFO)
-logging.getLogger('engineio.server').setLevel(logging.WARNING)
-logging.getLogger('socketio.server').setLevel(logging.WARNING)
-
-#######################
-# 初始化 match service
-#######################
-logger.info("Initializing match service")
-matches = get_matches()
-logger.info(f"Initial matches state: {list(matches.keys())}")
+
+# 启动后在后台线程预先导入请求路径上的重模块(jose/passlib/numpy/sgfmill)，设为 0 则完全按需导入
+WARM_IMPORTS = os.getenv("WARM_IMPORTS", "1") != "0"
 
 ############
 # 创建FastAPI
@@ -42,38 +57,92 @@ sio = socketio.AsyncServer(
     ping_timeout=20,
     ping_interval=25,
     max_http_buffer_size=1e6,
-    transports=['websocket']
+    transports=['websocket'],
+    json=game_snapshot,  # 支持直接发送已编码的 game_update 快照
 )
-application = socketio.ASGIApp(sio, app)
 
 ###################################################
 # 由websocket_manager.py提供的初始化函数
 ###################################################
 from backend.services.websocket_manager import init_room_manager, init_game_manager
+from backend.services.spectator_hub import init_spectator_hub
 
 # 初始化全局的 room_manager 和 game_manager
 room_manager = init_room_manager(sio)
 game_manager = init_game_manager(sio)
+spectator_hub = init_spectator_hub(sio)
+rate_limiter = get_rate_limiter()
+dispatcher = init_socket_dispatcher(sio)
+
+async def broadcast_bot_move(match_id, game):
+    await game_manager.send_message(match_id, publish_game_update(match_id, game))
+    spectator_hub.notify(match_id, game)
+
+bot_manager = init_bot_manager(broadcast_bot_move)
+
+async def on_matchmaking_paired(a, b):
+    """匹配成功：创建对局，记录结果并推送给双方的所有连接"""
+    resp = create_paired_match(a, b)
+    match_id = resp["match_id"]
+    for me, opponent in ((a, b), (b, a)):
+        color = "black" if resp["black_player"] == me.username else "white"
+        result = {"match_id": match_id, "color": color, "opponent": opponent.username}
+        matchmaker.record_result(me.username, result)
+        await sio.emit("match_found", result, room=f"user_{me.username}")
+    logger.info(f"[matchmaking] paired {a.username} vs {b.username} -> {match_id}")
+
+matchmaker = init_matchmaker(on_matchmaking_paired)
+room_reaper = init_room_reaper(rooms, on_rooms_reaped)
+hibernator = init_hibernator(matches)
+
+# 终局流水线：观战推送 -> 等级分 -> 对局存档 -> 房间状态与大厅通知
+finalization_pipeline = get_finalization_pipeline()
+finalization_pipeline.add_stage("spectators", spectator_hub.on_games_finished)
+finalization_pipeline.add_stage("ratings", rate_games)
+finalization_pipeline.add_stage("archive", archive_games)
+finalization_pipeline.add_stage("rooms", on_matches_finished)
 
 ########################################
-# 设置启动事件，清空room_manager数据
+# 启动/关闭事件：线程、后台任务、缓存加载都放在这里，导入模块时不做
 ########################################
-@app.on_event("startup")
+def _warm_imports():
+    started = time.perf_counter()
+    try:
+        import jose.jwt
+        import sgfmill.sgf
+        import backend.services.mcts
+        from backend.auth import get_pwd_context
+        get_pwd_context()
+    except Exception as e:
+        logger.error(f"Failed to warm up imports: {e}")
+        return
+    logger.info(f"Warmed up heavy imports in {(time.perf_counter() - started) * 1000:.0f} ms")
+
 async def startup_event():
+    started = time.perf_counter()
+    start_logging()
+    start_cleanup_thread()
     room_manager.clear_rooms()
     logger.info("Cleared all rooms on server startup")
-
-########################################
-# 加CORS中间件
-########################################
-app.add_middleware(
-    CORSMiddleware,
-    allow_origins=["*"],  # 允许所有域
-    allow_credentials=True,
-    allow_methods=["*"],
-    allow_headers=["*"],
-    expose_headers=["*"]
-)
+    spectator_hub.start()
+    game_manager.outbound.start()
+    load_position_cache()
+    load_ratings()
+    finalization_pipeline.start()
+    matchmaker.start()
+    room_reaper.start()
+    hibernator.start()
+    if WARM_IMPORTS:
+        threading.Thread(target=_warm_imports, name="warm-imports", daemon=True).start()
+    logger.info(f"Startup finished in {(time.perf_counter() - started) * 1000:.0f} ms")
+
+async def shutdown_event():
+    await finalization_pipeline.stop()
+    save_ratings()
+    get_user_repository().close()
+    close_password_hasher()
+    get_compute_pool().close()
+    save_position_cache()
 
 ##############
 # 简单测试接口
@@ -82,11 +151,10 @@ app.add_middleware(
 async def test():
     return {"message": "Test endpoint working"}
 
-###################################
-# 包含 rooms路由、matches路由
-###################################
-app.include_router(matches_router, prefix="/api/v1")
-app.include_router(rooms_router, prefix="/api/v1")
+@app.get("/metrics")
+async def metrics_endpoint():
+    """Prometheus 文本格式的进程内指标"""
+    return Response(content=metrics.registry.render(), media_type=metrics.CONTENT_TYPE)
 
 ##############################
 # 用户注册/登录的模型与接口
@@ -106,17 +174,21 @@ class Token(BaseModel):
 
 @app.post("/api/v1/register", response_model=Token)
 async def register(user: UserCreate):
-    response = user_table.get_item(Key={"username": user.username})
-    if "Item" in response:
+    if user.username.startswith(BOT_PREFIX):
+        raise HTTPException(status_code=400, detail="Username is reserved")
+    user_repo = get_user_repository()
+    if await user_repo.get_user(user.username):
         raise HTTPException(status_code=400, detail="Username already registered")
-    hashed_password = get_password_hash(user.password)
-    user_table.put_item(
-        Item={
+    hashed_password = await get_password_hash_async(user.password)
+    created = await user_repo.create_user(
+        {
             "username": user.username,
             "email": user.email,
             "password": hashed_password,
         }
     )
+    if not created:
+        raise HTTPException(status_code=400, detail="Username already registered")
     access_token = create_access_token(data={"sub": user.username})
     return {"access_token": access_token, "token_type": "bearer"}
 
@@ -126,14 +198,18 @@ async def login(user: UserLogin):
         access_token = create_access_token(data={"sub": "test"})
         return {"access_token": access_token, "token_type": "bearer"}
 
-    response = user_table.get_item(Key={"username": user.username})
-    db_user = response.get("Item")
-    if not db_user or not verify_password(user.password, db_user["password"]):
+    db_user = await get_user_repository().get_user(user.username)
+    if not db_user or not await verify_password_async(user.password, db_user["password"]):
         raise HTTPException(status_code=401, detail="Incorrect username or password")
 
     access_token = create_access_token(data={"sub": user.username})
     return {"access_token": access_token, "token_type": "bearer"}
 
+@app.get("/api/v1/auth/stats")
+async def auth_stats(current_user: dict = Depends(get_current_user)):
+    """bcrypt 线程池的排队/耗时统计(需要登录)"""
+    return get_password_hasher().stats()
+
 @app.get("/api/v1/users/me")
 async def read_users_me(current_user: dict = Depends(get_current_user)):
     return {"username": current_user["username"], "email": current_user["email"]}
@@ -151,15 +227,21 @@ async def connect(sid, environ, auth):
         if not token:
             logger.error("No token provided in auth")
             return False
-        payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
+        payload = decode_token(token)
         username = payload.get("sub")
         if not username:
             logger.error("No username in token payload")
             return False
         await sio.save_session(sid, {'username': username})
+        dispatcher.open_session(sid, username)
+        rate_limiter.register(sid, username)
+        # 每个用户一个 Socket.IO 房间，用于推送 match_found 等面向用户的通知
+        await sio.enter_room(sid, f"user_{username}")
+        room_reaper.user_online(username)
+        metrics.connected_sids.inc()
         logger.info(f"User {username} connected with auth token")
         return True
-    except JWTError as e:
+    except TokenError as e:
         logger.error(f"JWT validation failed: {str(e)}")
         return False
     except Exception as e:
@@ -168,7 +250,9 @@ async def connect(sid, environ, auth):
 
 @sio.event
 async def disconnect(sid, environ=None):
-    username = room_manager.get_username_by_sid(sid) or game_manager.get_username_by_sid(sid) or 'unknown'
+    session = dispatcher.close_session(sid)
+    username = session.username if session else 'unknown'
+    metrics.connected_sids.dec()
     logger.info(f"User {username} disconnected")
     # 断开所有room
     for rid in list(room_manager.active_connections.keys()):
@@ -176,13 +260,19 @@ async def disconnect(sid, environ=None):
     # 断开所有match
     for mid in list(game_manager.active_connections.keys()):
         game_manager.disconnect(mid, sid)
-
-@sio.event
-async def join_lobby(sid, data, auth=None):
+    await spectator_hub.unwatch(sid)
+    game_manager.outbound.drop(sid)
+    if session:
+        # 最后一个连接断开后，这个人所在的等待房间改按 ROOM_TTL_ABANDONED 回收
+        if room_reaper.user_offline(username):
+            # 同时退出匹配队列，避免给离线的人配对；还有其他标签页/设备在线时保留排队
+            matchmaker.leave(username)
+    rate_limiter.forget(sid)
+
+@dispatcher.event()
+async def join_lobby(req: SocketRequest):
+    sid, username = req.sid, req.username
     try:
-        session = await sio.get_session(sid)
-        username = session.get('username', 'anonymous')
-
         if sid in room_manager.active_connections.get('lobby', []):
             logger.info(f"User {username} is already in lobby, skip re-join.")
             return
@@ -203,17 +293,15 @@ async def join_lobby(sid, data, auth=None):
             room_manager.disconnect('lobby', sid)
         raise
 
-@sio.event
-async def join_custom_room(sid, data, auth=None):
-    room_id = data.get('room_id')
-    if not room_id or room_id == 'lobby':
+@dispatcher.event(schema=RoomEvent)
+async def join_custom_room(req: SocketRequest):
+    sid, username = req.sid, req.username
+    room_id = req.data.room_id
+    if room_id == 'lobby':
         logger.warning(f"join_custom_room called but invalid room_id: {room_id}")
         return
 
     try:
-        session = await sio.get_session(sid)
-        username = session.get('username', f"guest-{sid[:6]}")
-
         if sid in room_manager.active_connections.get(room_id, []):
             logger.info(f"User {username} is already in room {room_id}, skip re-join.")
             return
@@ -231,13 +319,11 @@ async def join_custom_room(sid, data, auth=None):
         if sid in room_manager.active_connections.get(room_id, []):
             room_manager.disconnect(room_id, sid)
 
-@sio.event
-async def leave_room(sid, data):
-    room_id = data.get('room_id')
-    if not room_id:
-        return
-    username = room_manager.get_username_by_sid(sid) or 'unknown'
-    logger.info(f"User {username} leaving room {room_id}")
+@dispatcher.event(schema=RoomEvent)
+async def leave_room(req: SocketRequest):
+    sid = req.sid
+    room_id = req.data.room_id
+    logger.info(f"User {req.username} leaving room {room_id}")
 
     if room_id == 'lobby':
         await sio.leave_room(sid, 'lobby')
@@ -245,27 +331,16 @@ async def leave_room(sid, data):
     room_manager.disconnect(room_id, sid)
     await sio.emit('room_left', {'room_id': room_id}, to=sid)
 
-@sio.event
-async def joinGame(sid, data):
-    match_id = data.get('match_id')
-    if not match_id:
-        logger.error("Received joinGame without match_id from sid=%s", sid)
-        return
-
-    from backend.services.match_service import get_matches
+@dispatcher.event(schema=JoinGameEvent, match="player")
+async def joinGame(req: SocketRequest):
+    sid, username, match_id, game = req.sid, req.username, req.match_id, req.game
     try:
-        session = await sio.get_session(sid)
-        username = session.get('username', 'anonymous')
         logger.info(f"[joinGame] User {username} attempting to join game {match_id}")
 
-        matches = get_matches()
-        if match_id not in matches:
-            logger.error(f"[joinGame] Match not found: {match_id}")
-            return
-        game = matches[match_id]
-        if username not in (game.black_player, game.white_player):
-            logger.error(f"[joinGame] User {username} is not a player in match {match_id}")
-            return
+        if req.data.legal_moves and not game.push_legal_moves:
+            # 客户端要求在 game_update 里附带合法着点位图
+            game.push_legal_moves = True
+            game.touch()
 
         if sid in game_manager.active_connections.get(match_id, []):
             logger.info(f"[joinGame] User {username} is already in game {match_id}")
@@ -273,52 +348,64 @@ async def joinGame(sid, data):
             await sio.enter_room(sid, f'game_{match_id}')
             await game_manager.connect(match_id, sid, username)
             logger.info(f"[joinGame] User {username} joined game {match_id} successfully")
-            logger.info(f"[joinGame] Active connections for match: {game_manager.active_connections.get(match_id, [])}")
-            logger.info(f"[joinGame] Socket.IO rooms for sid {sid}: {sio.rooms(sid)}")
-
-        # 发送初始游戏状态
-        game_state = {
-            "type": "game_update",
-            "match_id": match_id,
-            "board": game.board,
-            "current_player": game.current_player,
-            "black_player": game.black_player,
-            "white_player": game.white_player,
-            "game_over": game.game_over,
-            "winner": game.winner,
-            "captured": game.captured,
-            "black_timer": game.timers["black"],
-            "white_timer": game.timers["white"]
-        }
-        logger.info(f"[joinGame] Sending initial game state to {username}")
-        await game_manager.send_message(match_id, game_state, target_sid=sid)
+            if logger.isEnabledFor(logging.DEBUG):
+                logger.debug("[joinGame] Active connections for match: %s", game_manager.active_connections.get(match_id, []))
+                logger.debug("[joinGame] Socket.IO rooms for sid %s: %s", sid, sio.rooms(sid))
+
+        # 发送游戏状态：重连且带了 last_seq 时尽量只补发漏掉的增量
+        logger.debug("[joinGame] Sending game state to %s (last_seq=%s)", username, req.data.last_seq)
+        await game_manager.send_message(match_id, resync_message(match_id, game, req.data.last_seq), target_sid=sid)
+        # 机器人执黑时由人类进入对局触发第一手
+        bot_manager.maybe_move(match_id, game)
     except Exception as e:
         logger.error(f"Error in joinGame: {str(e)}")
         if sid in game_manager.active_connections.get(match_id, []):
             game_manager.disconnect(match_id, sid)
 
-@sio.event
-async def message(sid, data):
-    username = room_manager.get_username_by_sid(sid) or game_manager.get_username_by_sid(sid) or 'unknown'
-    logger.info(f"Received message from user {username}: {data}")
+@dispatcher.event(schema=MatchEvent, match="any")
+async def watch_game(req: SocketRequest):
+    """
+    观战：任何已登录用户都可以订阅对局的只读推送(不进入对局双方的房间)
+    """
+    await spectator_hub.watch(req.sid, req.match_id, req.game)
 
-    if data.get('type') == 'get_rooms':
-        if sid in room_manager.active_connections.get('lobby', []):
-            await broadcast_update()
-        else:
-            logger.info(f"sid={sid} not in lobby, skip get_rooms")
+@dispatcher.event()
+async def unwatch_game(req: SocketRequest):
+    await spectator_hub.unwatch(req.sid)
 
-    elif data.get('type') == 'pull_room_info':
-        room_id = data.get('room_id')
-        if room_id:
-            logger.info(f"pull_room_info => pulling real data for room_id={room_id}")
-            await broadcast_update(room_id)
-        else:
-            logger.warning("pull_room_info => missing room_id")
+#############
+# message 事件：按 type 查表，其余转发
+#############
+@dispatcher.message("get_rooms")
+async def get_rooms(req: SocketRequest):
+    if req.sid in room_manager.active_connections.get('lobby', []):
+        # 只回给请求者，不再触发整个大厅的广播
+        await send_lobby_snapshot(req.sid)
+    else:
+        logger.info(f"sid={req.sid} not in lobby, skip get_rooms")
 
-    elif 'match_id' in data:
+@dispatcher.message("pull_room_info", schema=RoomEvent)
+async def pull_room_info(req: SocketRequest):
+    room_id = req.data.room_id
+    logger.debug("pull_room_info => sending room %s to sid=%s", room_id, req.sid)
+    # 只回给请求者，不再触发整个大厅和房间的广播
+    await send_room_snapshot(room_id, req.sid)
+
+@dispatcher.relay
+async def relay_message(req: SocketRequest):
+    sid, data = req.sid, req.data
+    logger.debug("Received message from user %s: %s", req.username, data)
+
+    if 'match_id' in data:
         match_id = data['match_id']
-        await game_manager.send_message(match_id, data)
+        # 只允许对局内的连接向该对局转发
+        if sid not in game_manager.active_connections.get(match_id, []):
+            logger.info(f"sid={sid} not in match {match_id}, drop relay")
+            return
+        await game_manager.send_message(match_id, data, relayed=True)
+
+    elif 'room_id' in data and sid not in room_manager.active_connections.get(data['room_id'], []):
+        logger.info(f"sid={sid} not in room {data['room_id']}, drop relay")
 
     elif 'room_id' in data and data.get('type') == 'room_update':
         msg = {
@@ -326,12 +413,11 @@ async def message(sid, data):
             'room_id': data['room_id'],
             'data': data.get('data', {})
         }
-        logger.info(f"Broadcasting room update via message: {msg}")
-        await room_manager.send_message(data['room_id'], msg)
+        logger.debug("Broadcasting room update via message: %s", msg)
+        await room_manager.send_message(data['room_id'], msg, relayed=True)
 
     elif 'room_id' in data:
-        room_id = data['room_id']
-        await room_manager.send_message(room_id, data)
+        await room_manager.send_message(data['room_id'], data, relayed=True)
 
     else:
         logger.error(f"Received message without recognized type or room_id/match_id: {data}")
@@ -340,121 +426,53 @@ async def message(sid, data):
 #############
 # 对局事件
 #############
-@sio.event
-async def move_stone(sid, data):
-    from backend.services.match_service import get_matches
-    session = await sio.get_session(sid)
-    username = session.get('username', 'anonymous')
-    match_id = data.get("match_id")
-    x = data.get("x")
-    y = data.get("y")
-
-    if not match_id or x is None or y is None:
-        logger.error(f"move_stone missing required fields. data={data}")
-        return
-
-    matches = get_matches()
-    if match_id not in matches:
-        logger.error(f"[move_stone] Match not found: {match_id}")
-        return
-
-    game = matches[match_id]
-    logger.info(f"[move_stone] user={username} => match_id={match_id}, move=({x},{y})")
+@dispatcher.event(schema=MoveEvent, match="player")
+async def move_stone(req: SocketRequest):
+    sid, username, match_id, game = req.sid, req.username, req.match_id, req.game
+    x, y = req.data.x, req.data.y
+    logger.debug("[move_stone] user=%s => match_id=%s, move=(%s,%s)", username, match_id, x, y)
 
     if game.game_over:
         logger.info(f"[move_stone] Game {match_id} already over.")
         return
 
-    current_color = game.current_player
-    if (current_color == "black" and username != game.black_player) or \
-       (current_color == "white" and username != game.white_player):
-        logger.info(f"[move_stone] Not {username}'s turn.")
-        error_msg = {
-            "type": "game_update",
-            "match_id": match_id,
-            "board": game.board,
-            "current_player": game.current_player,
-            "black_player": game.black_player,
-            "white_player": game.white_player,
-            "game_over": game.game_over,
-            "winner": game.winner,
-            "captured": game.captured,
-            "black_timer": game.timers["black"],
-            "white_timer": game.timers["white"],
-            "error": "Not your turn"
-        }
-        await game_manager.send_message(match_id, error_msg)
+    if game.current_player not in req.colors:
+        logger.debug("[move_stone] Not %s's turn.", username)
+        # 错误只回给发起者
+        error_msg = stamped_snapshot(match_id, game, error="Not your turn")
+        await game_manager.send_message(match_id, error_msg, target_sid=sid)
         return
 
-    logger.info(f"[move_stone] Attempting move at ({x}, {y}) for {username} in match {match_id}")
+    started = time.perf_counter()
     success, message = game.play_move(x, y)
+    metrics.move_validation_seconds.observe(time.perf_counter() - started)
+    metrics.moves_total.labels("accepted" if success else "rejected").inc()
     if not success:
-        logger.info(f"[move_stone] Move invalid: {message}")
-        error_msg = {
-            "type": "game_update",
-            "match_id": match_id,
-            "board": game.board,
-            "current_player": game.current_player,
-            "black_player": game.black_player,
-            "white_player": game.white_player,
-            "game_over": game.game_over,
-            "winner": game.winner,
-            "captured": game.captured,
-            "black_timer": game.timers["black"],
-            "white_timer": game.timers["white"],
-            "error": message
-        }
-        await game_manager.send_message(match_id, error_msg)
+        logger.debug("[move_stone] Move invalid: %s", message)
+        error_msg = stamped_snapshot(match_id, game, error=message)
+        await game_manager.send_message(match_id, error_msg, target_sid=sid)
         return
-    logger.info(f"[move_stone] Move successful at ({x}, {y})")
-
-    game_state = {
-        "type": "game_update",
-        "match_id": match_id,
-        "board": game.board,
-        "current_player": game.current_player,
-        "black_player": game.black_player,
-        "white_player": game.white_player,
-        "game_over": game.game_over,
-        "winner": game.winner,
-        "captured": game.captured,
-        "black_timer": game.timers["black"],
-        "white_timer": game.timers["white"]
-    }
-    logger.info(f"[move_stone] Broadcasting game_update to match {match_id}")
-    logger.info(f"[move_stone] Game state to broadcast: {game_state}")
-    logger.info(f"[move_stone] Active connections for match: {game_manager.active_connections.get(match_id, [])}")
 
-    connected_users = [game_manager.get_username_by_sid(s) for s in game_manager.active_connections.get(match_id, [])]
-    logger.info(f"[move_stone] Connected users: {connected_users}")
+    game_state = publish_game_update(match_id, game)
+    if sample("move_stone") and logger.isEnabledFor(logging.INFO):
+        logger.info(
+            "[move_stone] move accepted",
+            extra={"match_id": match_id, "user": username, "x": x, "y": y, "moves": len(game.move_records)},
+        )
+    if logger.isEnabledFor(logging.DEBUG):
+        connected_users = [game_manager.get_username_by_sid(s) for s in game_manager.active_connections.get(match_id, [])]
+        logger.debug("[move_stone] Broadcasting game_update to match %s, connected users: %s", match_id, connected_users)
 
     await game_manager.send_message(match_id, game_state)
-    logger.info(f"[move_stone] Broadcast complete")
+    spectator_hub.notify(match_id, game)
+    bot_manager.maybe_move(match_id, game)
 
-@sio.event
-async def resign(sid, data):
-    from backend.services.match_service import get_matches
-    session = await sio.get_session(sid)
-    username = session.get('username', 'anonymous')
-    match_id = data.get("match_id")
-    player_color = data.get("player")
-
-    if not match_id or not player_color:
-        logger.error(f"[resign] missing required fields in data={data}")
-        return
+@dispatcher.event(schema=ResignEvent, match="player")
+async def resign(req: SocketRequest):
+    username, match_id, game = req.username, req.match_id, req.game
+    player_color = req.data.player
 
-    matches = get_matches()
-    if match_id not in matches:
-        logger.error(f"[resign] Match not found: {match_id}")
-        return
-
-    game = matches[match_id]
-    if username not in (game.black_player, game.white_player):
-        logger.info(f"[resign] {username} is not in match {match_id}")
-        return
-
-    if (player_color == "black" and username != game.black_player) or \
-       (player_color == "white" and username != game.white_player):
+    if player_color not in req.colors:
         logger.info(f"[resign] {username} cannot resign color={player_color}")
         return
 
@@ -468,98 +486,42 @@ async def resign(sid, data):
         return
     game.update_timers()
 
-    game_state = {
-        "type": "game_update",
-        "match_id": match_id,
-        "board": game.board,
-        "current_player": game.current_player,
-        "game_over": game.game_over,
-        "winner": game.winner,
-        "captured": game.captured,
-        "black_timer": game.timers["black"],
-        "white_timer": game.timers["white"]
-    }
-    await game_manager.send_message(match_id, game_state)
-
-    # 更新房间状态并广播给大厅
-    from backend.routers.rooms import rooms, broadcast_update
-    for room_id, room_info in rooms.items():
-        if room_info.get("match_id") == match_id:
-            room_info["started"] = False
-            await broadcast_update(room_id)
-            break
+    await game_manager.send_message(match_id, publish_game_update(match_id, game))
+    spectator_hub.notify(match_id, game)
 
-@sio.event
-async def mark_dead_stone(sid, data):
+@dispatcher.event(schema=MoveEvent, match="player")
+async def mark_dead_stone(req: SocketRequest):
     from backend.services.scoring import mark_dead_stone
-    from backend.services.match_service import get_matches
-
-    session = await sio.get_session(sid)
-    username = session.get('username', 'anonymous')
-    match_id = data.get("match_id")
-    x = data.get("x")
-    y = data.get("y")
-
-    if match_id is None or x is None or y is None:
-        logger.error(f"[mark_dead_stone] missing required fields. data={data}")
-        return
 
-    matches = get_matches()
-    if match_id not in matches:
-        logger.error(f"[mark_dead_stone] Match not found: {match_id}")
-        return
-
-    game = matches[match_id]
-    if username not in (game.black_player, game.white_player):
-        logger.info(f"[mark_dead_stone] {username} is not in match {match_id}")
-        return
-
-    if game.game_over:
-        logger.info(f"[mark_dead_stone] Game {match_id} is already over.")
+    match_id, game = req.match_id, req.game
+    if game.finalized:
+        logger.info(f"[mark_dead_stone] Game {match_id} is already finalized.")
         return
 
-    mark_dead_stone(game, x, y, game.current_player)
+    mark_dead_stone(game, req.data.x, req.data.y, game.current_player)
     scoring_data = {
         "dead_stones": list(game.dead_stones),
         "territory": [],
         "blackScore": 0,
         "whiteScore": 0,
     }
-    game_state = {
-        "type": "game_update",
-        "match_id": match_id,
-        "board": game.board,
-        "current_player": game.current_player,
-        "game_over": game.game_over,
-        "winner": game.winner,
-        "captured": game.captured,
-        "black_timer": game.timers["black"],
-        "white_timer": game.timers["white"],
-        "scoring_data": scoring_data
-    }
+    game_state = publish_game_update(match_id, game, scoring_data=scoring_data)
     await game_manager.send_message(match_id, game_state)
+    spectator_hub.notify(match_id, game)
 
-@sio.event
-async def confirm_scoring(sid, data):
-    from backend.services.scoring import final_scoring
-    from backend.services.match_service import get_matches
-
-    session = await sio.get_session(sid)
-    username = session.get('username', 'anonymous')
-    match_id = data.get("match_id")
+@dispatcher.event(schema=MatchEvent, match="player")
+async def confirm_scoring(req: SocketRequest):
+    from backend.services.scoring import final_scoring, auto_resolve_dead_stones
 
-    if not match_id:
-        logger.error(f"[confirm_scoring] missing match_id in data={data}")
+    match_id, game = req.match_id, req.game
+    if game.finalized:
+        logger.info(f"[confirm_scoring] Game {match_id} is already finalized.")
         return
 
-    matches = get_matches()
-    if match_id not in matches:
-        logger.error(f"[confirm_scoring] Match not found: {match_id}")
-        return
-
-    game = matches[match_id]
-    if username not in (game.black_player, game.white_player):
-        logger.info(f"[confirm_scoring] {username} is not in match {match_id}")
+    # 先让死活求解器裁定有争议的死子，求解在子进程里进行
+    auto_resolved = await auto_resolve_dead_stones(game)
+    if game.finalized:
+        # 等待求解期间对方已确认
         return
 
     black_score, white_score, winner = final_scoring(game)
@@ -567,64 +529,51 @@ async def confirm_scoring(sid, data):
         "dead_stones": list(game.dead_stones),
         "territory": [],
         "blackScore": black_score,
-        "whiteScore": white_score
-    }
-    game_state = {
-        "type": "game_update",
-        "match_id": match_id,
-        "board": game.board,
-        "current_player": game.current_player,
-        "game_over": True,
-        "winner": winner,
-        "captured": game.captured,
-        "black_timer": game.timers["black"],
-        "white_timer": game.timers["white"],
-        "scoring_data": scoring_data
+        "whiteScore": white_score,
+        "auto_resolved": auto_resolved,
     }
+    # final_scoring 已把 game_over / winner 写回 game
+    game_state = publish_game_update(match_id, game, scoring_data=scoring_data)
     await game_manager.send_message(match_id, game_state)
+    spectator_hub.notify(match_id, game)
+
+@dispatcher.event(schema=StatusEvent, match="player")
+async def update_status(req: SocketRequest):
+    match_id, game = req.match_id, req.game
+    game.status = req.data.status
+    game.touch()
+    game_state = publish_game_update(match_id, game, status=game.status)
+    await game_manager.send_message(match_id, game_state)
+    spectator_hub.notify(match_id, game)
 
-    # 更新房间状态并广播给大厅
-    from backend.routers.rooms import rooms, broadcast_update
-    for room_id, room_info in rooms.items():
-        if room_info.get("match_id") == match_id:
-            room_info["started"] = False
-            await broadcast_update(room_id)
-            break
-
-@sio.event
-async def update_status(sid, data):
-    from backend.services.match_service import get_matches
-
-    session = await sio.get_session(sid)
-    username = session.get('username', 'anonymous')
-    match_id = data.get("match_id")
-    new_status = data.get("status")
-
-    if not match_id or not new_status:
-        logger.error(f"[update_status] missing fields. data={data}")
-        return
-
-    matches = get_matches()
-    if match_id not in matches:
-        logger.error(f"[update_status] Match not found: {match_id}")
-        return
-
-    game = matches[match_id]
-    if username not in (game.black_player, game.white_player):
-        logger.info(f"[update_status] {username} is not in match {match_id}")
-        return
+###################################
+# 应用工厂
+###################################
+application = None
 
-    game.status = new_status
-    game_state = {
-        "type": "game_update",
-        "match_id": match_id,
-        "board": game.board,
-        "current_player": game.current_player,
-        "game_over": game.game_over,
-        "winner": game.winner,
-        "captured": game.captured,
-        "black_timer": game.timers["black"],
-        "white_timer": game.timers["white"],
-        "status": game.status
-    }
-    await game_manager.send_message(match_id, game_state)
+def create_app() -> socketio.ASGIApp:
+    """
+    挂载中间件和路由、注册启动/关闭事件，返回 ASGI 应用(重复调用返回同一个)。
+    uvicorn backend.main:application 或 uvicorn --factory backend.main:create_app
+    """
+    global application
+    if application is None:
+        # 加CORS中间件
+        app.add_middleware(
+            CORSMiddleware,
+            allow_origins=["*"],  # 允许所有域
+            allow_credentials=True,
+            allow_methods=["*"],
+            allow_headers=["*"],
+            expose_headers=["*"]
+        )
+        # 包含 rooms路由、matches路由、matchmaking路由
+        app.include_router(matches_router, prefix="/api/v1")
+        app.include_router(rooms_router, prefix="/api/v1")
+        app.include_router(matchmaking_router, prefix="/api/v1")
+        app.router.add_event_handler("startup", startup_event)
+        app.router.add_event_handler("shutdown", shutdown_event)
+        application = socketio.ASGIApp(sio, app)
+    return application
+
+application = create_app()
@@ -1,5 +1,5 @@
-from pydantic import BaseModel
-from typing import List, Optional
+from pydantic import BaseModel, Field
+from typing import List, Literal, Optional
 
 class Move(BaseModel):
     x: int
@@ -42,3 +42,28 @@ class Card(BaseModel):
 
 class ResignRequest(BaseModel):
     player: str  # "black" or "white"
+
+
+#############################
+# Socket.IO 事件载荷
+# (由 socket_dispatch 在进入 handler 前校验；多余字段忽略)
+#############################
+class RoomEvent(BaseModel):
+    room_id: str = Field(min_length=1)
+
+class MatchEvent(BaseModel):
+    match_id: str = Field(min_length=1)
+
+class JoinGameEvent(MatchEvent):
+    legal_moves: bool = False  # 要求 game_update 里附带合法着点位图
+    last_seq: Optional[int] = None  # 重连时客户端收到的最后一个 seq，只补发之后的增量
+
+class MoveEvent(MatchEvent):
+    x: int
+    y: int
+
+class ResignEvent(MatchEvent):
+    player: Literal["black", "white"]
+
+class StatusEvent(MatchEvent):
+    status: str = Field(min_length=1)
@@ -3,16 +3,19 @@ from fastapi import APIRouter, HTTPException, File, UploadFile, Depends
 from backend.auth import get_current_user
 from backend.models import Move, CreateMatch, Player, Card, ResignRequest
 from backend.services.go_game import GoGame
+from backend.services.geometry import get_geometry
 from backend.services.scoring import mark_dead_stone, final_scoring
+import os
 import uuid
 import logging
-from sgfmill import sgf
 
 logger = logging.getLogger(__name__)
 
 router = APIRouter()
 
+from backend.services import match_service
 from backend.services.match_service import get_matches, create_match_internal
+from backend.services.ratings import get_rating_engine
 
 
 @router.post("/matches")
@@ -49,14 +52,14 @@ def get_match(match_id: str):
         "captured": game.captured,
         "history_length": len(game.history),
         "black_timer": {
-            "main_time": game.timers["black"]["main_time"],
-            "byo_yomi": game.timers["black"]["byo_yomi"],
-            "periods": game.timers["black"]["periods"]
+            "main_time": game.timers["black"].main_time,
+            "byo_yomi": game.timers["black"].byo_yomi,
+            "periods": game.timers["black"].periods
         },
         "white_timer": {
-            "main_time": game.timers["white"]["main_time"],
-            "byo_yomi": game.timers["white"]["byo_yomi"],
-            "periods": game.timers["white"]["periods"]
+            "main_time": game.timers["white"].main_time,
+            "byo_yomi": game.timers["white"].byo_yomi,
+            "periods": game.timers["white"].periods
         }
     }
 
@@ -70,17 +73,18 @@ def get_match_players(match_id: str):
     if match_id not in matches:
         raise HTTPException(status_code=404, detail="Match not found")
     game = matches[match_id]
+    ratings = get_rating_engine()
     return {
         "players": [
             Player(
                 player_id=game.black_player,
-                elo=0,  # TODO: 待后续实现真实ELO
+                elo=ratings.elo(game.black_player),
                 is_black=True,
                 avatar_url=""
             ),
             Player(
                 player_id=game.white_player,
-                elo=0,  # TODO
+                elo=ratings.elo(game.white_player),
                 is_black=False,
                 avatar_url=""
             )
@@ -90,6 +94,24 @@ def get_match_players(match_id: str):
     }
 
 
+# 每次估计的模拟盘数上限；计算在 compute_pool 里进行，但仍会占用一个工作进程
+ESTIMATE_MAX_PLAYOUTS = int(os.getenv("ESTIMATE_MAX_PLAYOUTS", "512"))
+
+@router.get("/matches/{match_id}/estimate")
+async def estimate_match(match_id: str, playouts: int = 256, current_user: dict = Depends(get_current_user)):
+    """
+    蒙特卡洛点目估计：从当前局面做 playouts 盘随机对局，返回黑方平均净胜目数、
+    黑胜率和每个交叉点的归属(1 黑 / -1 白)。需要登录；模拟在 compute_pool 子进程里进行。
+    """
+    from backend.services.batch_engine import estimate_score_async
+
+    matches = get_matches()
+    if match_id not in matches:
+        raise HTTPException(status_code=404, detail="Match not found")
+    playouts = max(1, min(playouts, ESTIMATE_MAX_PLAYOUTS))
+    return await estimate_score_async(matches[match_id], playouts)
+
+
 # 复盘专用的HTTP落子接口
 @router.post("/matches/{match_id}/move")
 def play_move(match_id: str, data: dict):
@@ -111,25 +133,23 @@ def play_move(match_id: str, data: dict):
     if player not in ["black", "white"]:
         raise HTTPException(status_code=400, detail="Invalid player color")
         
-    if game.current_player != player:
-        raise HTTPException(status_code=400, detail="Not player's turn")
-        
-    success, message = game.play_move(x, y)
-    if not success:
-        raise HTTPException(status_code=400, detail=message)
-        
-    return {"success": True, "board": game.board}
+    with game.lock:
+        if game.current_player != player:
+            raise HTTPException(status_code=400, detail="Not player's turn")
+
+        success, message = game.play_move(x, y)
+        if not success:
+            raise HTTPException(status_code=400, detail=message)
+
+        return {"success": True, "board": [row[:] for row in game.board]}
 
 @router.delete("/matches/{match_id}")
-def delete_match(match_id: str):
+async def delete_match(match_id: str):
     """
-    删除一个对局，用于复盘时清理
+    删除一个对局，用于复盘时清理(在事件循环里执行，以便同时取消机器人的搜索任务)
     """
-    matches = get_matches()
-    if match_id not in matches:
+    if not match_service.delete_match(match_id):
         raise HTTPException(status_code=404, detail="Match not found")
-    
-    del matches[match_id]
     return {"success": True}
 
 # 其他WebSocket事件相关的注释
@@ -146,6 +166,8 @@ def export_sgf(match_id: str):
     导出SGF棋谱
     x=0 在底行, SGF row=0 在顶行 => row=(board_size-1 - x), col=y
     """
+    from sgfmill import sgf
+
     matches = get_matches()
     if match_id not in matches:
         raise HTTPException(status_code=404, detail="Match not found")
@@ -157,12 +179,11 @@ def export_sgf(match_id: str):
     root_node.set("PB", "BlackPlayer")
     root_node.set("PW", "WhitePlayer")
 
+    geometry = get_geometry(sz)
     for (color, x, y) in game.move_records:
-        row = sz - 1 - x
-        col = y
         c = "b" if color == "black" else "w"
         node = sgf_game.extend_main_sequence()
-        node.set_move(c, (row, col))
+        node.set_move(c, geometry.to_sgf(x, y))
 
     return {"sgf": sgf_game.serialise().decode("utf-8")}
 
@@ -172,17 +193,17 @@ def review_sgf(file: UploadFile = File(...)):
     """
     将SGF解析为落子序列，用于复盘。
     """
+    from sgfmill import sgf
+
     try:
         content = file.file.read()
         sgf_game = sgf.Sgf_game.from_bytes(content)
-        size = sgf_game.get_size()
+        geometry = get_geometry(sgf_game.get_size())
         moves = []
         for node in sgf_game.get_main_sequence():
             color, move = node.get_move()
             if color and move:
-                row, col = move
-                x = size - 1 - row
-                y = col
+                x, y = geometry.from_sgf(*move)
                 stone_color = "black" if color == "b" else "white"
                 moves.append({"color": stone_color, "x": x, "y": y})
         return {"moves": moves}
@@ -0,0 +1,47 @@
+# backend/routers/matchmaking.py
+
+from fastapi import APIRouter, HTTPException, Depends
+from pydantic import BaseModel
+from backend.auth import get_current_user
+from backend.services.matchmaking import get_matchmaker
+from backend.services.ratings import get_rating_engine
+import logging
+
+router = APIRouter()
+logger = logging.getLogger(__name__)
+
+SUPPORTED_BOARD_SIZES = (9, 13, 19)
+
+
+class QueueConfig(BaseModel):
+    boardSize: int = 19
+    mainTime: int = 300
+    byoYomiTime: int = 30
+    byoYomiPeriods: int = 3
+
+
+@router.post("/matchmaking/join")
+async def join_queue(config: QueueConfig, current_user: dict = Depends(get_current_user)):
+    """
+    加入自动匹配队列；配对成功后通过 socket 事件 match_found 通知，也可轮询 /matchmaking/status
+    """
+    if config.boardSize not in SUPPORTED_BOARD_SIZES:
+        raise HTTPException(status_code=400, detail="Unsupported board size")
+    if config.mainTime < 0 or config.byoYomiTime < 0 or config.byoYomiPeriods < 0:
+        raise HTTPException(status_code=400, detail="Invalid time control")
+    username = current_user["username"]
+    rating = get_rating_engine().get(username).rating
+    key = (config.boardSize, config.mainTime, config.byoYomiTime, config.byoYomiPeriods)
+    get_matchmaker().join(username, rating, key)
+    logger.info(f"User {username} joined matchmaking queue {key} at rating {rating:.0f}")
+    return get_matchmaker().status(username)
+
+
+@router.post("/matchmaking/leave")
+async def leave_queue(current_user: dict = Depends(get_current_user)):
+    return {"left": get_matchmaker().leave(current_user["username"])}
+
+
+@router.get("/matchmaking/status")
+async def queue_status(current_user: dict = Depends(get_current_user)):
+    return get_matchmaker().status(current_user["username"])
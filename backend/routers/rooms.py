@@ -2,6 +2,7 @@
 
 from fastapi import APIRouter, HTTPException, Depends
 from backend.auth import get_current_user
+from backend.services import metrics
 import uuid
 import time
 import random
@@ -12,6 +13,68 @@ router = APIRouter()
 logger = logging.getLogger(__name__)
 
 rooms = {}  # room_id -> { players:[], ready:{}, started:bool, match_id:str, ... }
+metrics.active_rooms.set_function(lambda: len(rooms))
+
+def _players_info(players) -> list:
+    from backend.services.ratings import get_rating_engine
+
+    engine = get_rating_engine()
+    return [{"username": p, "elo": engine.elo(p)} for p in players]
+
+def build_lobby_update() -> dict:
+    """整理rooms列表 => lobby_update 消息"""
+    room_list = []
+    for rid, rinfo in rooms.items():
+        players_info = _players_info(rinfo["players"])
+        age = time.time() - rinfo["timer"]
+        # 获取游戏状态
+        game_over = False
+        winner = None
+        if rinfo.get("match_id"):
+            from backend.services.match_service import matches
+            if rinfo["match_id"] in matches:
+                game = matches[rinfo["match_id"]]["game"]
+                game_over = game.game_over
+                winner = game.winner
+
+        room_data = {
+            "room_id": rid,
+            "eloMin": rinfo["eloMin"],
+            "eloMax": rinfo["eloMax"],
+            "players": players_info,
+            "started": rinfo["started"],
+            "game_over": game_over,
+            "winner": winner,
+            "age": int(age),
+            "match_id": rinfo.get("match_id"),
+            "timeRule": rinfo["timeRule"],
+            "mainTime": rinfo["mainTime"],
+            "byoYomiPeriods": rinfo["byoYomiPeriods"],
+            "byoYomiTime": rinfo["byoYomiTime"],
+            "whoIsBlack": rinfo["whoIsBlack"],
+            "ready": rinfo["ready"],
+            "deleting": rinfo.get("deleting", False),
+            "lastUpdateTime": int(time.time())
+        }
+        room_list.append(room_data)
+
+    return {
+        "type": "lobby_update",
+        "rooms": room_list,
+        "lastUpdateTime": int(time.time())
+    }
+
+async def send_lobby_snapshot(sid: str):
+    """只把当前房间列表发给一个 sid(用于 get_rooms 拉取，不打扰大厅里的其他人)"""
+    from backend.services.outbound_queue import outbound
+    from backend.services.game_snapshot import encode_message
+
+    try:
+        encoded = encode_message(build_lobby_update())
+        outbound.send(sid, "lobby_update", encoded, key=("lobby_update", "lobby"))
+        metrics.payload_bytes.labels("lobby_update").observe(len(encoded))
+    except Exception as e:
+        logger.error(f"Error in send_lobby_snapshot: {str(e)}")
 
 async def broadcast_update(room_id: str = None):
     """
@@ -19,83 +82,116 @@ async def broadcast_update(room_id: str = None):
       1) 给lobby => type='lobby_update' + 所有rooms
       2) 若room_id => 给此房间 => type='room_update'
     """
-    from backend.main import sio
-    from backend.services.websocket_manager import room_manager
-
     try:
-        # 1) 整理rooms列表 => 发给lobby
-        room_list = []
-        for rid, rinfo in rooms.items():
-            players_info = [{"username": p, "elo":1500} for p in rinfo["players"]]
-            age = time.time() - rinfo["timer"]
-            # 获取游戏状态
-            game_over = False
-            winner = None
-            if rinfo.get("match_id"):
-                from backend.services.match_service import matches
-                if rinfo["match_id"] in matches:
-                    game = matches[rinfo["match_id"]]["game"]
-                    game_over = game.game_over
-                    winner = game.winner
-
-            room_data = {
-                "room_id": rid,
-                "eloMin": rinfo["eloMin"],
-                "eloMax": rinfo["eloMax"],
-                "players": players_info,
-                "started": rinfo["started"],
-                "game_over": game_over,
-                "winner": winner,
-                "age": int(age),
-                "match_id": rinfo.get("match_id"),
-                "timeRule": rinfo["timeRule"],
-                "mainTime": rinfo["mainTime"],
-                "byoYomiPeriods": rinfo["byoYomiPeriods"],
-                "byoYomiTime": rinfo["byoYomiTime"],
-                "whoIsBlack": rinfo["whoIsBlack"],
-                "ready": rinfo["ready"],
-                "deleting": rinfo.get("deleting", False),
-                "lastUpdateTime": int(time.time())
-            }
-            room_list.append(room_data)
-
-        lobby_update = {
-            "type": "lobby_update",
-            "rooms": room_list,
-            "lastUpdateTime": int(time.time())
-        }
-        await sio.emit("lobby_update", lobby_update, room='lobby')
-
+        _broadcast_lobby()
         # 2) 如果指定room_id, 给该房间发 room_update
-        if room_id and room_id in rooms:
-            r = rooms[room_id]
-            players_info = [{"username": p, "elo":1500} for p in r["players"]]
-            single_data = {
-                "room_id": room_id,
-                "eloMin": r["eloMin"],
-                "eloMax": r["eloMax"],
-                "players": players_info,
-                "started": r["started"],
-                "timer": r["timer"],
-                "match_id": r.get("match_id"),
-                "timeRule": r["timeRule"],
-                "mainTime": r["mainTime"],
-                "byoYomiPeriods": r["byoYomiPeriods"],
-                "byoYomiTime": r["byoYomiTime"],
-                "whoIsBlack": r["whoIsBlack"],
-                "ready": r["ready"],
-                "deleting": r.get("deleting", False),
-                "lastUpdateTime": int(time.time())
-            }
-            room_update_msg = {
-                "type": "room_update",
-                "room_id": room_id,
-                "data": single_data
-            }
-            await sio.emit("room_update", room_update_msg, room=room_id)
+        if room_id:
+            _send_room_update(room_id)
+            _touch(room_id)
     except Exception as e:
         logger.error(f"Error in broadcast_update: {str(e)}")
 
+async def on_matches_finished(batch):
+    """
+    终局流水线的房间阶段：把这批对局所在的房间标记为未开始，
+    逐个发 room_update，大厅只广播一次；顺便放弃这些对局里还没结束的机器人搜索。
+    """
+    from backend.services.match_service import cancel_bot
+
+    finished = {item.match_id for item in batch}
+    for match_id in finished:
+        cancel_bot(match_id)
+    changed = [rid for rid, rinfo in rooms.items() if rinfo.get("match_id") in finished]
+    for rid in changed:
+        rooms[rid]["started"] = False
+        _send_room_update(rid)
+        _touch(rid)
+    _broadcast_lobby()
+
+async def on_rooms_reaped(removed):
+    """
+    房间回收的回调：removed 为 {room_id: 已删除的房间(deleting=True)}。
+    与 delete_room 一样先给房间成员发 deleting 的 room_update，再清掉连接记录，大厅只广播一次。
+    """
+    from backend.services.websocket_manager import room_manager
+
+    for rid, room in removed.items():
+        _send_room_update(rid, room)
+        room_manager.active_connections.pop(rid, None)
+    _broadcast_lobby()
+
+def _touch(room_id: str):
+    from backend.services.room_reaper import get_room_reaper
+
+    reaper = get_room_reaper()
+    if reaper is not None:
+        reaper.touch(room_id)
+
+def _broadcast_lobby():
+    from backend.services.websocket_manager import room_manager
+    from backend.services.outbound_queue import outbound
+    from backend.services.game_snapshot import encode_message
+
+    lobby_update = build_lobby_update()
+    # 编码一次后放进大厅每个 sid 的发送队列，队列里只保留最新的一条 lobby_update
+    started = time.perf_counter()
+    lobby_sids = room_manager.active_connections.get('lobby', [])
+    encoded = encode_message(lobby_update)
+    outbound.broadcast(lobby_sids, "lobby_update", encoded, key=("lobby_update", "lobby"))
+    metrics.broadcast_seconds.labels("lobby_update").observe(time.perf_counter() - started)
+    metrics.broadcast_recipients.labels("lobby_update").observe(len(lobby_sids))
+    metrics.payload_bytes.labels("lobby_update").observe(len(encoded))
+
+def build_room_update(room_id: str, r: dict) -> dict:
+    """单个房间 => room_update 消息"""
+    players_info = _players_info(r["players"])
+    single_data = {
+        "room_id": room_id,
+        "eloMin": r["eloMin"],
+        "eloMax": r["eloMax"],
+        "players": players_info,
+        "started": r["started"],
+        "timer": r["timer"],
+        "match_id": r.get("match_id"),
+        "timeRule": r["timeRule"],
+        "mainTime": r["mainTime"],
+        "byoYomiPeriods": r["byoYomiPeriods"],
+        "byoYomiTime": r["byoYomiTime"],
+        "whoIsBlack": r["whoIsBlack"],
+        "ready": r["ready"],
+        "deleting": r.get("deleting", False),
+        "lastUpdateTime": int(time.time())
+    }
+    return {
+        "type": "room_update",
+        "room_id": room_id,
+        "data": single_data
+    }
+
+def _send_room_update(room_id: str, room: Optional[dict] = None):
+    """给房间成员发 room_update；room 不传时从 rooms 里取(已被删除的房间由调用方传入)"""
+    from backend.services.websocket_manager import room_manager
+    from backend.services.outbound_queue import outbound
+    from backend.services.game_snapshot import encode_message
+
+    r = room if room is not None else rooms.get(room_id)
+    if r is not None:
+        outbound.broadcast(
+            room_manager.active_connections.get(room_id, []), "room_update",
+            encode_message(build_room_update(room_id, r)), key=("room_update", room_id))
+
+async def send_room_snapshot(room_id: str, sid: str):
+    """只把某个房间的当前状态发给一个 sid(用于 pull_room_info 拉取，不打扰大厅和房间里的其他人)"""
+    from backend.services.outbound_queue import outbound
+    from backend.services.game_snapshot import encode_message
+
+    r = rooms.get(room_id)
+    if r is None:
+        return
+    encoded = encode_message(build_room_update(room_id, r))
+    outbound.send(sid, "room_update", encoded, key=("room_update", room_id))
+    metrics.payload_bytes.labels("room_update").observe(len(encoded))
+
 
 from pydantic import BaseModel
 
@@ -119,7 +215,7 @@ async def list_rooms():
     try:
         room_list = []
         for rid, rinfo in rooms.items():
-            players_info = [{"username": p, "elo":1500} for p in rinfo["players"]]
+            players_info = _players_info(rinfo["players"])
             age = time.time() - rinfo["timer"]
             # 获取游戏状态
             game_over = False
@@ -227,6 +323,33 @@ async def join_room(room_id: str, current_user: dict = Depends(get_current_user)
         logger.error(f"Error joining room {room_id}: {str(e)}")
         raise
 
+@router.post("/rooms/{room_id}/add_bot")
+async def add_bot(room_id: str, current_user: dict = Depends(get_current_user)):
+    """
+    房主邀请机器人作为对手，机器人直接就绪
+    """
+    from backend.services.bot_player import DEFAULT_BOT
+    try:
+        username = current_user["username"]
+        if room_id not in rooms:
+            raise HTTPException(status_code=404, detail="Room not found")
+        room = rooms[room_id]
+        if not room["players"] or username != room["players"][0]:
+            raise HTTPException(status_code=403, detail="Only the creator can add a bot")
+        if room["started"]:
+            raise HTTPException(status_code=400, detail="Room has started")
+        if len(room["players"]) >= 2:
+            raise HTTPException(status_code=400, detail="Room is full")
+
+        room["players"].append(DEFAULT_BOT)
+        room["ready"][DEFAULT_BOT] = True
+        await broadcast_update(room_id)
+        logger.info(f"Bot {DEFAULT_BOT} added to room {room_id}")
+        return {"joined": True, "bot": DEFAULT_BOT}
+    except Exception as e:
+        logger.error(f"Error adding bot to room {room_id}: {str(e)}")
+        raise
+
 @router.post("/rooms/{room_id}/ready")
 async def ready_room(room_id: str, current_user: dict = Depends(get_current_user)):
     try:
@@ -310,8 +433,11 @@ async def cancel_room(room_id: str, current_user: dict = Depends(get_current_use
 
         room["players"].remove(username)
         del room["ready"][username]
-        if len(room["players"])==0:
+        from backend.services.bot_player import is_bot
+        if all(is_bot(p) for p in room["players"]):
+            # 只剩机器人(或没人)的房间直接删除
             del rooms[room_id]
+            await broadcast_update()
         else:
             await broadcast_update(room_id)
         return {"cancelled": True}
@@ -0,0 +1,388 @@
+# backend/services/batch_engine.py
+
+"""
+批量对局引擎：K 盘棋放在一个 NumPy 数组里，每次 step() 让所有未结束的棋盘各走一步。
+用于终局的蒙特卡洛点目估计和机器人的快速 playout。
+
+棋盘表示:
+  - board: (K, P) int8，P = (size + 2) ** 2，四周一圈为 BORDER，
+    这样相邻点就是 ±1 / ±W 的平移，不需要越界判断
+  - label: (K, P) int16，每个棋子所在棋串的编号(串里某个点的下标)，空点为 -1
+    落子时只把相邻己方串的编号改成新子的下标，提子时把整串清掉，不做全盘重算
+  - 气数只在需要时对落子点相邻的(最多 4 个)棋串计算
+
+规则上采用 playout 通用的简化：只判单劫，不判全局同形；
+随机/策略走子不填自己的真眼，双方连续 pass 或步数到上限即结束。
+"""
+
+from typing import Callable, Optional
+
+import numpy as np
+
+from backend.services.geometry import get_geometry
+
+EMPTY, BLACK, WHITE, BORDER = 0, 1, 2, 3
+COLOR_CODES = {"black": BLACK, "white": WHITE}
+
+# 策略函数: policy(engine, active) -> (len(active), P) 非负权重，0 表示不考虑该点
+Policy = Callable[["BatchGo", np.ndarray], np.ndarray]
+
+
+class BatchGo:
+    def __init__(self, size: int, count: int, komi: float = 6.5, seed: Optional[int] = None,
+                 max_moves: Optional[int] = None):
+        self.size = size
+        self.count = count
+        self.komi = komi
+        self.W = W = size + 2
+        self.P = P = W * W
+        self.offsets = np.array([-W, W, -1, 1], dtype=np.int64)
+        self.max_moves = max_moves or size * size * 3
+        self.rng = np.random.default_rng(seed)
+
+        # 棋盘坐标 (x, y) <-> 带边框下标，见 geometry.padded_points
+        self.points = np.array(get_geometry(size).padded_points, dtype=np.int64)
+        on_board = np.zeros(P, dtype=bool)
+        on_board[self.points] = True
+        self.on_board = on_board
+
+        self.board = np.full((count, P), BORDER, dtype=np.int8)
+        self.board[:, on_board] = EMPTY
+        self.label = np.full((count, P), -1, dtype=np.int16)
+        self.to_play = np.full(count, BLACK, dtype=np.int8)
+        self.passes = np.zeros(count, dtype=np.int8)
+        self.ko = np.full(count, -1, dtype=np.int64)
+        self.last_move = np.full(count, -1, dtype=np.int64)
+        self.moves = np.zeros(count, dtype=np.int32)
+        self.done = np.zeros(count, dtype=bool)
+
+    #########################################
+    # 构造
+    #########################################
+    @classmethod
+    def from_game(cls, game, count: int, seed: Optional[int] = None, max_moves: Optional[int] = None):
+        """把一个 GoGame 的当前局面复制 count 份"""
+        engine = cls(game.board_size, count, komi=game.komi, seed=seed, max_moves=max_moves)
+        cells = np.array(
+            [COLOR_CODES.get(cell, EMPTY) for row in game.board for cell in row], dtype=np.int8
+        )
+        engine.load(cells, COLOR_CODES[game.current_player])
+        return engine
+
+    @classmethod
+    def from_position(cls, tracker, to_play: int, count: int, komi: float = 6.5, seed: Optional[int] = None,
+                      max_moves: Optional[int] = None):
+        """同 from_game，但从 LegalMoveTracker 复制局面(颜色编码相同)，可在 compute_pool 子进程里使用"""
+        engine = cls(tracker.size, count, komi=komi, seed=seed, max_moves=max_moves)
+        engine.load(np.array(tracker.color, dtype=np.int8), to_play)
+        return engine
+
+    def index(self, x: int, y: int) -> int:
+        return (x + 1) * self.W + y + 1
+
+    def load(self, cells: np.ndarray, to_play):
+        """
+        cells 为 (size*size,) 或 (K, size*size) 的 0/1/2 数组(按 x * size + y 排列)，
+        前者把所有棋盘设为同一局面，后者每盘一个局面；to_play 同理可为标量或 (K,)。
+        """
+        self.board[:, self.points] = cells
+        self.to_play[:] = to_play
+        self.passes[:] = 0
+        self.ko[:] = -1
+        self.last_move[:] = -1
+        self.moves[:] = 0
+        self.done[:] = False
+        self._relabel_all()
+
+    def _relabel_all(self):
+        """按棋盘内容整体重新标记棋串：每串取最小下标，邻居间反复传播到收敛(只在 load 时使用)"""
+        board = self.board
+        stone = (board == BLACK) | (board == WHITE)
+        label = np.where(stone, np.arange(self.P, dtype=np.int16)[None, :], -1).astype(np.int16)
+        while True:
+            changed = False
+            for d in (-self.W, self.W, -1, 1):
+                src = np.roll(label, -d, axis=1)
+                smaller = stone & (board == np.roll(board, -d, axis=1)) & (src >= 0) & (src < label)
+                if smaller.any():
+                    label[smaller] = src[smaller]
+                    changed = True
+            if not changed:
+                break
+        self.label[:] = label
+
+    #########################################
+    # 向量化的基本操作
+    #########################################
+    def _dilate(self, mask: np.ndarray) -> np.ndarray:
+        """每个 True 点向上下左右扩张一格(边框点也可能被置 True，调用方再与空点相与)"""
+        W = self.W
+        out = np.zeros_like(mask)
+        out[:, 1:] |= mask[:, :-1]
+        out[:, :-1] |= mask[:, 1:]
+        out[:, W:] |= mask[:, :-W]
+        out[:, :-W] |= mask[:, W:]
+        return out
+
+    def _liberties(self, sub_label: np.ndarray, sub_empty: np.ndarray, labels: np.ndarray) -> np.ndarray:
+        """
+        sub_label / sub_empty 为若干盘棋的 label 和空点掩码，labels 为 (n, 4) 的棋串编号。
+        返回 (n, 4) 的气数；编号为 -1 的位置返回 0。
+        """
+        n = len(labels)
+        chain = sub_label[:, None, :] == labels[:, :, None]
+        chain &= (labels >= 0)[:, :, None]
+        libs = self._dilate(chain.reshape(n * 4, self.P)).reshape(n, 4, self.P)
+        libs &= sub_empty[:, None, :]
+        return libs.sum(axis=2)
+
+    def candidates(self, rows: np.ndarray) -> np.ndarray:
+        """
+        rows 中每盘棋的候选点：空点，不是劫争禁着点，也不是己方的眼
+        (四邻都是己方子或边框)。不检查自杀，由 _legal() 负责。
+        """
+        W = self.W
+        board = self.board[rows]
+        own = (board == self.to_play[rows][:, None]) | (board == BORDER)
+        eye = np.ones_like(own)
+        eye[:, W:-W] = own[:, :-2 * W] & own[:, 2 * W:] & own[:, W - 1:-W - 1] & own[:, W + 1:-W + 1]
+        cand = (board == EMPTY) & ~eye
+        ko = self.ko[rows]
+        has_ko = ko >= 0
+        cand[np.flatnonzero(has_ko), ko[has_ko]] = False
+        return cand
+
+    def _legal(self, rows: np.ndarray, moves: np.ndarray):
+        """
+        判断 rows 中每盘在 moves 落子是否合法(非自杀)。
+        同时返回相邻 4 个棋串的编号和气数，供落子时复用。
+        """
+        nbr = moves[:, None] + self.offsets[None, :]
+        r = rows[:, None]
+        colors = self.board[r, nbr]
+        labels = self.label[r, nbr]
+        libs = self._liberties(self.label[rows], self.board[rows] == EMPTY, labels)
+        me = self.to_play[rows][:, None]
+        opp = 3 - me
+        ok = (
+            (colors == EMPTY)
+            | ((colors == me) & (libs >= 2))
+            | ((colors == opp) & (libs == 1))
+        ).any(axis=1)
+        return ok, colors, labels, libs
+
+    def _place(self, rows, moves, colors, labels, libs):
+        me = self.to_play[rows]
+        opp = 3 - me
+        r = rows
+
+        # 提子：相邻对方串只剩一口气(就是落子点)
+        capture = (colors == opp[:, None]) & (libs == 1)
+        merge = (colors == me[:, None]) & (labels >= 0)
+        n_captured = np.zeros(len(rows), dtype=np.int64)
+        captured = None
+        touched = np.flatnonzero(capture.any(axis=1) | merge.any(axis=1))
+        if len(touched):
+            # 只对需要提子/合并的棋盘取出 label，按坐标写回改动的点
+            sub_label = self.label[r[touched]]
+            which = np.where(capture[touched], labels[touched], -2)
+            captured = (sub_label[:, None, :] == which[:, :, None]).any(axis=1)
+            i, j = np.nonzero(captured)
+            self.board[r[touched][i], j] = EMPTY
+            self.label[r[touched][i], j] = -1
+            n_captured[touched] = captured.sum(axis=1)
+
+            which = np.where(merge[touched], labels[touched], -2)
+            join = (sub_label[:, None, :] == which[:, :, None]).any(axis=1)
+            i, j = np.nonzero(join)
+            self.label[r[touched][i], j] = moves[touched][i]
+
+        # 落子，合并后的串编号为落子点下标
+        self.board[r, moves] = me
+        self.label[r, moves] = moves
+
+        # 单劫：只提一子、落子点没有己方相邻子、落子前也没有空的相邻点
+        single = (n_captured == 1) & ~merge.any(axis=1) & ~(colors == EMPTY).any(axis=1)
+        ko = np.full(len(rows), -1, dtype=np.int64)
+        if single.any():
+            pos = np.searchsorted(touched, np.flatnonzero(single))
+            ko[single] = captured[pos].argmax(axis=1)
+        self.ko[r] = ko
+        return n_captured
+
+    #########################################
+    # 推进
+    #########################################
+    def _choose(self, cand: np.ndarray, weights: Optional[np.ndarray]) -> np.ndarray:
+        """每行按权重随机选一个候选点；没有候选点的行返回 -1"""
+        if weights is None:
+            # 均匀抽样：在候选点的前缀和上二分
+            counts = cand.sum(axis=1)
+            pick = (self.rng.random(len(cand)) * counts).astype(np.int64)
+            choice = (cand.cumsum(axis=1, dtype=np.int16) > pick[:, None]).argmax(axis=1)
+            choice[counts == 0] = -1
+            return choice
+        # 加权抽样: key = u ** (1 / w)
+        keys = self.rng.random(cand.shape) ** (1.0 / np.where(weights > 0, weights, 1.0))
+        cand = cand & (weights > 0)
+        keys[~cand] = -1.0
+        choice = keys.argmax(axis=1)
+        choice[~cand.any(axis=1)] = -1
+        return choice
+
+    def step(self, policy: Optional[Policy] = None, tries: int = 4) -> int:
+        """所有未结束的棋盘各走一步(落子或 pass)，返回仍未结束的盘数"""
+        active = np.flatnonzero(~self.done)
+        if len(active) == 0:
+            return 0
+        cand = self.candidates(active)
+        weights = policy(self, active) if policy is not None else None
+
+        moves = np.full(len(active), -1, dtype=np.int64)
+        pending = np.arange(len(active))
+        for _ in range(tries):
+            choice = self._choose(cand[pending], None if weights is None else weights[pending])
+            has = choice >= 0
+            pending, choice = pending[has], choice[has]
+            if len(pending) == 0:
+                break
+            ok, colors, labels, libs = self._legal(active[pending], choice)
+            if ok.any():
+                rows = active[pending[ok]]
+                self._place(rows, choice[ok], colors[ok], labels[ok], libs[ok])
+                moves[pending[ok]] = choice[ok]
+            # 自杀点从候选里去掉后重选
+            bad = pending[~ok]
+            cand[bad, choice[~ok]] = False
+            pending = bad
+            if len(pending) == 0:
+                break
+
+        played = moves >= 0
+        self.passes[active[played]] = 0
+        passed = active[~played]
+        self.passes[passed] += 1
+        self.ko[passed] = -1
+        self.last_move[active] = moves
+        self.moves[active] += 1
+        self.to_play[active] = 3 - self.to_play[active]
+        self.done[active] = (self.passes[active] >= 2) | (self.moves[active] >= self.max_moves)
+        return int((~self.done).sum())
+
+    def playout(self, policy: Optional[Policy] = None) -> np.ndarray:
+        """一直走到所有棋盘结束，返回每盘黑方净胜目数(已扣贴目)"""
+        while self.step(policy):
+            pass
+        return self.score()
+
+    #########################################
+    # 点目
+    #########################################
+    def ownership(self) -> np.ndarray:
+        """
+        (K, size*size) 的归属：1 黑 / -1 白 / 0 中立。
+        棋子归本色；空点若四邻只有一种颜色(忽略边框)则归该色。playout 结束时
+        剩下的空点几乎都是单眼，这个近似足够。
+        """
+        board = self.board
+        black = board == BLACK
+        white = board == WHITE
+        near_black = self._dilate(black)
+        near_white = self._dilate(white)
+        empty = board == EMPTY
+        owner = black.astype(np.int8) - white.astype(np.int8)
+        owner = owner + (empty & near_black & ~near_white) - (empty & near_white & ~near_black)
+        return owner[:, self.points]
+
+    def score(self) -> np.ndarray:
+        return self.ownership().sum(axis=1) - self.komi
+
+
+#########################################
+# 策略
+#########################################
+def proximity_policy(engine: BatchGo, active: np.ndarray, boost: float = 8.0) -> np.ndarray:
+    """最近一手周围 8 个点权重更高，其余点权重为 1；空走时均匀"""
+    W = engine.W
+    weights = np.ones((len(active), engine.P), dtype=np.float64)
+    last = engine.last_move[active]
+    has = np.flatnonzero(last >= 0)
+    if len(has):
+        near = last[has][:, None] + np.array([-W - 1, -W, -W + 1, -1, 1, W - 1, W, W + 1])[None, :]
+        weights[has[:, None], near] = boost
+    return weights
+
+
+#########################################
+# 对外接口
+#########################################
+def estimate_position(tracker, to_play: int, komi: float, playouts: int = 256, seed: Optional[int] = None,
+                      policy: Optional[Policy] = None) -> dict:
+    """
+    从 tracker 的局面出发做 playouts 次随机对局，估计终局结果。
+    返回黑方平均净胜目数、黑胜率和每个点的平均归属(1 黑 / -1 白)。模块级函数，可交给 compute_pool。
+    """
+    engine = BatchGo.from_position(tracker, to_play, playouts, komi=komi, seed=seed)
+    scores = engine.playout(policy)
+    size = tracker.size
+    return {
+        "playouts": playouts,
+        "black_margin": float(scores.mean()),
+        "black_win_rate": float((scores > 0).mean()),
+        "ownership": engine.ownership().mean(axis=0).reshape(size, size).round(3).tolist(),
+    }
+
+
+def _copy_estimate(result: dict) -> dict:
+    """局面缓存是共享的：存入和取出都复制一份，调用方修改返回值不会污染缓存"""
+    return dict(result, ownership=[row[:] for row in result["ownership"]])
+
+
+def _estimate_key(game, playouts: int):
+    from backend.services.position_cache import PositionCache
+
+    return PositionCache.make_key(
+        "estimate", game.position().key, COLOR_CODES[game.current_player], (game.komi, playouts)
+    )
+
+
+def estimate_score(game, playouts: int = 256, seed: Optional[int] = None,
+                   policy: Optional[Policy] = None) -> dict:
+    """
+    在当前线程里对 GoGame 当前局面做 estimate_position。
+    默认参数(不指定 seed/policy)的结果放进共享的局面缓存，相同局面不再重复模拟。
+    """
+    from backend.services.position_cache import get_position_cache
+
+    cache = key = None
+    if seed is None and policy is None:
+        cache = get_position_cache()
+        key = _estimate_key(game, playouts)
+        cached = cache.get(key)
+        if cached is not None:
+            return _copy_estimate(cached)
+
+    result = estimate_position(game.position(), COLOR_CODES[game.current_player], game.komi, playouts, seed, policy)
+    if cache is not None:
+        cache.put(key, _copy_estimate(result))
+    return result
+
+
+async def estimate_score_async(game, playouts: int = 256) -> dict:
+    """
+    HTTP 接口用：模拟放到 compute_pool 子进程里，不占用事件循环和线程池。
+    局面先复制一份再交出去，序列化期间对局继续落子也不影响；结果同样进局面缓存。
+    """
+    from backend.services.compute_pool import get_compute_pool
+    from backend.services.position_cache import get_position_cache
+
+    cache = get_position_cache()
+    key = _estimate_key(game, playouts)
+    cached = cache.get(key)
+    if cached is not None:
+        return _copy_estimate(cached)
+    result = await get_compute_pool().run(
+        "estimate", estimate_position, game.position().copy(), COLOR_CODES[game.current_player], game.komi, playouts
+    )
+    cache.put(key, _copy_estimate(result))
+    return result
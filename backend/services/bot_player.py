@@ -0,0 +1,133 @@
+# backend/services/bot_player.py
+
+import asyncio
+import logging
+import os
+from typing import Awaitable, Callable, Dict, Optional
+
+from backend.services.compute_pool import get_compute_pool
+from backend.services.legal_moves import COLOR_CODES
+
+logger = logging.getLogger(__name__)
+
+# 机器人账号以此前缀开头；注册接口禁止使用该前缀
+BOT_PREFIX = "bot:"
+DEFAULT_BOT = "bot:mcts"
+
+# 每手思考时间的上下限(秒)
+BOT_MIN_THINK = float(os.getenv("BOT_MIN_THINK", "0.3"))
+BOT_MAX_THINK = float(os.getenv("BOT_MAX_THINK", "10"))
+
+# 全局实例，供其他模块导入使用
+bot_manager = None
+
+
+def is_bot(username: str) -> bool:
+    return bool(username) and username.startswith(BOT_PREFIX)
+
+
+def think_time(game, color: str) -> float:
+    """
+    按对局的计时设置分配本手时间：
+      - 主时间内：剩余主时间 / 预计剩余手数(空点数的 1/3，至少 10 手)
+      - 读秒中：每次读秒的一半
+    """
+    timer = game.timers[color]
+    if timer.main_time > 0:
+        empties = sum(1 for row in game.board for cell in row if cell is None)
+        budget = timer.main_time / max(10, empties // 3)
+    else:
+        budget = timer.byo_yomi * 0.5
+    return max(BOT_MIN_THINK, min(BOT_MAX_THINK, budget))
+
+
+def init_bot_manager(on_move: Callable[[str, object], Awaitable[None]]):
+    """初始化全局 bot_manager 实例；on_move(match_id, game) 负责把机器人的一手广播出去"""
+    global bot_manager
+    if bot_manager is None:
+        bot_manager = BotManager(on_move)
+    return bot_manager
+
+
+class BotManager:
+    """
+    机器人执子的对局里，轮到机器人时把搜索交给 compute_pool 子进程，
+    事件循环只负责提交任务和在结果回来后落子、广播。
+    每局同时最多一个搜索任务。
+    """
+
+    def __init__(self, on_move: Callable[[str, object], Awaitable[None]]):
+        self.on_move = on_move
+        self._thinking: Dict[str, asyncio.Task] = {}
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+
+    def maybe_move(self, match_id: str, game):
+        """对局状态变化后调用；轮到机器人且没有进行中的搜索时开始思考"""
+        if game.game_over or match_id in self._thinking:
+            return
+        player = game.black_player if game.current_player == "black" else game.white_player
+        if not is_bot(player):
+            return
+        self._loop = asyncio.get_running_loop()
+        self._thinking[match_id] = asyncio.create_task(self._think(match_id, game))
+
+    async def _think(self, match_id: str, game):
+        color = game.current_player
+        moves_before = len(game.move_records)
+        passes_before = game.passes
+        budget = think_time(game, color)
+        played = False
+        # mcts 会导入 numpy，只在真的有机器人对局时才加载
+        from backend.services.mcts import point_to_xy, search
+        try:
+            # 子进程的参数在 ProcessPoolExecutor 的线程里才序列化，先复制局面，思考期间落子也不影响
+            result = await get_compute_pool().run(
+                "bot_move", search, game.position().copy(), COLOR_CODES[color], game.komi, game.passes, budget
+            )
+            # 思考期间对局可能已结束(超时、对手认输)或被改动，此时放弃本次结果
+            if (game.game_over or game.current_player != color
+                    or len(game.move_records) != moves_before or game.passes != passes_before):
+                return
+
+            if result["resign"]:
+                game.resign(color)
+            else:
+                x, y = point_to_xy(game.board_size, result["move"])
+                success, message = game.play_move(x, y)
+                if not success:
+                    logger.warning(f"[bot] {match_id} move ({x},{y}) rejected: {message}, passing")
+                    game.play_move(None, None)
+            played = True
+            logger.info(
+                "[bot] move played",
+                extra={"match_id": match_id, "color": color, "move": result["move"],
+                       "win_rate": result["win_rate"], "playouts": result["playouts"],
+                       "elapsed": result["elapsed"], "budget": round(budget, 2)},
+            )
+            await self.on_move(match_id, game)
+        except Exception as e:
+            logger.error(f"[bot] search failed for match {match_id}: {e}")
+        finally:
+            self._thinking.pop(match_id, None)
+
+        if played:
+            # 机器人对机器人时继续下一手
+            self.maybe_move(match_id, game)
+
+    def cancel(self, match_id: str):
+        """
+        对局被删除、过期或已交给终局流水线时调用，放弃进行中的搜索。
+        可以从清理线程调用：不在事件循环里时转交给事件循环执行。
+        """
+        if self._loop is None:
+            return
+        try:
+            in_loop = asyncio.get_running_loop() is self._loop
+        except RuntimeError:
+            in_loop = False
+        if not in_loop:
+            self._loop.call_soon_threadsafe(self.cancel, match_id)
+            return
+        task = self._thinking.pop(match_id, None)
+        if task is not None:
+            task.cancel()
@@ -0,0 +1,87 @@
+# backend/services/compute_pool.py
+
+import asyncio
+import logging
+import multiprocessing
+import os
+from concurrent.futures import ProcessPoolExecutor
+from typing import Optional
+
+from backend.services import metrics
+
+logger = logging.getLogger(__name__)
+
+# CPU 密集任务(机器人搜索、死活计算)使用的进程数；默认留一个核给事件循环
+COMPUTE_WORKERS = int(os.getenv("COMPUTE_WORKERS", str(max(1, (os.cpu_count() or 2) - 1))))
+# 工作进程的 nice 值，保证对弈请求优先拿到 CPU
+COMPUTE_NICE = int(os.getenv("COMPUTE_NICE", "10"))
+
+# 全局实例，供其他模块导入使用
+compute_pool = None
+
+compute_tasks = metrics.registry.counter(
+    "compute_tasks_total", "Tasks submitted to the compute process pool", ["task"])
+compute_seconds = metrics.registry.histogram(
+    "compute_task_seconds", "Wall time of compute pool tasks, including queueing", ["task"],
+    buckets=metrics.LATENCY_BUCKETS + (5.0, 10.0, 30.0))
+compute_inflight = metrics.registry.gauge(
+    "compute_tasks_inflight", "Compute pool tasks submitted and not yet finished")
+
+
+def _init_worker(nice: int):
+    try:
+        os.nice(nice)
+    except (AttributeError, OSError):
+        pass
+    # 工作进程里不需要引擎的调试日志
+    logging.getLogger("backend").setLevel(logging.WARNING)
+
+
+class ComputePool:
+    """
+    进程池包装：
+      - 第一次提交任务时才创建进程，不使用机器人/死活功能时没有额外开销
+      - run() 在事件循环里 await，计算本身在子进程中进行，不占用事件循环
+      - 工作进程长期存在，进程内的缓存(如机器人的置换表)可在多次任务间复用
+    """
+
+    def __init__(self, workers: int = COMPUTE_WORKERS, nice: int = COMPUTE_NICE):
+        self.workers = workers
+        self.nice = nice
+        self._executor: Optional[ProcessPoolExecutor] = None
+
+    @property
+    def executor(self) -> ProcessPoolExecutor:
+        if self._executor is None:
+            logger.info(f"Starting compute pool with {self.workers} workers")
+            self._executor = ProcessPoolExecutor(
+                max_workers=self.workers, initializer=_init_worker, initargs=(self.nice,),
+                # 不用 fork：服务进程里有监听 socket、日志线程等，子进程不应继承
+                mp_context=multiprocessing.get_context("spawn"),
+            )
+        return self._executor
+
+    async def run(self, task: str, fn, *args):
+        """在子进程中执行 fn(*args)；fn 必须是模块级函数，参数和返回值可 pickle"""
+        loop = asyncio.get_running_loop()
+        compute_tasks.labels(task).inc()
+        compute_inflight.inc()
+        started = loop.time()
+        try:
+            return await loop.run_in_executor(self.executor, fn, *args)
+        finally:
+            compute_inflight.dec()
+            compute_seconds.labels(task).observe(loop.time() - started)
+
+    def close(self):
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
+
+
+def get_compute_pool() -> ComputePool:
+    """初始化(或获取)全局 compute_pool 实例"""
+    global compute_pool
+    if compute_pool is None:
+        compute_pool = ComputePool()
+    return compute_pool
@@ -0,0 +1,204 @@
+# backend/services/finalization.py
+
+"""
+终局后处理流水线。
+
+对局结束(认输、超时、连续 pass、点目确认)时 GoGame 调用 finalize_game()，
+这里只把 (match_id, game, 结束时间) 放进有界队列就返回，不在落子/广播路径上做任何事。
+后台 worker 每次取出至多 FINALIZE_BATCH 局，按注册顺序依次执行各个阶段：
+
+  - 每个阶段是 async handler(batch: List[FinishedGame])，一次处理整批
+  - 阶段失败按指数退避重试 FINALIZE_RETRIES 次，仍失败则记日志和指标，继续后面的阶段
+  - 阶段由使用方注册(main.py)：评分、写入对局存档、更新房间状态并通知大厅
+
+同一局只会进入流水线一次(GoGame.finalized)。
+"""
+
+import asyncio
+import json
+import logging
+import os
+import time
+from dataclasses import dataclass
+from typing import Awaitable, Callable, List, Optional
+
+from backend.services import metrics
+
+logger = logging.getLogger(__name__)
+
+FINALIZE_QUEUE_MAX = int(os.getenv("FINALIZE_QUEUE_MAX", "1024"))
+FINALIZE_WORKERS = int(os.getenv("FINALIZE_WORKERS", "2"))
+FINALIZE_BATCH = int(os.getenv("FINALIZE_BATCH", "32"))
+FINALIZE_RETRIES = int(os.getenv("FINALIZE_RETRIES", "3"))
+FINALIZE_RETRY_DELAY = float(os.getenv("FINALIZE_RETRY_DELAY", "0.5"))
+# 对局存档(JSON Lines，每局一行)，留空则不写
+GAME_ARCHIVE_PATH = os.getenv("GAME_ARCHIVE_PATH", "game_archive.jsonl")
+
+# 全局实例，供其他模块导入使用
+finalization_pipeline = None
+
+finalize_enqueued = metrics.registry.counter(
+    "finalize_games_enqueued_total", "Finished games handed to the finalization pipeline", ["result"])
+finalize_stage_runs = metrics.registry.counter(
+    "finalize_stage_runs_total", "Finalization stage executions per batch", ["stage", "result"])
+finalize_stage_seconds = metrics.registry.histogram(
+    "finalize_stage_seconds", "Time spent in one finalization stage for one batch", ["stage"])
+finalize_batch_size = metrics.registry.histogram(
+    "finalize_batch_size", "Games per finalization batch", buckets=metrics.SIZE_BUCKETS)
+finalize_queue_depth = metrics.registry.gauge(
+    "finalize_queue_depth", "Finished games waiting for finalization")
+
+
+@dataclass
+class FinishedGame:
+    match_id: str
+    game: object
+    finished_at: float
+    # 评分阶段已把这一局计入等级分；阶段重试时只重做持久化，不重复计分
+    rated: bool = False
+
+    def to_record(self) -> dict:
+        """存档用的对局记录"""
+        game = self.game
+        return {
+            "match_id": self.match_id,
+            "black_player": game.black_player,
+            "white_player": game.white_player,
+            "board_size": game.board_size,
+            "komi": game.komi,
+            "winner": game.winner,
+            "moves": [[color, x, y] for color, x, y in game.move_records],
+            "captured": game.captured,
+            "dead_stones": sorted(game.dead_stones),
+            "finished_at": self.finished_at,
+        }
+
+
+Stage = Callable[[List[FinishedGame]], Awaitable[None]]
+
+
+class FinalizationPipeline:
+    def __init__(self, maxsize: int = FINALIZE_QUEUE_MAX, workers: int = FINALIZE_WORKERS,
+                 batch: int = FINALIZE_BATCH, retries: int = FINALIZE_RETRIES,
+                 retry_delay: float = FINALIZE_RETRY_DELAY):
+        self.maxsize = maxsize
+        self.workers = workers
+        self.batch = batch
+        self.retries = retries
+        self.retry_delay = retry_delay
+        self.stages: List[tuple] = []     # (name, handler)
+        self._queue: Optional[asyncio.Queue] = None
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._tasks: List[asyncio.Task] = []
+        finalize_queue_depth.set_function(lambda: self._queue.qsize() if self._queue else 0)
+
+    def add_stage(self, name: str, handler: Stage):
+        self.stages.append((name, handler))
+
+    def start(self):
+        if self._tasks:
+            return
+        self._loop = asyncio.get_running_loop()
+        self._queue = asyncio.Queue(self.maxsize)
+        self._tasks = [asyncio.create_task(self._worker()) for _ in range(self.workers)]
+
+    async def stop(self, timeout: float = 5.0):
+        """关机时调用：等待队列里已有的对局处理完(最多 timeout 秒)"""
+        if not self._tasks:
+            return
+        try:
+            await asyncio.wait_for(self._queue.join(), timeout)
+        except asyncio.TimeoutError:
+            logger.warning(f"Finalization pipeline stopped with {self._queue.qsize()} games pending")
+        for task in self._tasks:
+            task.cancel()
+        self._tasks = []
+
+    #########################################
+    # 入队：可能在事件循环线程，也可能在同步路由的线程池里被调用
+    #########################################
+    def enqueue(self, match_id: str, game):
+        item = FinishedGame(match_id, game, time.time())
+        if self._loop is None:
+            logger.debug(f"Finalization pipeline not started, skipping match {match_id}")
+            finalize_enqueued.labels("skipped").inc()
+            return
+        try:
+            in_loop = asyncio.get_running_loop() is self._loop
+        except RuntimeError:
+            in_loop = False
+        if in_loop:
+            self._put(item)
+        else:
+            self._loop.call_soon_threadsafe(self._put, item)
+
+    def _put(self, item: FinishedGame):
+        try:
+            self._queue.put_nowait(item)
+            finalize_enqueued.labels("queued").inc()
+        except asyncio.QueueFull:
+            finalize_enqueued.labels("dropped").inc()
+            logger.error(f"Finalization queue full, dropping match {item.match_id}")
+
+    #########################################
+    # 后台处理
+    #########################################
+    async def _worker(self):
+        queue = self._queue
+        while True:
+            batch = [await queue.get()]
+            while len(batch) < self.batch and not queue.empty():
+                batch.append(queue.get_nowait())
+            finalize_batch_size.observe(len(batch))
+            try:
+                for name, handler in self.stages:
+                    await self._run_stage(name, handler, batch)
+            finally:
+                for _ in batch:
+                    queue.task_done()
+
+    async def _run_stage(self, name: str, handler: Stage, batch: List[FinishedGame]):
+        for attempt in range(self.retries + 1):
+            started = time.perf_counter()
+            try:
+                await handler(batch)
+                finalize_stage_runs.labels(name, "ok").inc()
+                return
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                finalize_stage_runs.labels(name, "error").inc()
+                if attempt == self.retries:
+                    logger.error(
+                        f"[finalize] stage {name} failed for {[item.match_id for item in batch]}: {e}",
+                        exc_info=True,
+                    )
+                    return
+                logger.warning(f"[finalize] stage {name} failed (attempt {attempt + 1}), retrying: {e}")
+                await asyncio.sleep(self.retry_delay * (2 ** attempt))
+            finally:
+                finalize_stage_seconds.labels(name).observe(time.perf_counter() - started)
+
+
+def get_finalization_pipeline() -> FinalizationPipeline:
+    """初始化(或获取)全局 finalization_pipeline 实例"""
+    global finalization_pipeline
+    if finalization_pipeline is None:
+        finalization_pipeline = FinalizationPipeline()
+    return finalization_pipeline
+
+
+#########################################
+# 对局存档阶段
+#########################################
+def _append_records(path: str, lines: List[str]):
+    with open(path, "a", encoding="utf-8") as f:
+        f.write("".join(lines))
+
+
+async def archive_games(batch: List[FinishedGame]):
+    """把整批对局追加写入 GAME_ARCHIVE_PATH(在线程里写文件，不阻塞事件循环)"""
+    if not GAME_ARCHIVE_PATH:
+        return
+    lines = [json.dumps(item.to_record(), ensure_ascii=False) + "\n" for item in batch]
+    await asyncio.to_thread(_append_records, GAME_ARCHIVE_PATH, lines)
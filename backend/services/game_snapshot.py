@@ -0,0 +1,94 @@
+# backend/services/game_snapshot.py
+
+"""
+game_update 快照只序列化一次，多处复用:
+  - GoGame.version 在每次状态变化时递增
+  - get_game_snapshot() 按 (match_id, version) 缓存已经编码好的 JSON 文本
+  - Socket.IO 使用本模块的 dumps/loads，遇到 EncodedPayload 时直接拼接原始 JSON，
+    不再对棋盘做第二次编码
+  - 只有 get_game_snapshot() 生成的快照标记为 collapsible，发送队列里可以被更新的快照替换；
+    客户端转发的 game_update、带 scoring_data / error 的更新都不参与合并
+"""
+
+import json
+
+_SEPARATORS = (',', ':')
+# 追加这些字段后的快照不再是"只需最新一条"的完整状态
+_NON_COLLAPSIBLE_FIELDS = {"scoring_data", "error"}
+
+
+class EncodedPayload:
+    """已经编码好的 JSON 对象，type 即 Socket.IO 事件名依据的 message type"""
+
+    __slots__ = ("type", "raw", "collapsible")
+
+    def __init__(self, msg_type: str, raw: str, collapsible: bool = False):
+        self.type = msg_type
+        self.raw = raw
+        self.collapsible = collapsible
+
+    def with_fields(self, **fields) -> "EncodedPayload":
+        """在已编码对象末尾追加字段(如 error / scoring_data)，不重新编码原有内容"""
+        if not fields:
+            return self
+        extra = json.dumps(fields, separators=_SEPARATORS)
+        collapsible = self.collapsible and not (fields.keys() & _NON_COLLAPSIBLE_FIELDS)
+        return EncodedPayload(self.type, self.raw[:-1] + "," + extra[1:], collapsible)
+
+    def __len__(self):
+        return len(self.raw)
+
+
+def encode_message(message: dict) -> EncodedPayload:
+    return EncodedPayload(message.get("type"), json.dumps(message, separators=_SEPARATORS))
+
+
+def build_game_state(match_id: str, game) -> dict:
+    """所有 game_update 共用的对局状态字段"""
+    state = {
+        "type": "game_update",
+        "match_id": match_id,
+        "board": game.board,
+        "current_player": game.current_player,
+        "black_player": game.black_player,
+        "white_player": game.white_player,
+        "game_over": game.game_over,
+        "winner": game.winner,
+        "captured": game.captured,
+        "black_timer": game.timers["black"].to_dict(),
+        "white_timer": game.timers["white"].to_dict(),
+    }
+    if game.push_legal_moves:
+        # 当前执棋方的合法着点位图(十六进制)，第 x * size + y 位对应 (x, y)
+        state["legal_moves"] = format(game.legal_moves(), "x")
+    return state
+
+
+def get_game_snapshot(match_id: str, game) -> EncodedPayload:
+    """返回当前版本的已编码快照；版本未变时直接复用缓存"""
+    cached = game._snapshot
+    if cached is not None and cached[0] == game.version and cached[1] == match_id:
+        return cached[2]
+    payload = encode_message(build_game_state(match_id, game))
+    payload.collapsible = True
+    game._snapshot = (game.version, match_id, payload)
+    return payload
+
+
+#########################################
+# 供 socketio.AsyncServer(json=...) 使用
+#########################################
+def dumps(obj, *args, **kwargs):
+    if isinstance(obj, list) and any(isinstance(item, EncodedPayload) for item in obj):
+        parts = [
+            item.raw if isinstance(item, EncodedPayload) else json.dumps(item, *args, **kwargs)
+            for item in obj
+        ]
+        return "[" + ",".join(parts) + "]"
+    if isinstance(obj, EncodedPayload):
+        return obj.raw
+    return json.dumps(obj, *args, **kwargs)
+
+
+def loads(*args, **kwargs):
+    return json.loads(*args, **kwargs)
@@ -0,0 +1,81 @@
+# backend/services/game_state.py
+
+"""
+GoGame 里按手数增长的状态的紧凑表示。
+
+  - MoveRecords：落子记录，每手一个 uint16(color << 15 | x * size + y)，放在 array 里；
+    对外仍按 (color, x, y) 迭代/下标访问，调用方不需要关心编码
+  - Timer / GameTimers：计时器，__slots__ 结构体代替嵌套 dict；发给前端时用 to_dict()
+
+同形历史直接用 array("Q") 存 64 位 Zobrist key (见 legal_moves.zobrist_table)，不在这里单独封装。
+休眠 blob (hibernation.py) 里的落子段与 MoveRecords.packed 是同一种编码。
+"""
+
+from array import array
+from typing import Iterator, Tuple
+
+WHITE_BIT = 0x8000
+POINT_MASK = 0x7FFF
+_COLORS = ("black", "white")
+
+
+class MoveRecords:
+    __slots__ = ("size", "packed")
+
+    def __init__(self, size: int, packed: array = None):
+        self.size = size
+        self.packed = packed if packed is not None else array("H")
+
+    def append(self, move: Tuple[str, int, int]):
+        color, x, y = move
+        self.packed.append((WHITE_BIT if color == "white" else 0) | (x * self.size + y))
+
+    def _decode(self, value: int) -> Tuple[str, int, int]:
+        x, y = divmod(value & POINT_MASK, self.size)
+        return _COLORS[value >> 15], x, y
+
+    def __len__(self) -> int:
+        return len(self.packed)
+
+    def __iter__(self) -> Iterator[Tuple[str, int, int]]:
+        decode = self._decode
+        for value in self.packed:
+            yield decode(value)
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return [self._decode(value) for value in self.packed[index]]
+        return self._decode(self.packed[index])
+
+    def __repr__(self):
+        return f"MoveRecords({list(self)!r})"
+
+
+class Timer:
+    __slots__ = ("main_time", "byo_yomi", "periods", "last_update")
+
+    def __init__(self, main_time, byo_yomi, periods, last_update=None):
+        self.main_time = main_time
+        self.byo_yomi = byo_yomi
+        self.periods = periods
+        self.last_update = last_update
+
+    def to_dict(self) -> dict:
+        return {
+            "main_time": self.main_time,
+            "byo_yomi": self.byo_yomi,
+            "periods": self.periods,
+            "last_update": self.last_update,
+        }
+
+
+class GameTimers:
+    """双方计时器，按颜色取：timers["black"]"""
+    __slots__ = ("black", "white")
+
+    def __init__(self, black: Timer, white: Timer):
+        self.black = black
+        self.white = white
+
+    def __getitem__(self, color: str) -> Timer:
+        return self.white if color == "white" else self.black
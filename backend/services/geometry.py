@@ -0,0 +1,141 @@
+# backend/services/geometry.py
+
+"""
+按棋盘大小预先算好的几何表，整个进程共享(9/13/19 以及 SGF 里的任意大小，第一次用到时生成)。
+
+坐标约定与 legal_moves 一致：点 (x, y) 的序号 p = x * size + y，位图第 p 位对应该点。
+
+  - neighbors[p] / neighbor_mask[p]：相邻点序号 / 相邻点位图(供位图引擎使用)
+  - adjacent[x][y]：相邻点坐标 (nx, ny)，供按二维 board 计算的代码直接迭代，不再做越界判断
+  - line[p]：到最近边的距离(0 为一线)
+  - edge_mask / corner_mask / first_col / last_col：一线、四个角、第一列、最后一列的位图
+  - dilate(mask)：位图向上下左右各扩一格(等于 mask 内各点 neighbor_mask 的并集)，用移位实现
+  - symmetries：8 个二面体对称变换，每个是长度 size * size 的置换，symmetries[t][p] 为 p 的像；
+    symmetries[0] 为恒等变换
+  - star_points：星位坐标
+  - padded_points：带一圈边框的 (size + 2) ** 2 数组里各点的下标(batch_engine 的棋盘表示)
+  - to_sgf / from_sgf：与 SGF 坐标互转(x=0 在底行，SGF row=0 在顶行)
+
+    geometry = get_geometry(19)
+    for nx, ny in geometry.adjacent[x][y]: ...
+"""
+
+from functools import lru_cache
+from typing import Tuple
+
+
+def _star_points(size: int) -> Tuple[Tuple[int, int], ...]:
+    """13 路以上在四线，7~12 路在三线；奇数路 9 路以上加天元，15 路以上再加四个边星"""
+    if size < 7:
+        return ()
+    d = 3 if size >= 13 else 2
+    far = size - 1 - d
+    points = [(d, d), (d, far), (far, d), (far, far)]
+    if size % 2 == 1 and size >= 9:
+        mid = size // 2
+        points.append((mid, mid))
+        if size >= 15:
+            points += [(d, mid), (far, mid), (mid, d), (mid, far)]
+    return tuple(sorted(points))
+
+
+class Geometry:
+    __slots__ = (
+        "size", "points", "neighbors", "neighbor_mask", "adjacent", "line", "full_mask",
+        "edge_mask", "corner_mask", "first_col", "last_col", "symmetries", "star_points",
+        "star_mask", "padded_width", "padded_points",
+    )
+
+    def __init__(self, size: int):
+        self.size = size
+        n = self.points = size * size
+
+        neighbors = []
+        masks = []
+        for x in range(size):
+            for y in range(size):
+                ns = tuple(
+                    nx * size + ny
+                    for nx, ny in ((x - 1, y), (x + 1, y), (x, y - 1), (x, y + 1))
+                    if 0 <= nx < size and 0 <= ny < size
+                )
+                neighbors.append(ns)
+                m = 0
+                for q in ns:
+                    m |= 1 << q
+                masks.append(m)
+        self.neighbors = tuple(neighbors)
+        self.neighbor_mask = tuple(masks)
+        self.adjacent = tuple(
+            tuple(tuple(divmod(q, size) for q in neighbors[x * size + y]) for y in range(size))
+            for x in range(size)
+        )
+        self.line = tuple(min(x, y, size - 1 - x, size - 1 - y) for x in range(size) for y in range(size))
+
+        self.full_mask = (1 << n) - 1
+        self.edge_mask = sum(1 << p for p in range(n) if self.line[p] == 0)
+        last = size - 1
+        self.corner_mask = sum(1 << (x * size + y) for x in (0, last) for y in (0, last))
+        self.first_col = sum(1 << (x * size) for x in range(size))
+        self.last_col = sum(1 << (x * size + last) for x in range(size))
+
+        transforms = (
+            lambda x, y: (x, y),
+            lambda x, y: (y, last - x),
+            lambda x, y: (last - x, last - y),
+            lambda x, y: (last - y, x),
+            lambda x, y: (x, last - y),
+            lambda x, y: (last - x, y),
+            lambda x, y: (y, x),
+            lambda x, y: (last - y, last - x),
+        )
+        symmetries = []
+        for transform in transforms:
+            perm = []
+            for p in range(n):
+                tx, ty = transform(*divmod(p, size))
+                perm.append(tx * size + ty)
+            symmetries.append(tuple(perm))
+        self.symmetries = tuple(symmetries)
+
+        self.star_points = _star_points(size)
+        self.star_mask = sum(1 << (x * size + y) for x, y in self.star_points)
+
+        w = self.padded_width = size + 2
+        self.padded_points = tuple((x + 1) * w + y + 1 for x in range(size) for y in range(size))
+
+    def __reduce__(self):
+        # 随 LegalMoveTracker 传给 compute_pool 子进程时只传大小，在子进程里查它自己的缓存
+        return get_geometry, (self.size,)
+
+    def on_board(self, x: int, y: int) -> bool:
+        return 0 <= x < self.size and 0 <= y < self.size
+
+    def dilate(self, mask: int) -> int:
+        """mask 中各点的相邻点位图(不一定包含 mask 本身)"""
+        size = self.size
+        return (
+            (mask << size) | (mask >> size)
+            | ((mask & ~self.last_col) << 1) | ((mask & ~self.first_col) >> 1)
+        ) & self.full_mask
+
+    def transform_mask(self, mask: int, t: int) -> int:
+        """位图在第 t 个对称变换下的像"""
+        perm = self.symmetries[t]
+        out = 0
+        while mask:
+            low = mask & -mask
+            out |= 1 << perm[low.bit_length() - 1]
+            mask ^= low
+        return out
+
+    def to_sgf(self, x: int, y: int) -> Tuple[int, int]:
+        return self.size - 1 - x, y
+
+    def from_sgf(self, row: int, col: int) -> Tuple[int, int]:
+        return self.size - 1 - row, col
+
+
+@lru_cache(maxsize=None)
+def get_geometry(size: int) -> Geometry:
+    return Geometry(size)
@@ -1,16 +1,26 @@
-import hashlib
-import copy
 import time
 import logging
+import threading
+from array import array
+
+from backend.log_config import board_to_text
+from backend.services.legal_moves import LegalMoveTracker, COLOR_CODES, zobrist_table
+from backend.services.game_state import MoveRecords, Timer, GameTimers
+from backend.services.geometry import get_geometry
+from backend.services.hibernation import HIBERNATED_FIELDS, rehydrate
 
 logger = logging.getLogger(__name__)
 
 def finalize_game(match_id, game):
     """
-    当对局结束时，可在此处进行ELO计算、存储对局结果等自定义逻辑。
-    当前函数仅作占位示例。
+    对局结束时调用：交给终局流水线(见 finalization.py)异步处理评分、存档、房间状态和大厅通知。
+    这里只入队，不阻塞本手棋的广播；同一局只入队一次。
     """
-    pass
+    if game.finalized:
+        return
+    game.finalized = True
+    from backend.services.finalization import get_finalization_pipeline
+    get_finalization_pipeline().enqueue(match_id, game)
 
 class GoGame:
     """
@@ -22,8 +32,18 @@ class GoGame:
     - players: 可选的玩家列表，后续可能扩展多人旁观、AI对弈等
     - main_time / byo_yomi_time / byo_yomi_periods: 计时规则相关
     - sgf_content: 如果传入SGF内容，则在初始化时直接复盘到对应棋面
+
+    同时在线的对局可能很多，实例用 __slots__，按手数增长的状态用紧凑表示(见 game_state.py)：
+    history 为 64 位 Zobrist key 的 array，move_records 每手一个 uint16。
     """
 
+    __slots__ = (
+        "_blob", "lock", "board_size", "geometry", "komi", "board", "history", "captured", "current_player", "passes",
+        "game_over", "winner", "status", "match_id", "finalized", "version", "touched_at", "_snapshot",
+        "_replay", "_legal", "push_legal_moves", "move_records", "setup_moves", "timers",
+        "black_player", "white_player", "players", "dead_stones",
+    )
+
     def __init__(
         self,
         board_size=19,
@@ -42,42 +62,56 @@ class GoGame:
           - 初始化计时器
           - 如果有SGF内容，则调用 _init_from_sgf() 解析并落子到当前棋盘
         """
+        # _blob 非空表示已休眠：大字段被移走，第一次访问时恢复 (见 hibernation.py)
+        # lock 保护休眠/恢复，线程池里的同步接口改对局时也持有它
+        self._blob = None
+        self.lock = threading.RLock()
         self.board_size = board_size
+        # 按大小共享的邻接表等 (见 geometry.py)
+        self.geometry = get_geometry(board_size)
         self.komi = komi
 
         # 创建 board_size x board_size 的空棋盘
         self.board = [[None for _ in range(board_size)] for _ in range(board_size)]
 
         # 棋局相关的基础状态
-        self.history = []            # 用于记录局面哈希，检测打劫等
+        self.history = array("Q")    # 每手之后的局面 key (get_board_hash)，检测打劫等
         self.captured = {"black": 0, "white": 0}
         self.current_player = "black"
         self.passes = 0
         self.game_over = False
         self.winner = None
+        self.status = None
+        # 所属对局 ID(由 match_service 创建对局时写入)；finalized 表示已交给终局流水线
+        self.match_id = None
+        self.finalized = False
+
+        # 状态版本号：任何会改变 game_update 内容的操作都要调用 touch()
+        # _snapshot 缓存该版本已编码的 game_update (见 game_snapshot.py)
+        self.version = 0
+        self.touched_at = time.time()
+        self._snapshot = None
+        # _replay 为向对局双方广播的 seq 与增量环形缓冲 (见 replay_log.py)
+        self._replay = None
+
+        # 合法着点位图，随落子增量维护 (见 legal_moves.py)
+        # push_legal_moves 为 True 时 game_update 附带当前执棋方的合法着点
+        self._legal = LegalMoveTracker(board_size)
+        self.push_legal_moves = False
 
         # 注意：一定要先初始化 move_records ，
         # 以免在 _init_from_sgf() 中 self.move_records.append(...) 时出错
-        self.move_records = []  # 用于记录每一步 (color, x, y)
+        self.move_records = MoveRecords(board_size)  # 用于记录每一步 (color, x, y)
+        self.setup_moves = 0    # move_records 开头有几手是 SGF 直接摆上的(没有提子)
 
         # 记录当前时间，用于计时器
         current_time = time.time()
 
         # 计时器信息
-        self.timers = {
-            "black": {
-                "main_time": main_time,
-                "byo_yomi": byo_yomi_time,
-                "periods": byo_yomi_periods,
-                "last_update": current_time
-            },
-            "white": {
-                "main_time": main_time,
-                "byo_yomi": byo_yomi_time,
-                "periods": byo_yomi_periods,
-                "last_update": current_time
-            }
-        }
+        self.timers = GameTimers(
+            Timer(main_time, byo_yomi_time, byo_yomi_periods, current_time),
+            Timer(main_time, byo_yomi_time, byo_yomi_periods, current_time),
+        )
 
         # 玩家信息
         self.black_player = black_player
@@ -90,15 +124,10 @@ class GoGame:
 
         # 如果提供了SGF内容，则尝试根据SGF初始化棋盘
         if sgf_content:
-            logger.info(
-                f"Initializing board from SGF content: "
-                f"{sgf_content[:200]}..."
-            )
+            logger.debug("Initializing board from SGF content: %.200s...", sgf_content)
             self._init_from_sgf(sgf_content)
             # SGF初始化后，默认当前下子方为黑棋
             self.current_player = "black"
-        else:
-            logger.info("No SGF content provided")
 
     def _init_from_sgf(self, sgf_content: str):
         """
@@ -110,7 +139,6 @@ class GoGame:
         """
         try:
             from sgfmill import sgf
-            logger.info("Starting SGF parsing")
 
             # SGF是文本格式，这里需转成字节
             sgf_bytes = sgf_content.encode('utf-8')
@@ -119,79 +147,112 @@ class GoGame:
             # 若SGF大小与当前board_size不一致，尝试同步到SGF大小
             size = sgf_game.get_size()
             if size != self.board_size:
-                logger.info(
-                    f"Adjusting board size from {self.board_size} to SGF size {size}"
-                )
+                logger.info("Adjusting board size from %s to SGF size %s", self.board_size, size)
                 self.board_size = size
+                self.geometry = get_geometry(size)
                 self.board = [[None for _ in range(size)] for _ in range(size)]
+                self._legal = LegalMoveTracker(size)
+                self.move_records = MoveRecords(size)
 
             # 获取所有主分支上的着手 (不考虑变体分支)
+            geometry = self.geometry
             moves = []
             for node in sgf_game.get_main_sequence():
                 color, move = node.get_move()
                 if color and move:
-                    row, col = move
                     # sgf中 row=0 表示顶行，col=0 表示左列
                     # 我们的board中 x=0 表示底行，所以要做一下转换
-                    x = size - 1 - row
-                    y = col
+                    x, y = geometry.from_sgf(*move)
                     stone_color = "black" if color == "b" else "white"
                     moves.append((stone_color, x, y))
 
-            logger.info(f"Found {len(moves)} moves in SGF")
+            logger.info("Found %d moves in SGF", len(moves))
+            debug = logger.isEnabledFor(logging.DEBUG)
 
             # 按顺序将SGF中的每步落子放置到 self.board
             for (color, x, y) in moves:
-                if self.is_on_board(x, y):
-                    logger.info(f"Placing {color} stone at ({x}, {y})")
+                if geometry.on_board(x, y):
+                    if debug:
+                        logger.debug("Placing %s stone at (%d, %d)", color, x, y)
                     if self.board[x][y] is not None:
-                        logger.warning(
-                            f"Position ({x}, {y}) already occupied by {self.board[x][y]}"
-                        )
+                        logger.warning("Position (%d, %d) already occupied by %s", x, y, self.board[x][y])
                     self.board[x][y] = color
+                    self._legal.place_raw(x * size + y, COLOR_CODES[color])
                     # 记录在 move_records
                     self.move_records.append((color, x, y))
 
-                    # 计算历史哈希
-                    board_hash = self.get_board_hash()
-                    self.history.append(board_hash)
+                    # 记录局面 key (与 get_board_hash 相同，由 tracker 增量维护)
+                    self.history.append(self._legal.key)
                 else:
-                    logger.warning(f"Move ({x}, {y}) is out of board")
+                    logger.warning("Move (%d, %d) is out of board", x, y)
+
+            self._legal.rebuild()
+            self.setup_moves = len(self.move_records)
 
             # 打印最终棋盘用于调试
-            board_str = "\n".join([
-                " ".join(
-                    "B" if cell == "black"
-                    else "W" if cell == "white"
-                    else "."
-                    for cell in row
-                )
-                for row in self.board
-            ])
-            logger.info(f"Final board state:\n{board_str}")
+            if debug:
+                logger.debug("Final board state:\n%s", board_to_text(self.board))
 
         except Exception as e:
             logger.error(f"Error parsing SGF: {e}")
             # 如果解析失败，就把棋盘重置为空，并清空 move_records
+            self.geometry = get_geometry(self.board_size)
             self.board = [[None for _ in range(self.board_size)]
                           for _ in range(self.board_size)]
-            self.move_records = []
-            self.history = []
+            self.move_records = MoveRecords(self.board_size)
+            self.history = array("Q")
+            self._legal = LegalMoveTracker(self.board_size)
+
+    def __getattr__(self, name):
+        # 只有休眠后被移走的字段会走到这里(正常字段不经过 __getattr__)
+        try:
+            blob = object.__getattribute__(self, "_blob")
+        except AttributeError:
+            blob = None
+        if blob is None or name not in HIBERNATED_FIELDS:
+            raise AttributeError(name)
+        rehydrate(self)
+        return object.__getattribute__(self, name)
+
+    def touch(self):
+        """标记对局状态已变化，使已编码的快照失效"""
+        self.version += 1
+        self.touched_at = time.time()
+
+    def legal_moves(self, player=None) -> int:
+        """
+        返回 player(默认当前执棋方)的合法着点位图：第 x * board_size + y 位为 1
+        表示 (x, y) 可以落子。已考虑占用、自杀和全局同形(打劫)。
+        """
+        if self.game_over:
+            return 0
+        return self._legal.legal_moves(COLOR_CODES[player or self.current_player])
+
+    def position(self) -> LegalMoveTracker:
+        """当前局面(棋串、Zobrist key、同形历史)，供搜索使用；调用方不要直接修改，需要时先 copy()"""
+        return self._legal
+
+    def refresh_legal_moves(self):
+        """直接改写 self.board (而非通过 play_move) 之后调用，按当前棋盘重建合法着点"""
+        self._legal.load_board(self.board)
 
     def is_on_board(self, x, y) -> bool:
         """判断 (x, y) 是否在有效棋盘范围内。"""
         return 0 <= x < self.board_size and 0 <= y < self.board_size
 
-    def get_board_hash(self) -> str:
+    def get_board_hash(self) -> int:
         """
-        计算当前棋盘的哈希，以检测打劫等。
-        每个位置取首字母(b/w)或 '.' 连接起来，再做sha256。
+        计算当前棋盘的 64 位 Zobrist key，以检测打劫等。
+        与 LegalMoveTracker.key 使用同一张表，棋盘和 tracker 同步时两者相等。
         """
-        board_string = ''.join(
-            ''.join((cell[0] if cell else '.') for cell in row)
-            for row in self.board
-        )
-        return hashlib.sha256(board_string.encode()).hexdigest()
+        table = zobrist_table(self.board_size)
+        size = self.board_size
+        key = 0
+        for x, row in enumerate(self.board):
+            for y, cell in enumerate(row):
+                if cell is not None:
+                    key ^= table[COLOR_CODES[cell]][x * size + y]
+        return key
 
     def count_liberties(self, x, y, visited=None) -> int:
         """
@@ -207,13 +268,11 @@ class GoGame:
         player = self.board[x][y]
         liberties = 0
 
-        for dx, dy in [(-1, 0), (1, 0), (0, -1), (0, 1)]:
-            nx, ny = x + dx, y + dy
-            if self.is_on_board(nx, ny):
-                if self.board[nx][ny] is None:
-                    liberties += 1
-                elif self.board[nx][ny] == player:
-                    liberties += self.count_liberties(nx, ny, visited)
+        for nx, ny in self.geometry.adjacent[x][y]:
+            if self.board[nx][ny] is None:
+                liberties += 1
+            elif self.board[nx][ny] == player:
+                liberties += self.count_liberties(nx, ny, visited)
 
         return liberties
 
@@ -227,6 +286,7 @@ class GoGame:
         group = []
         stack = [(x, y)]
         player = self.board[x][y]
+        adjacent = self.geometry.adjacent
 
         while stack:
             cx, cy = stack.pop()
@@ -235,9 +295,8 @@ class GoGame:
             visited.add((cx, cy))
             group.append((cx, cy))
 
-            for dx, dy in [(-1, 0), (1, 0), (0, -1), (0, 1)]:
-                nx, ny = cx + dx, cy + dy
-                if self.is_on_board(nx, ny) and self.board[nx][ny] == player:
+            for nx, ny in adjacent[cx][cy]:
+                if self.board[nx][ny] == player:
                     stack.append((nx, ny))
 
         return group
@@ -253,9 +312,8 @@ class GoGame:
         captured_any = False
         to_capture = []
 
-        for dx, dy in [(-1, 0), (1, 0), (0, -1), (0, 1)]:
-            nx, ny = x + dx, y + dy
-            if self.is_on_board(nx, ny) and self.board[nx][ny] == opponent:
+        for nx, ny in self.geometry.adjacent[x][y]:
+            if self.board[nx][ny] == opponent:
                 if self.count_liberties(nx, ny) == 0:
                     group = self.get_group(nx, ny)
                     to_capture.extend(group)
@@ -302,30 +360,32 @@ class GoGame:
         player = self.current_player
         timer = self.timers[player]
 
-        if timer["last_update"]:
-            elapsed = current_time - timer["last_update"]
+        if timer.last_update:
+            elapsed = current_time - timer.last_update
 
             # 先耗主时间
-            if timer["main_time"] > 0:
-                timer["main_time"] = max(0, timer["main_time"] - elapsed)
+            if timer.main_time > 0:
+                timer.main_time = max(0, timer.main_time - elapsed)
             # 主时间耗尽后，进入读秒
-            elif timer["byo_yomi"] > 0:
-                timer["byo_yomi"] = max(0, timer["byo_yomi"] - elapsed)
-                if timer["byo_yomi"] <= 0:
-                    timer["periods"] -= 1
-                    if timer["periods"] > 0:
+            elif timer.byo_yomi > 0:
+                timer.byo_yomi = max(0, timer.byo_yomi - elapsed)
+                if timer.byo_yomi <= 0:
+                    timer.periods -= 1
+                    if timer.periods > 0:
                         # 还有剩余读秒周期则重置读秒
-                        timer["byo_yomi"] = self.timers[player]["byo_yomi"]
+                        timer.byo_yomi = self.timers[player].byo_yomi
                     else:
                         # 所有读秒都用完 => 判负
                         self.game_over = True
                         opponent = "white" if player == "black" else "black"
                         self.winner = f"{opponent} wins by timeout"
-                        finalize_game("<some-match-id>", self)
+                        self.touch()
+                        finalize_game(self.match_id, self)
                         return
 
         # 更新 last_update
-        timer["last_update"] = current_time
+        timer.last_update = current_time
+        self.touch()
 
     def play_move(self, x, y) -> (bool, str):
         """
@@ -346,10 +406,11 @@ class GoGame:
         if x is None and y is None:
             # pass
             self.passes += 1
+            self.touch()
             if self.passes >= 2:
                 self.game_over = True
                 self.winner = "Draw by consecutive passes"
-                finalize_game("<some-match-id>", self)
+                # 进入点目阶段，胜负在 confirm_scoring(final_scoring) 时确定并交给终局流水线
             else:
                 self.current_player = (
                     "white" if self.current_player == "black" else "black"
@@ -362,28 +423,25 @@ class GoGame:
         if not valid:
             return False, msg
 
-        # 先保存落子前的状态，用于检测打劫
-        old_board = copy.deepcopy(self.board)
-        old_captured = self.captured.copy()
+        # 落子前先算出落子(含提子)后的局面 key，用于检测打劫，不需要先改棋盘再回滚
+        p = x * self.board_size + y
+        color = COLOR_CODES[self.current_player]
+        board_hash = self._legal.key_after(p, color)
+        if board_hash in self.history:
+            return False, "Ko detected"
 
         # 落子
         self.board[x][y] = self.current_player
         self.capture_stones(x, y, self.current_player)
 
-        # 计算新的局面hash，用于检测打劫
-        board_hash = self.get_board_hash()
-        if board_hash in self.history:
-            # 打劫 => 回滚
-            self.board = old_board
-            self.captured = old_captured
-            return False, "Ko detected"
-
         # 一切正常 => 写入历史
         self.history.append(board_hash)
         self.move_records.append((self.current_player, x, y))
+        self._legal.play(p, color)
 
         # 重置连pass计数
         self.passes = 0
+        self.touch()
 
         # 切换执棋方
         self.current_player = "white" if self.current_player == "black" else "black"
@@ -403,5 +461,6 @@ class GoGame:
         self.game_over = True
         opponent = "white" if player == "black" else "black"
         self.winner = f"{player} resigned, {opponent} wins"
-        finalize_game("<some-match-id>", self)
+        self.touch()
+        finalize_game(self.match_id, self)
         return True, self.winner
@@ -0,0 +1,297 @@
+# backend/services/hibernation.py
+
+"""
+空闲对局休眠。
+
+长时间没有变化的对局(通信棋、被放弃的对局)把棋盘、同形历史、落子记录、合法着点等
+大对象换成一段紧凑的二进制 blob，只保留大厅/房间会读的标量字段(玩家、执棋方、胜负等)。
+之后第一次访问被移走的字段时(GoGame.__getattr__)自动按 blob 重放恢复，调用方无感知。
+
+blob 格式(小端)：
+  头部    version, board_size, setup_moves, move_count, 黑提子, 白提子, replay seq, 死子数
+  计时    黑、白各 (main_time, byo_yomi, periods, last_update)
+  落子    move_count 个 uint16，即 MoveRecords.packed 原样(见 game_state.py)，前 setup_moves 手为 SGF 直接摆子
+  死子    uint16 坐标
+  棋盘    每点 2 bit，恢复后与重放结果不一致时以它为准(如点目阶段直接改过棋盘)
+
+休眠和恢复都持有 game.lock(线程池里的同步接口也会读对局)：恢复时先在临时对象上重放，
+字段全部放回后才清掉 _blob；休眠时先设 _blob 再删字段，正被其他线程持锁使用的对局跳过。
+
+什么时候休眠由内存预算决定：在线对局的估算内存超过 HIBERNATE_BUDGET_MB 时，
+按最后变化时间从旧到新休眠，直到回到预算以内；HIBERNATE_MIN_IDLE 秒内有变化的对局不动。
+"""
+
+import asyncio
+import logging
+import os
+import struct
+import time
+from array import array
+from typing import Dict, Optional
+
+from backend.services import metrics
+
+logger = logging.getLogger(__name__)
+
+HIBERNATE_BUDGET_MB = float(os.getenv("HIBERNATE_BUDGET_MB", "256"))
+HIBERNATE_MIN_IDLE = float(os.getenv("HIBERNATE_MIN_IDLE", "120"))
+HIBERNATE_INTERVAL = float(os.getenv("HIBERNATE_INTERVAL", "30"))
+
+# 休眠时移走、访问时恢复的 GoGame 字段
+HIBERNATED_FIELDS = frozenset((
+    "board", "history", "move_records", "_legal", "timers", "captured", "dead_stones", "_snapshot", "_replay",
+))
+
+# 在线对局的内存估算(字节)：固定部分 + 每个交叉点(棋盘、合法着点 tracker) + 每手棋(同形 key、落子记录等)
+# 系数按 benchmarks/memory_bench.py 的 total_bytes 拟合
+GAME_BASE_BYTES = 8000
+GAME_POINT_BYTES = 160
+GAME_MOVE_BYTES = 60
+
+BLOB_VERSION = 1
+_HEADER = struct.Struct("<BBHIIIII")
+_TIMER = struct.Struct("<ddid")
+_CELL_CODES = {None: 0, "black": 1, "white": 2}
+_CELL_VALUES = (None, "black", "white")
+
+# 全局实例，供其他模块导入使用
+hibernator = None
+
+hibernated_total = metrics.registry.counter(
+    "match_hibernated_total", "Matches serialized to a compact blob by the hibernator")
+rehydrated_total = metrics.registry.counter(
+    "match_rehydrated_total", "Hibernated matches restored on first access")
+rehydrate_seconds = metrics.registry.histogram(
+    "match_rehydrate_seconds", "Time spent restoring a hibernated match")
+live_bytes_gauge = metrics.registry.gauge(
+    "match_live_bytes_estimate", "Estimated memory held by matches that are not hibernated")
+blob_bytes_gauge = metrics.registry.gauge(
+    "match_hibernated_blob_bytes", "Bytes held by hibernated match blobs")
+
+
+def _number(value: float):
+    # 计时器初始值和归零后是 int，恢复成 int 以保证快照内容与休眠前一致
+    return int(value) if value.is_integer() else value
+
+
+def estimate_game_bytes(game) -> int:
+    size = game.board_size
+    return GAME_BASE_BYTES + GAME_POINT_BYTES * size * size + GAME_MOVE_BYTES * len(game.move_records)
+
+
+def is_hibernated(game) -> bool:
+    return game._blob is not None
+
+
+#########################################
+# 编解码
+#########################################
+def pack_game(game) -> bytes:
+    size = game.board_size
+    replay = game._replay
+    moves = game.move_records.packed
+    dead = array("H", (x * size + y for x, y in game.dead_stones))
+
+    cells = bytearray((size * size + 3) // 4)
+    for x, row in enumerate(game.board):
+        for y, cell in enumerate(row):
+            code = _CELL_CODES[cell]
+            if code:
+                p = x * size + y
+                cells[p >> 2] |= code << ((p & 3) * 2)
+
+    parts = [_HEADER.pack(BLOB_VERSION, size, game.setup_moves, len(moves),
+                          game.captured["black"], game.captured["white"],
+                          replay.seq if replay is not None else 0, len(dead))]
+    for color in ("black", "white"):
+        t = game.timers[color]
+        parts.append(_TIMER.pack(t.main_time, t.byo_yomi, t.periods, t.last_update or 0.0))
+    parts += [moves.tobytes(), dead.tobytes(), bytes(cells)]
+    return b"".join(parts)
+
+
+def unpack_fields(game, blob: bytes) -> dict:
+    """
+    按 blob 重放出全部被移走的字段，返回 {字段名: 值}，不修改 game。
+    重放在一个临时对象上进行(复制 game 的标量字段，复用 capture_stones 等方法)，
+    其他线程在此期间看到的 game 仍是完整的休眠状态。
+    """
+    from backend.services.legal_moves import LegalMoveTracker, COLOR_CODES
+    from backend.services.game_state import MoveRecords, Timer, GameTimers, POINT_MASK, WHITE_BIT
+    from backend.services.replay_log import ReplayLog
+
+    cls = type(game)
+    scratch = cls.__new__(cls)
+    for name in cls.__slots__:
+        if name in HIBERNATED_FIELDS:
+            continue
+        try:
+            setattr(scratch, name, object.__getattribute__(game, name))
+        except AttributeError:
+            pass
+    scratch._blob = None
+    game = scratch
+
+    version, size, setup, move_count, black_cap, white_cap, seq, dead_count = _HEADER.unpack_from(blob, 0)
+    if version != BLOB_VERSION:
+        raise ValueError(f"unknown hibernation blob version {version}")
+    offset = _HEADER.size
+    timers = []
+    for _ in range(2):
+        main_time, byo_yomi, periods, last_update = _TIMER.unpack_from(blob, offset)
+        offset += _TIMER.size
+        timers.append(Timer(_number(main_time), _number(byo_yomi), periods, last_update))
+    moves = array("H")
+    moves.frombytes(blob[offset:offset + 2 * move_count])
+    offset += 2 * move_count
+    dead = array("H")
+    dead.frombytes(blob[offset:offset + 2 * dead_count])
+    offset += 2 * dead_count
+    cells = blob[offset:]
+
+    game.board_size = size
+    game.board = [[None] * size for _ in range(size)]
+    game.history = array("Q")
+    game.captured = {"black": 0, "white": 0}
+    game._legal = LegalMoveTracker(size)
+    game._snapshot = None
+    for i, packed in enumerate(moves):
+        color = "white" if packed & WHITE_BIT else "black"
+        p = packed & POINT_MASK
+        x, y = divmod(p, size)
+        game.board[x][y] = color
+        if i < setup:
+            game._legal.place_raw(p, COLOR_CODES[color])
+        else:
+            if i == setup and setup:
+                game._legal.rebuild()
+            game.capture_stones(x, y, color)
+            game._legal.play(p, COLOR_CODES[color])
+        game.history.append(game._legal.key)
+    game.move_records = MoveRecords(size, moves)
+    if setup and setup == len(moves):
+        game._legal.rebuild()
+
+    game.captured = {"black": black_cap, "white": white_cap}
+    game.timers = GameTimers(*timers)
+    game.dead_stones = {divmod(p, size) for p in dead}
+
+    board = [[_CELL_VALUES[(cells[(x * size + y) >> 2] >> (((x * size + y) & 3) * 2)) & 3]
+              for y in range(size)] for x in range(size)]
+    if board != game.board:
+        # 棋盘在落子之外被改过，以保存的棋盘为准
+        game.board = board
+        game.refresh_legal_moves()
+
+    replay = ReplayLog(game)
+    replay.seq = seq
+    game._replay = replay
+    return {name: getattr(game, name) for name in HIBERNATED_FIELDS}
+
+
+def hibernate_game(game, idle_before: Optional[float] = None) -> int:
+    """
+    休眠一局，返回 blob 字节数；已休眠、正被其他线程使用(拿不到 game.lock)
+    或 idle_before 之后有过变化时不休眠，返回 0
+    """
+    if not game.lock.acquire(blocking=False):
+        return 0
+    try:
+        if game._blob is not None or (idle_before is not None and game.touched_at > idle_before):
+            return 0
+        blob = pack_game(game)
+        # 先设 _blob 再删字段：删到一半时来读的线程会走 rehydrate，在锁上等这里结束
+        game._blob = blob
+        for name in HIBERNATED_FIELDS:
+            delattr(game, name)
+    finally:
+        game.lock.release()
+    hibernated_total.inc()
+    return len(blob)
+
+
+def rehydrate(game):
+    """由 GoGame.__getattr__ 在第一次访问被移走的字段时调用；多个线程同时进来时只恢复一次"""
+    with game.lock:
+        blob = game._blob
+        if blob is None:
+            return
+        started = time.perf_counter()
+        fields = unpack_fields(game, blob)
+        # 字段全部放回之后才清掉 _blob，其他线程不会看到"未休眠但缺字段"的状态
+        for name, value in fields.items():
+            setattr(game, name, value)
+        game.touched_at = time.time()
+        game._blob = None
+    rehydrated_total.inc()
+    rehydrate_seconds.observe(time.perf_counter() - started)
+    logger.debug("Rehydrated match %s (%d moves)", game.match_id, len(game.move_records))
+
+
+#########################################
+# 预算驱动的后台休眠
+#########################################
+class Hibernator:
+    def __init__(self, matches: Dict[str, dict], budget_mb: float = HIBERNATE_BUDGET_MB,
+                 min_idle: float = HIBERNATE_MIN_IDLE, interval: float = HIBERNATE_INTERVAL):
+        self.matches = matches
+        self.budget = int(budget_mb * 1024 * 1024)
+        self.min_idle = min_idle
+        self.interval = interval
+        self._task: Optional[asyncio.Task] = None
+
+    def start(self):
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    def sweep(self, now: Optional[float] = None) -> int:
+        """超出预算时按最后变化时间从旧到新休眠，返回本轮休眠的对局数"""
+        now = now if now is not None else time.time()
+        live = []
+        total = blob_total = 0
+        for entry in list(self.matches.values()):
+            game = entry["game"]
+            if game._blob is not None:
+                blob_total += len(game._blob)
+                continue
+            size = estimate_game_bytes(game)
+            total += size
+            live.append((game.touched_at, size, game))
+
+        count = 0
+        if total > self.budget:
+            live.sort(key=lambda item: item[0])
+            for touched_at, size, game in live:
+                if total <= self.budget or now - touched_at < self.min_idle:
+                    break
+                blob_size = hibernate_game(game, idle_before=now - self.min_idle)
+                if not blob_size:
+                    continue
+                blob_total += blob_size
+                total -= size
+                count += 1
+        live_bytes_gauge.set(total)
+        blob_bytes_gauge.set(blob_total)
+        if count:
+            logger.info(f"[hibernation] hibernated {count} matches, live estimate {total / 1048576:.1f} MB")
+        return count
+
+    async def _run(self):
+        while True:
+            await asyncio.sleep(self.interval)
+            try:
+                self.sweep()
+            except Exception as e:
+                logger.error(f"[hibernation] sweep failed: {e}")
+
+
+def init_hibernator(matches: Dict[str, dict]) -> Hibernator:
+    """初始化全局 hibernator 实例"""
+    global hibernator
+    if hibernator is None:
+        hibernator = Hibernator(matches)
+    return hibernator
+
+
+def get_hibernator() -> Optional[Hibernator]:
+    return hibernator
@@ -0,0 +1,295 @@
+# backend/services/legal_moves.py
+
+"""
+合法着点位图，随落子增量维护。
+
+坐标 (x, y) 对应位序号 p = x * board_size + y，位图是一个 Python int，
+第 p 位为 1 表示该点可以落子(非占用、非自杀、不违反全局同形)。
+
+维护的状态:
+  - color[p]: 0 空 / 1 黑 / 2 白
+  - 棋串: chain_of[p] -> 串头，stones[head] / libs[head] 为该串的棋子位图和气位图
+  - basic[c]: 只考虑占用和自杀的合法点，落子后只重算气数发生变化的串周围的点
+  - Zobrist key 及历史局面集合，用于同形判断；按棋子数索引，
+    不提子的着法只有在历史里存在"棋子数 +1"的局面时才需要逐点检查
+"""
+
+import random
+from functools import lru_cache
+
+from backend.services.geometry import get_geometry
+
+EMPTY, BLACK, WHITE = 0, 1, 2
+COLOR_CODES = {"black": BLACK, "white": WHITE}
+
+
+def iter_bits(mask: int):
+    """依次给出位图中为 1 的位序号"""
+    while mask:
+        low = mask & -mask
+        yield low.bit_length() - 1
+        mask ^= low
+
+
+@lru_cache(maxsize=None)
+def zobrist_table(size: int):
+    """每个棋盘大小一张固定的 Zobrist 表: table[color][p]，color 为 1/2"""
+    rng = random.Random(0x60BA4D ^ size)
+    n = size * size
+    return (
+        (),
+        tuple(rng.getrandbits(64) for _ in range(n)),
+        tuple(rng.getrandbits(64) for _ in range(n)),
+    )
+
+
+def _single_liberty(libs: int) -> bool:
+    return libs != 0 and libs & (libs - 1) == 0
+
+
+class LegalMoveTracker:
+    def __init__(self, size: int):
+        self.size = size
+        n = size * size
+        self.geometry = get_geometry(size)
+        self.nbrs, self.nbr_mask = self.geometry.neighbors, self.geometry.neighbor_mask
+        self.zobrist = zobrist_table(size)
+
+        self.color = [EMPTY] * n
+        self.chain_of = [-1] * n
+        self.stones = {}
+        self.libs = {}
+        self.empty = (1 << n) - 1
+        self.basic = [0, self.empty, self.empty]
+
+        self.key = 0
+        self.stone_count = 0
+        self.seen = set()
+        self.seen_counts = {}   # 棋子数 -> 历史中该棋子数的局面数
+        self._cache = {}        # color -> 已过滤同形的合法位图，局面变化时清空
+
+    def copy(self) -> "LegalMoveTracker":
+        """复制局面(搜索树展开时使用)；几何表和 Zobrist 表是只读的，直接共享"""
+        other = LegalMoveTracker.__new__(LegalMoveTracker)
+        other.size = self.size
+        other.geometry = self.geometry
+        other.nbrs, other.nbr_mask, other.zobrist = self.nbrs, self.nbr_mask, self.zobrist
+        other.color = self.color[:]
+        other.chain_of = self.chain_of[:]
+        other.stones = dict(self.stones)
+        other.libs = dict(self.libs)
+        other.empty = self.empty
+        other.basic = self.basic[:]
+        other.key = self.key
+        other.stone_count = self.stone_count
+        other.seen = set(self.seen)
+        other.seen_counts = dict(self.seen_counts)
+        other._cache = dict(self._cache)
+        return other
+
+    def _remember(self):
+        if self.key not in self.seen:
+            self.seen.add(self.key)
+            self.seen_counts[self.stone_count] = self.seen_counts.get(self.stone_count, 0) + 1
+
+    #########################################
+    # SGF 复盘：直接摆子，最后统一重建棋串
+    #########################################
+    def place_raw(self, p: int, c: int):
+        old = self.color[p]
+        if old:
+            self.key ^= self.zobrist[old][p]
+            self.stone_count -= 1
+        self.color[p] = c
+        self.key ^= self.zobrist[c][p]
+        self.stone_count += 1
+        self._remember()
+
+    def load_board(self, board):
+        """从 GoGame.board 重新载入局面；之前的同形历史只保留当前局面"""
+        size = self.size
+        self.color = [COLOR_CODES.get(board[p // size][p % size], EMPTY) for p in range(size * size)]
+        self.key = 0
+        self.stone_count = 0
+        for p, c in enumerate(self.color):
+            if c:
+                self.key ^= self.zobrist[c][p]
+                self.stone_count += 1
+        self.seen = set()
+        self.seen_counts = {}
+        self._remember()
+        self.rebuild()
+
+    def rebuild(self):
+        """根据 color 数组重建全部棋串、气和 basic 位图"""
+        n = self.size * self.size
+        self.chain_of = [-1] * n
+        self.stones = {}
+        self.libs = {}
+        self.empty = 0
+        for p in range(n):
+            if self.color[p] == EMPTY:
+                self.empty |= 1 << p
+        for p in range(n):
+            c = self.color[p]
+            if c == EMPTY or self.chain_of[p] != -1:
+                continue
+            stones = 0
+            stack = [p]
+            while stack:
+                q = stack.pop()
+                if self.chain_of[q] != -1:
+                    continue
+                self.chain_of[q] = p
+                stones |= 1 << q
+                stack.extend(r for r in self.nbrs[q] if self.color[r] == c and self.chain_of[r] == -1)
+            libs = self.geometry.dilate(stones)
+            self.stones[p] = stones
+            self.libs[p] = libs & self.empty
+        self.basic = [0, 0, 0]
+        self._refresh((1 << n) - 1)
+        self._cache.clear()
+
+    #########################################
+    # 增量落子
+    #########################################
+    def _basic_legal(self, p: int, c: int) -> bool:
+        if self.color[p] != EMPTY:
+            return False
+        for q in self.nbrs[p]:
+            qc = self.color[q]
+            if qc == EMPTY:
+                return True
+            single = _single_liberty(self.libs[self.chain_of[q]])
+            if (qc == c) != single:
+                # 连上一块还有别的气的己方棋，或提掉只剩这一口气的对方棋
+                return True
+        return False
+
+    def _refresh(self, dirty: int):
+        basic = self.basic
+        for p in iter_bits(dirty):
+            bit = 1 << p
+            for c in (BLACK, WHITE):
+                if self._basic_legal(p, c):
+                    basic[c] |= bit
+                else:
+                    basic[c] &= ~bit
+
+    def play(self, p: int, c: int) -> int:
+        """
+        在 p 落 c 色子(调用方已确认合法)，更新棋串/气/Zobrist/合法位图。
+        返回被提子的位图。
+        """
+        opp = 3 - c
+        bit = 1 << p
+        color, chain_of, stones, libs = self.color, self.chain_of, self.stones, self.libs
+
+        color[p] = c
+        self.empty &= ~bit
+        self.key ^= self.zobrist[c][p]
+        dirty = bit | self.nbr_mask[p]
+
+        adjacent = {chain_of[q] for q in self.nbrs[p] if color[q] != EMPTY}
+        for h in adjacent:
+            libs[h] &= ~bit
+
+        # 合并相邻的己方棋串，新串以 p 为头
+        merged_stones = bit
+        merged_libs = self.nbr_mask[p] & self.empty
+        for h in adjacent:
+            if color[h] == c:
+                merged_stones |= stones.pop(h)
+                merged_libs |= libs.pop(h)
+        for q in iter_bits(merged_stones):
+            chain_of[q] = p
+        stones[p] = merged_stones
+        libs[p] = merged_libs
+        dirty |= merged_libs
+
+        # 提掉没有气的对方棋串
+        captured = 0
+        for h in adjacent:
+            if color[h] != opp:
+                continue
+            if libs[h] == 0:
+                captured |= stones.pop(h)
+                del libs[h]
+            else:
+                dirty |= libs[h]
+
+        if captured:
+            self.empty |= captured
+            touched = set()
+            for q in iter_bits(captured):
+                color[q] = EMPTY
+                chain_of[q] = -1
+                self.key ^= self.zobrist[opp][q]
+            for q in iter_bits(captured):
+                qbit = 1 << q
+                for r in self.nbrs[q]:
+                    if color[r] != EMPTY:
+                        h = chain_of[r]
+                        libs[h] |= qbit
+                        touched.add(h)
+            for h in touched:
+                dirty |= libs[h]
+            dirty |= captured
+
+        self.stone_count += 1 - captured.bit_count()
+        self._remember()
+        self._refresh(dirty & self.empty | bit)
+        self._cache.clear()
+        return captured
+
+    #########################################
+    # 查询
+    #########################################
+    def _after(self, p: int, c: int):
+        """在 p 落 c 色子(含提子)后的 (Zobrist key, 棋子数)，不修改局面"""
+        opp = 3 - c
+        bit = 1 << p
+        key = self.key ^ self.zobrist[c][p]
+        count = self.stone_count + 1
+        seen_chains = set()
+        for q in self.nbrs[p]:
+            if self.color[q] == opp:
+                h = self.chain_of[q]
+                if h not in seen_chains and self.libs[h] == bit:
+                    seen_chains.add(h)
+                    for s in iter_bits(self.stones[h]):
+                        key ^= self.zobrist[opp][s]
+                        count -= 1
+        return key, count
+
+    def key_after(self, p: int, c: int) -> int:
+        """在 p 落 c 色子后的局面 key，GoGame 用它在落子前做同形判断"""
+        return self._after(p, c)[0]
+
+    def _repeats(self, p: int, c: int) -> bool:
+        """在 p 落 c 色子后的局面是否已在历史中出现过"""
+        key, count = self._after(p, c)
+        return self.seen_counts.get(count) is not None and key in self.seen
+
+    def legal_moves(self, c: int) -> int:
+        cached = self._cache.get(c)
+        if cached is not None:
+            return cached
+
+        mask = self.basic[c]
+        # 能提子的点：对方只剩一口气的串的那口气
+        capture_points = 0
+        for h, l in self.libs.items():
+            if self.color[h] != c and _single_liberty(l):
+                capture_points |= l
+        capture_points &= mask
+
+        candidates = capture_points
+        if self.seen_counts.get(self.stone_count + 1):
+            candidates = mask
+        for p in iter_bits(candidates):
+            if self._repeats(p, c):
+                mask &= ~(1 << p)
+
+        self._cache[c] = mask
+        return mask
@@ -0,0 +1,269 @@
+# backend/services/life_death.py
+
+"""
+局部死活求解，用于点目阶段自动裁定双方标记的死子。
+
+  - 区域：从目标棋串出发，沿空点和己方棋子扩展、遇到对方棋子停止，得到被对方围住的范围，
+    再加上与之相邻、气数不多的对方棋串的气(允许守方紧气吃掉包围的棋)；
+    范围内空点超过 SOLVER_MAX_REGION 视为开放局面，不做判断
+  - 搜索：双方只在区域内落子的与或搜索(布尔 alpha-beta)，攻方提掉目标串即攻方胜，
+    目标串按 Benson 算法无条件活即守方胜；攻方无棋可走也算守方胜(活或双活)
+  - 置换表以 (Zobrist key, 轮到谁走) 为键，记录结果及其搜索深度
+  - 节点数和时间都有硬上限，超出时返回"无法判断"，保留人工标记；
+    计算在 compute_pool 子进程里进行，不占用事件循环
+
+判定：守方先走攻方仍能提掉 -> 死；攻方先走也提不掉 -> 活；其余(先手决定)不自动处理。
+"""
+
+import logging
+import os
+import time
+from typing import Dict, List, Optional
+
+from backend.services.legal_moves import EMPTY, LegalMoveTracker, iter_bits
+
+logger = logging.getLogger(__name__)
+
+# 区域内最多的空点数，超过则认为不是死活题
+SOLVER_MAX_REGION = int(os.getenv("SOLVER_MAX_REGION", "24"))
+# 单个棋串的搜索节点上限
+SOLVER_MAX_NODES = int(os.getenv("SOLVER_MAX_NODES", "20000"))
+# 一次点目裁定的总时间上限(秒)
+SOLVER_TIME_BUDGET = float(os.getenv("SOLVER_TIME_BUDGET", "1.0"))
+
+# 相邻对方棋串气数不超过此值时，把它的气也放进区域
+ATTACKABLE_LIBERTIES = 3
+PASS = -1
+
+
+class _BudgetExceeded(Exception):
+    pass
+
+
+def _chain_libs(tracker: LegalMoveTracker, p: int) -> int:
+    return tracker.libs[tracker.chain_of[p]]
+
+
+def find_region(tracker: LegalMoveTracker, target: int) -> Optional[int]:
+    """目标棋串所在的被围区域(位图)，只含可落子的空点；区域过大时返回 None"""
+    defender = tracker.color[target]
+    attacker = 3 - defender
+    color, dilate = tracker.color, tracker.geometry.dilate
+
+    area = 0
+    frontier = 1 << target
+    while frontier:
+        area |= frontier
+        grown = dilate(frontier)
+        frontier = 0
+        for p in iter_bits(grown & ~area):
+            if color[p] != attacker:
+                frontier |= 1 << p
+        if ((area | frontier) & tracker.empty).bit_count() > SOLVER_MAX_REGION:
+            return None
+
+    region = area & tracker.empty
+
+    # 包围圈上气数不多的对方棋串：它们的气也可以落子
+    boundary = dilate(area) & ~area
+    for head in {tracker.chain_of[p] for p in iter_bits(boundary) if color[p] == attacker}:
+        libs = tracker.libs[head]
+        if libs.bit_count() <= ATTACKABLE_LIBERTIES:
+            region |= libs
+    return region
+
+
+def benson_alive(tracker: LegalMoveTracker, c: int, area: int, max_region: int = 4 * SOLVER_MAX_REGION) -> int:
+    """
+    Benson 无条件活判定，只考虑与 area 相交的 c 色棋串和 area 内空点所在的区域，
+    较大的区域(超过 max_region 个点)不算要点区域，结果偏保守。返回无条件活的 c 色棋子位图。
+    """
+    color, nbr_mask, chain_of = tracker.color, tracker.nbr_mask, tracker.chain_of
+
+    regions = []     # (区域内空点, 相邻的 c 色串头集合)
+    covered = 0
+    for start in iter_bits(area & tracker.empty):
+        if covered >> start & 1:
+            continue
+        region = 0
+        stack = [start]
+        too_big = False
+        while stack:
+            p = stack.pop()
+            bit = 1 << p
+            if region & bit:
+                continue
+            region |= bit
+            if region.bit_count() > max_region:
+                too_big = True
+                break
+            for q in iter_bits(nbr_mask[p] & ~region):
+                if color[q] != c:
+                    stack.append(q)
+        covered |= region
+        if too_big:
+            continue
+        grown = tracker.geometry.dilate(region)
+        borders = {chain_of[q] for q in iter_bits(grown & ~region) if color[q] == c}
+        regions.append((region & tracker.empty, borders))
+
+    alive = {chain_of[p] for p in iter_bits(area) if color[p] == c}
+    for _, borders in regions:
+        alive |= borders
+
+    changed = True
+    while changed:
+        changed = False
+        healthy = [(empties, borders) for empties, borders in regions if borders <= alive]
+        for head in list(alive):
+            libs = tracker.libs[head]
+            vital = sum(1 for empties, borders in healthy if head in borders and not empties & ~libs)
+            if vital < 2:
+                alive.discard(head)
+                changed = True
+
+    stones = 0
+    for head in alive:
+        stones |= tracker.stones[head]
+    return stones
+
+
+class _Solver:
+    def __init__(self, tracker: LegalMoveTracker, target: int, region: int, max_nodes: int, deadline: float):
+        self.target = target
+        self.defender = tracker.color[target]
+        self.attacker = 3 - self.defender
+        self.region = region
+        self.max_nodes = max_nodes
+        self.deadline = deadline
+        self.nodes = 0
+        self.tt: Dict[tuple, tuple] = {}   # (key, to_play, cutoff) -> (攻方是否胜, 剩余深度)
+
+    def _count_node(self):
+        self.nodes += 1
+        if self.nodes > self.max_nodes or (self.nodes & 255 == 0 and time.monotonic() > self.deadline):
+            raise _BudgetExceeded()
+
+    def _alive(self, tracker: LegalMoveTracker) -> bool:
+        area = self.region | tracker.stones[tracker.chain_of[self.target]]
+        return bool(benson_alive(tracker, self.defender, area) >> self.target & 1)
+
+    def _ordered_moves(self, tracker: LegalMoveTracker, to_play: int) -> List[int]:
+        moves = tracker.legal_moves(to_play) & self.region
+        target_libs = _chain_libs(tracker, self.target)
+        urgent = moves & target_libs
+        if to_play == self.defender:
+            # 守方优先提掉包围圈上只剩一口气的棋
+            for p in iter_bits(self.region & ~tracker.empty):
+                if tracker.color[p] == self.attacker and _chain_libs(tracker, p).bit_count() == 1:
+                    urgent |= _chain_libs(tracker, p) & moves
+        return list(iter_bits(urgent)) + list(iter_bits(moves & ~urgent))
+
+    def attacker_wins(self, tracker: LegalMoveTracker, to_play: int, depth: int, cutoff: bool) -> bool:
+        """
+        攻方能否提掉目标串。depth 用完时返回 cutoff：
+        证明"死"时取 False(未证明即不算)，证明"活"时取 True。
+        """
+        self._count_node()
+        if tracker.color[self.target] != self.defender:
+            return True
+        if depth == 0:
+            return cutoff
+        tt_key = (tracker.key, to_play, cutoff)
+        entry = self.tt.get(tt_key)
+        if entry is not None and entry[1] >= depth:
+            return entry[0]
+        if self._alive(tracker):
+            self.tt[tt_key] = (False, depth)
+            return False
+
+        moves = self._ordered_moves(tracker, to_play)
+        if to_play == self.attacker:
+            result = False
+            for p in moves:
+                child = tracker.copy()
+                child.play(p, to_play)
+                if self.attacker_wins(child, self.defender, depth - 1, cutoff):
+                    result = True
+                    break
+        else:
+            result = True
+            for p in moves + [PASS]:
+                if p == PASS:
+                    child = tracker
+                else:
+                    child = tracker.copy()
+                    child.play(p, to_play)
+                if not self.attacker_wins(child, self.attacker, depth - 1, cutoff):
+                    result = False
+                    break
+        self.tt[tt_key] = (result, depth)
+        return result
+
+
+def chain_status(tracker: LegalMoveTracker, target: int, max_nodes: int = SOLVER_MAX_NODES,
+                 deadline: Optional[float] = None) -> Optional[str]:
+    """
+    判断 target 所在棋串的死活："dead" / "alive"，无法判断(开放局面、先手决定、超出预算)时返回 None。
+    """
+    if tracker.color[target] == EMPTY:
+        return None
+    if deadline is None:
+        deadline = time.monotonic() + SOLVER_TIME_BUDGET
+    region = find_region(tracker, target)
+    if region is None:
+        return None
+    solver = _Solver(tracker, target, region, max_nodes, deadline)
+    if solver._alive(tracker):
+        return "alive"
+    depth = 2 * region.bit_count() + 2
+    try:
+        if solver.attacker_wins(tracker, solver.defender, depth, cutoff=False):
+            return "dead"
+        if not solver.attacker_wins(tracker, solver.attacker, depth, cutoff=True):
+            return "alive"
+    except _BudgetExceeded:
+        logger.debug(f"life/death search for point {target} ran out of budget after {solver.nodes} nodes")
+    return None
+
+
+def resolve_dead_stones(tracker: LegalMoveTracker, marked: List[int], budget: float = SOLVER_TIME_BUDGET,
+                        max_nodes: int = SOLVER_MAX_NODES) -> dict:
+    """
+    点目裁定(在 compute_pool 子进程里运行)。只有已标记死子所在的棋串会被改判；
+    预算还有剩余时再检查未标记的棋串，判死的只作为建议返回，不自动标记。
+    返回 {"dead": 判死的已标记棋子, "alive": 判活的已标记棋子, "unknown": 未能判断的已标记棋子,
+    "suggested": 未标记但判死的棋子}，棋子用位序号表示。结果会进局面缓存，不含耗时等与本次运行有关的字段。
+    """
+    deadline = time.monotonic() + budget
+    chain_of, color = tracker.chain_of, tracker.color
+
+    marked_heads = []
+    for p in marked:
+        if color[p] != EMPTY and chain_of[p] not in marked_heads:
+            marked_heads.append(chain_of[p])
+    other_heads = [h for h in tracker.stones if h not in marked_heads]
+
+    dead, alive, unknown, suggested = 0, 0, 0, 0
+    for head in marked_heads:
+        stones = tracker.stones[head]
+        status = None
+        if time.monotonic() < deadline:
+            status = chain_status(tracker, head, max_nodes, deadline)
+        if status == "dead":
+            dead |= stones
+        elif status == "alive":
+            alive |= stones
+        else:
+            unknown |= stones
+    for head in other_heads:
+        if time.monotonic() >= deadline:
+            break
+        if chain_status(tracker, head, max_nodes, deadline) == "dead":
+            suggested |= tracker.stones[head]
+    return {
+        "dead": list(iter_bits(dead)),
+        "alive": list(iter_bits(alive)),
+        "unknown": list(iter_bits(unknown)),
+        "suggested": list(iter_bits(suggested)),
+    }
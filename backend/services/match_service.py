@@ -1,6 +1,10 @@
 from backend.services.go_game import GoGame
 from backend.models import CreateMatch
+from backend.log_config import board_to_text
+from backend.services import metrics
+import asyncio
 import logging
+import os
 import time
 from typing import Dict, Any
 from datetime import datetime, timedelta
@@ -11,34 +15,107 @@ logger = logging.getLogger(__name__)
 # Single source of truth for matches
 matches: Dict[str, Dict[str, Any]] = {}  # match_id -> {game: GoGame, last_activity: datetime}
 logger.info("Initialized matches dictionary in match_service")
+metrics.active_matches.set_function(lambda: len(matches))
 
 # Match expiration settings
 MATCH_TIMEOUT = timedelta(minutes=30)  # Inactive matches expire after 30 minutes
 CLEANUP_INTERVAL = 300  # Cleanup runs every 5 minutes
+# 连续 pass 进入点目阶段后，超过这么久(秒)没人确认就按当前死子标记直接点目结束
+SCORING_TIMEOUT = float(os.getenv("SCORING_TIMEOUT", "600"))
+
+def cancel_bot(match_id: str):
+    """放弃该对局里进行中的机器人搜索(没有机器人对局时什么也不做)"""
+    from backend.services import bot_player
+
+    if bot_player.bot_manager is not None:
+        bot_player.bot_manager.cancel(match_id)
+
+def delete_match(match_id: str) -> bool:
+    """从对局表里删除对局并放弃机器人搜索；对局不存在返回 False"""
+    if matches.pop(match_id, None) is None:
+        return False
+    cancel_bot(match_id)
+    return True
+
+def settle_game(game):
+    """
+    由清理线程调用，把停在半路的对局交给终局流水线，让它照常评分、存档、释放房间：
+      - 点目阶段(连续 pass 后)无人确认：按已标记的死子 final_scoring
+      - 对局过期仍未结束：直接结束，不判胜负(评分阶段会跳过)
+    落子、标记死子、确认点目都在事件循环里改对局，所以不在事件循环里时转交给事件循环执行。
+    """
+    from backend.services.go_game import finalize_game
+    from backend.services.scoring import final_scoring
+
+    if _loop is not None:
+        try:
+            in_loop = asyncio.get_running_loop() is _loop
+        except RuntimeError:
+            in_loop = False
+        if not in_loop:
+            _loop.call_soon_threadsafe(settle_game, game)
+            return
+
+    if game.finalized:
+        return
+    if game.game_over:
+        final_scoring(game)
+    else:
+        game.game_over = True
+        game.touch()
+        finalize_game(game.match_id, game)
+
+def settle_abandoned_scoring(now: float) -> int:
+    """点目阶段超过 SCORING_TIMEOUT 的对局按当前标记点目结束，返回处理的局数"""
+    settled = 0
+    for match_data in list(matches.values()):
+        game = match_data['game']
+        if game.finalized or not game.game_over or now - game.touched_at < SCORING_TIMEOUT:
+            continue
+        logger.info(f"Scoring phase of match {game.match_id} timed out, scoring with current marks")
+        settle_game(game)
+        settled += 1
+    return settled
 
 def cleanup_expired_matches():
     """Periodically clean up expired matches"""
     while True:
         try:
+            started = time.perf_counter()
             now = datetime.now()
             expired = [
-                match_id for match_id, match_data in matches.items()
+                match_id for match_id, match_data in list(matches.items())
                 if now - match_data['last_activity'] > MATCH_TIMEOUT
             ]
             
+            settle_abandoned_scoring(time.time())
             if expired:
                 logger.info(f"Cleaning up expired matches: {expired}")
                 for match_id in expired:
-                    del matches[match_id]
-                    
+                    match_data = matches.pop(match_id, None)
+                    if match_data is not None:
+                        cancel_bot(match_id)
+                        settle_game(match_data['game'])
+
+            metrics.expiry_sweeps_total.inc()
+            metrics.expired_matches_total.inc(len(expired))
+            metrics.expiry_sweep_seconds.observe(time.perf_counter() - started)
         except Exception as e:
             logger.error(f"Error during match cleanup: {e}")
             
         time.sleep(CLEANUP_INTERVAL)
 
-# Start cleanup thread
-cleanup_thread = threading.Thread(target=cleanup_expired_matches, daemon=True)
-cleanup_thread.start()
+cleanup_thread = None
+# 应用的事件循环，清理线程通过它把 settle_game 交回事件循环
+_loop = None
+
+def start_cleanup_thread():
+    """启动过期对局清理线程(由应用启动事件调用，导入本模块时不启动)"""
+    global cleanup_thread, _loop
+    if cleanup_thread is None:
+        _loop = asyncio.get_running_loop()
+        cleanup_thread = threading.Thread(target=cleanup_expired_matches, name="match-cleanup", daemon=True)
+        cleanup_thread.start()
 
 def get_matches():
     """Get the matches dictionary"""
@@ -47,16 +124,24 @@ def get_matches():
         for match_id, match_data in matches.items()
         if datetime.now() - match_data['last_activity'] <= MATCH_TIMEOUT
     }
-    logger.info(f"Getting matches dictionary. Current active matches: {list(active_matches.keys())}")
+    logger.debug("Getting matches dictionary. Current active matches: %d", len(active_matches))
     return active_matches
 
+def get_match(match_id: str):
+    """按 ID 取未过期的对局(GoGame)，不存在或已过期返回 None；不像 get_matches 那样复制整个字典"""
+    match_data = matches.get(match_id)
+    if match_data is None or datetime.now() - match_data['last_activity'] > MATCH_TIMEOUT:
+        return None
+    return match_data['game']
+
 def create_match_internal(match_data: CreateMatch) -> dict:
     """Internal service function to create a match, used by both routers"""
     logger.info(f"Creating new match with players: {match_data.black_player} (black) vs {match_data.white_player} (white)")
     
     # 检查是否有SGF内容
     sgf_content = match_data.sgf_content
-    logger.info(f"Creating game with SGF content: {sgf_content[:200] if sgf_content else 'None'}")
+    if logger.isEnabledFor(logging.DEBUG):
+        logger.debug("Creating game with SGF content: %s", sgf_content[:200] if sgf_content else 'None')
     
     try:
         game = GoGame(
@@ -72,8 +157,8 @@ def create_match_internal(match_data: CreateMatch) -> dict:
         )
         
         # 打印棋盘状态用于调试
-        board_str = "\n".join([" ".join("B" if cell == "black" else "W" if cell == "white" else "." for cell in row) for row in game.board])
-        logger.info(f"Created game with board state:\n{board_str}")
+        if logger.isEnabledFor(logging.DEBUG):
+            logger.debug("Created game with board state:\n%s", board_to_text(game.board))
         
     except Exception as e:
         logger.error(f"Error creating game with SGF: {e}")
@@ -91,6 +176,7 @@ def create_match_internal(match_data: CreateMatch) -> dict:
     
     import uuid
     match_id = str(uuid.uuid4())
+    game.match_id = match_id
     matches[match_id] = {
         'game': game,
         'last_activity': datetime.now()
@@ -114,13 +200,13 @@ def create_match_internal(match_data: CreateMatch) -> dict:
         "black_player": match_data.black_player,
         "white_player": match_data.white_player,
         "black_timer": {
-            "main_time": game.timers["black"]["main_time"],
-            "byo_yomi": game.timers["black"]["byo_yomi"],
-            "periods": game.timers["black"]["periods"]
+            "main_time": game.timers["black"].main_time,
+            "byo_yomi": game.timers["black"].byo_yomi,
+            "periods": game.timers["black"].periods
         },
         "white_timer": {
-            "main_time": game.timers["white"]["main_time"],
-            "byo_yomi": game.timers["white"]["byo_yomi"],
-            "periods": game.timers["white"]["periods"]
+            "main_time": game.timers["white"].main_time,
+            "byo_yomi": game.timers["white"].byo_yomi,
+            "periods": game.timers["white"].periods
         }
     }
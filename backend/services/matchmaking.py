@@ -0,0 +1,252 @@
+# backend/services/matchmaking.py
+
+"""
+自动匹配队列。
+
+  - 每种 (棋盘大小, 主时间, 读秒时间, 读秒次数) 一个队列，不同设置的人不会配到一起
+  - 队列内按等级分分桶(MATCHMAKING_BUCKET 分一档)，非空桶号保存在有序列表里，
+    找对手时二分定位到自己的桶，再向两侧逐桶扩展到窗口边界，不扫描整个队列
+  - 可接受的分差窗口随等待时间线性放宽，双方窗口都要容得下对方
+  - 后台每 MATCHMAKING_TICK 秒配一轮，配好的对局直接 create_match_internal，
+    通过 user_{username} 房间推送 match_found；不建房间，也不触发大厅广播
+"""
+
+import asyncio
+import bisect
+import logging
+import os
+import random
+import time
+from collections import OrderedDict
+from typing import Awaitable, Callable, Dict, List, Optional, Tuple
+
+from backend.services import metrics
+
+logger = logging.getLogger(__name__)
+
+MATCHMAKING_TICK = float(os.getenv("MATCHMAKING_TICK", "1.0"))
+MATCHMAKING_BUCKET = int(os.getenv("MATCHMAKING_BUCKET", "50"))
+# 初始分差窗口、每等待一秒放宽多少、最大窗口
+MATCHMAKING_BASE_WINDOW = float(os.getenv("MATCHMAKING_BASE_WINDOW", "100"))
+MATCHMAKING_WIDEN_PER_SEC = float(os.getenv("MATCHMAKING_WIDEN_PER_SEC", "10"))
+MATCHMAKING_MAX_WINDOW = float(os.getenv("MATCHMAKING_MAX_WINDOW", "800"))
+# 配对结果保留多久(秒)，供轮询 /matchmaking/status 取回
+MATCHMAKING_RESULT_TTL = 120
+
+# 全局实例，供其他模块导入使用
+matchmaker = None
+
+QueueKey = Tuple[int, int, int, int]   # (board_size, main_time, byo_yomi_time, byo_yomi_periods)
+
+queued_gauge = metrics.registry.gauge(
+    "matchmaking_queued_players", "Players waiting in the matchmaking queue")
+pairs_total = metrics.registry.counter(
+    "matchmaking_pairs_total", "Pairs formed by the matchmaker")
+wait_seconds = metrics.registry.histogram(
+    "matchmaking_wait_seconds", "Time from joining the queue to being paired",
+    buckets=(1, 2, 5, 10, 20, 30, 60, 120, 300, 600))
+tick_seconds = metrics.registry.histogram(
+    "matchmaking_tick_seconds", "Time spent in one matchmaking tick")
+
+
+class Ticket:
+    __slots__ = ("username", "rating", "key", "joined_at", "bucket")
+
+    def __init__(self, username: str, rating: float, key: QueueKey, joined_at: float):
+        self.username = username
+        self.rating = rating
+        self.key = key
+        self.joined_at = joined_at
+        self.bucket = int(rating // MATCHMAKING_BUCKET)
+
+    def window(self, now: float) -> float:
+        return min(MATCHMAKING_MAX_WINDOW,
+                   MATCHMAKING_BASE_WINDOW + MATCHMAKING_WIDEN_PER_SEC * (now - self.joined_at))
+
+
+class _Queue:
+    """单一设置下的等待队列"""
+
+    def __init__(self):
+        self.waiting: "OrderedDict[str, Ticket]" = OrderedDict()   # 按加入时间排序
+        self.buckets: Dict[int, "OrderedDict[str, Ticket]"] = {}
+        self.bucket_ids: List[int] = []                               # 非空桶号，有序
+
+    def add(self, ticket: Ticket):
+        self.waiting[ticket.username] = ticket
+        bucket = self.buckets.get(ticket.bucket)
+        if bucket is None:
+            bucket = self.buckets[ticket.bucket] = OrderedDict()
+            bisect.insort(self.bucket_ids, ticket.bucket)
+        bucket[ticket.username] = ticket
+
+    def remove(self, ticket: Ticket):
+        self.waiting.pop(ticket.username, None)
+        bucket = self.buckets.get(ticket.bucket)
+        if bucket is None:
+            return
+        bucket.pop(ticket.username, None)
+        if not bucket:
+            del self.buckets[ticket.bucket]
+            i = bisect.bisect_left(self.bucket_ids, ticket.bucket)
+            del self.bucket_ids[i]
+
+    def find_opponent(self, ticket: Ticket, now: float) -> Optional[Ticket]:
+        """窗口内双方都能接受、分差最小的对手(同分差取等得最久的)"""
+        window = ticket.window(now)
+        low = int((ticket.rating - window) // MATCHMAKING_BUCKET)
+        high = int((ticket.rating + window) // MATCHMAKING_BUCKET)
+        best, best_gap = None, None
+        start = bisect.bisect_left(self.bucket_ids, low)
+        stop = bisect.bisect_right(self.bucket_ids, high)
+        for bucket_id in self.bucket_ids[start:stop]:
+            for other in self.buckets[bucket_id].values():
+                if other is ticket:
+                    continue
+                gap = abs(other.rating - ticket.rating)
+                if gap > window or gap > other.window(now):
+                    continue
+                if best is None or gap < best_gap:
+                    best, best_gap = other, gap
+                # 桶内按加入时间排序，同一个桶里分差相近时取第一个即可
+                break
+        return best
+
+
+class Matchmaker:
+    def __init__(self, on_paired: Callable[[Ticket, Ticket], Awaitable[None]],
+                 tick: float = MATCHMAKING_TICK):
+        self.on_paired = on_paired
+        self.tick = tick
+        self.queues: Dict[QueueKey, _Queue] = {}
+        self.tickets: Dict[str, Ticket] = {}
+        self.results: Dict[str, tuple] = {}     # username -> (配对时间, 结果)
+        self._task: Optional[asyncio.Task] = None
+        queued_gauge.set_function(lambda: len(self.tickets))
+
+    def start(self):
+        if self._task is None:
+            self._task = asyncio.create_task(self._tick_loop())
+
+    def join(self, username: str, rating: float, key: QueueKey) -> Ticket:
+        """加入(或更换)队列；已在队列中时先移出旧的"""
+        self.leave(username)
+        self.results.pop(username, None)
+        ticket = Ticket(username, rating, key, time.time())
+        self.tickets[username] = ticket
+        self.queues.setdefault(key, _Queue()).add(ticket)
+        return ticket
+
+    def leave(self, username: str) -> bool:
+        ticket = self.tickets.pop(username, None)
+        if ticket is None:
+            return False
+        queue = self.queues.get(ticket.key)
+        if queue is not None:
+            queue.remove(ticket)
+            if not queue.waiting:
+                del self.queues[ticket.key]
+        return True
+
+    def requeue(self, ticket: Ticket):
+        """
+        配对后建对局失败时把票放回队列(保留原加入时间)。
+        期间已重新加入、离开后又有了配对结果的用户不放回。
+        """
+        if ticket.username in self.tickets or ticket.username in self.results:
+            return
+        self.tickets[ticket.username] = ticket
+        self.queues.setdefault(ticket.key, _Queue()).add(ticket)
+
+    def status(self, username: str) -> dict:
+        result = self.results.get(username)
+        if result is not None:
+            return {"status": "matched", **result[1]}
+        ticket = self.tickets.get(username)
+        if ticket is None:
+            return {"status": "idle"}
+        now = time.time()
+        return {
+            "status": "waiting",
+            "waited": round(now - ticket.joined_at, 1),
+            "window": ticket.window(now),
+            "queued": len(self.queues[ticket.key].waiting),
+        }
+
+    def record_result(self, username: str, result: dict):
+        self.results[username] = (time.time(), result)
+
+    def pair_all(self, now: Optional[float] = None) -> List[Tuple[Ticket, Ticket]]:
+        """一轮配对：每个队列按加入顺序给每个还没配上的人找对手"""
+        now = now if now is not None else time.time()
+        pairs = []
+        for key in list(self.queues):
+            queue = self.queues[key]
+            for ticket in list(queue.waiting.values()):
+                if ticket.username not in queue.waiting:
+                    continue
+                other = queue.find_opponent(ticket, now)
+                if other is None:
+                    continue
+                self.leave(ticket.username)
+                self.leave(other.username)
+                pairs.append((ticket, other))
+        return pairs
+
+    async def run_tick(self, now: Optional[float] = None):
+        """配一轮并为每一对调用 on_paired，再清理过期的配对结果"""
+        now = now if now is not None else time.time()
+        for a, b in self.pair_all(now):
+            # 两张票已经移出队列；单个配对失败时放回去，不影响本轮其余配对
+            try:
+                await self.on_paired(a, b)
+            except Exception as e:
+                logger.error(f"[matchmaking] pairing {a.username} vs {b.username} failed: {e}")
+                self.requeue(a)
+                self.requeue(b)
+                continue
+            pairs_total.inc()
+            wait_seconds.observe(now - a.joined_at)
+            wait_seconds.observe(now - b.joined_at)
+        expired = [u for u, (at, _) in self.results.items() if now - at > MATCHMAKING_RESULT_TTL]
+        for username in expired:
+            del self.results[username]
+
+    async def _tick_loop(self):
+        while True:
+            await asyncio.sleep(self.tick)
+            started = time.perf_counter()
+            try:
+                await self.run_tick()
+            except Exception as e:
+                logger.error(f"[matchmaking] tick failed: {e}")
+            tick_seconds.observe(time.perf_counter() - started)
+
+
+def init_matchmaker(on_paired: Callable[[Ticket, Ticket], Awaitable[None]]) -> Matchmaker:
+    """初始化全局 matchmaker 实例；on_paired(a, b) 负责创建对局并通知双方"""
+    global matchmaker
+    if matchmaker is None:
+        matchmaker = Matchmaker(on_paired)
+    return matchmaker
+
+
+def get_matchmaker() -> Matchmaker:
+    return matchmaker
+
+
+def create_paired_match(a: Ticket, b: Ticket) -> dict:
+    """按配对结果创建对局(随机分先)，返回 create_match_internal 的结果"""
+    from backend.models import CreateMatch
+    from backend.services.match_service import create_match_internal
+
+    black, white = (a, b) if random.random() < 0.5 else (b, a)
+    board_size, main_time, byo_yomi_time, byo_yomi_periods = a.key
+    return create_match_internal(CreateMatch(
+        board_size=board_size,
+        black_player=black.username,
+        white_player=white.username,
+        main_time=main_time,
+        byo_yomi_time=byo_yomi_time,
+        byo_yomi_periods=byo_yomi_periods,
+    ))
@@ -0,0 +1,198 @@
+# backend/services/mcts.py
+
+"""
+机器人使用的蒙特卡洛树搜索，在 compute_pool 的子进程里运行，入口为 search()。
+
+  - 树节点的局面用 LegalMoveTracker 表示，展开时复制父节点再落一子，
+    合法着点(含打劫/同形)直接取自 tracker
+  - 叶子按批收集(用虚拟损失分散选择)，一批叶子放进一个 BatchGo 各跑一盘 playout
+  - 进程内置换表 _tt(PositionCache，kind 为 "mcts")以 (Zobrist key, 轮到谁走) 为键
+    保存访问/胜局统计，同一工作进程的后续搜索(同一盘棋的下一手、其他对局的相同布局)
+    展开到相同局面时直接继承
+"""
+
+import math
+import os
+import random
+import time
+from typing import Optional
+
+import numpy as np
+
+from backend.services.batch_engine import BatchGo
+from backend.services.legal_moves import LegalMoveTracker, iter_bits
+from backend.services.position_cache import PositionCache
+
+PASS = -1
+
+# 置换表的内存上限(MB，每个工作进程一张)
+BOT_TT_MB = float(os.getenv("BOT_TT_MB", "48"))
+# 每批叶子数，以及每个叶子跑几盘 playout；一次 BatchGo.playout() 共 BATCH * PER_LEAF 盘
+BOT_BATCH = int(os.getenv("BOT_BATCH", "32"))
+BOT_PLAYOUTS_PER_LEAF = int(os.getenv("BOT_PLAYOUTS_PER_LEAF", "8"))
+# 胜率低于此值且模拟次数足够时认输，0 表示从不认输
+BOT_RESIGN_THRESHOLD = float(os.getenv("BOT_RESIGN_THRESHOLD", "0.03"))
+BOT_RESIGN_MIN_PLAYOUTS = 1000
+
+UCT_C = 0.8
+# 布局阶段(棋子少于盘面 1/4)对一二线着法的先验：(虚拟访问数, 先验胜率)
+OPENING_PRIOR = {0: (20, 0.2), 1: (20, 0.4)}
+# 从置换表继承的统计最多当作这么多次访问，避免旧数据压过本次搜索
+TT_PRIOR_CAP = 32
+# 置换表条目 [visits, wins] 的大小估算
+TT_ENTRY_SIZE = 88
+
+_tt = PositionCache("mcts", int(BOT_TT_MB * 1024 * 1024))
+
+
+class Node:
+    __slots__ = ("move", "parent", "to_play", "passes", "tracker", "children", "untried", "visits", "wins")
+
+    def __init__(self, move, parent, to_play, passes, tracker):
+        self.move = move
+        self.parent = parent
+        self.to_play = to_play     # 该局面下轮到谁走(1 黑 / 2 白)
+        self.passes = passes       # 到该局面为止连续 pass 的次数
+        self.tracker = tracker
+        self.children = []
+        self.untried = None
+        self.visits = 0
+        self.wins = 0.0            # 以走进该节点的一方(3 - to_play)计的胜局数
+
+    @property
+    def key(self):
+        return PositionCache.make_key("mcts", self.tracker.key, self.to_play)
+
+
+def _candidate_moves(tracker: LegalMoveTracker, color: int, passes: int) -> list:
+    """合法着点中去掉己方的眼；没有可走的点或对方刚 pass 时加入 PASS"""
+    moves = []
+    tracker_color = tracker.color
+    for p in iter_bits(tracker.legal_moves(color)):
+        if all(tracker_color[q] == color for q in tracker.nbrs[p]):
+            continue
+        moves.append(p)
+    if not moves or passes == 1:
+        moves.append(PASS)
+    return moves
+
+
+def _expand(node: Node) -> Node:
+    move = node.untried.pop()
+    tracker = node.tracker.copy()
+    if move != PASS:
+        tracker.play(move, node.to_play)
+    child = Node(move, node, 3 - node.to_play, node.passes + 1 if move == PASS else 0, tracker)
+    stats = _tt.get(child.key)
+    if stats is not None and stats[0] > 0:
+        visits = min(stats[0], TT_PRIOR_CAP)
+        child.visits = visits
+        child.wins = stats[1] * visits / stats[0]
+    elif move != PASS and node.tracker.stone_count * 4 < tracker.size * tracker.size:
+        prior = OPENING_PRIOR.get(tracker.geometry.line[move])
+        if prior is not None:
+            child.visits = prior[0]
+            child.wins = prior[0] * prior[1]
+    node.children.append(child)
+    return child
+
+
+def _select(node: Node) -> Node:
+    log_n = math.log(max(node.visits, 1))
+    best, best_score = None, -1.0
+    for child in node.children:
+        if child.visits == 0:
+            return child
+        score = child.wins / child.visits + UCT_C * math.sqrt(log_n / child.visits)
+        if score > best_score:
+            best, best_score = child, score
+    return best
+
+
+def _remember(node: Node):
+    _tt.put(node.key, (node.visits, node.wins), TT_ENTRY_SIZE)
+
+
+def search(tracker: LegalMoveTracker, to_play: int, komi: float, passes: int, budget: float,
+           seed: Optional[int] = None, max_playouts: Optional[int] = None) -> dict:
+    """
+    从给定局面搜索 budget 秒(或 max_playouts 次模拟)。
+    返回 {"move": 位序号或 PASS, "resign": bool, "win_rate", "visits", "playouts", "tt_size", "elapsed"}。
+    """
+    started = time.monotonic()
+    deadline = started + budget
+    rng = random.Random(seed)
+    np_seed = rng.getrandbits(32)
+    size = tracker.size
+
+    root = Node(None, None, to_play, passes, tracker)
+    root.untried = _candidate_moves(tracker, to_play, passes)
+    rng.shuffle(root.untried)
+
+    playouts = 0
+    while time.monotonic() < deadline and (max_playouts is None or playouts < max_playouts):
+        paths = []
+        for _ in range(BOT_BATCH):
+            node = root
+            path = [root]
+            while not node.untried and node.children:
+                node = _select(node)
+                path.append(node)
+            if node.untried:
+                node = _expand(node)
+                path.append(node)
+                if node.passes < 2:
+                    node.untried = _candidate_moves(node.tracker, node.to_play, node.passes)
+                    rng.shuffle(node.untried)
+                else:
+                    node.untried = []
+            # 虚拟损失：先记访问，结果回来再记胜局
+            for n in path:
+                n.visits += 1
+            paths.append(path)
+
+        leaves = [path[-1] for path in paths]
+        per_leaf = BOT_PLAYOUTS_PER_LEAF
+        engine = BatchGo(size, len(leaves) * per_leaf, komi=komi, seed=np_seed + playouts,
+                         max_moves=size * size * 2)
+        engine.load(
+            np.repeat(np.array([leaf.tracker.color for leaf in leaves], dtype=np.int8), per_leaf, axis=0),
+            np.repeat(np.array([leaf.to_play for leaf in leaves], dtype=np.int8), per_leaf),
+        )
+        # 双方已连续 pass 的叶子直接数子，不再走
+        engine.done[:] = np.repeat(np.array([leaf.passes >= 2 for leaf in leaves]), per_leaf)
+        black_wins = (engine.playout() > 0).reshape(len(leaves), per_leaf).sum(axis=1)
+        playouts += len(leaves) * per_leaf
+
+        # 每个叶子的 per_leaf 盘 playout 按 per_leaf 次访问计(虚拟损失已记 1 次)
+        for path, wins in zip(paths, black_wins.tolist()):
+            for n in path:
+                n.visits += per_leaf - 1
+                n.wins += wins if n.to_play == 2 else per_leaf - wins
+                if n is not root:
+                    _remember(n)
+
+    if not root.children:
+        best = None
+    else:
+        best = max(root.children, key=lambda c: c.visits)
+    win_rate = best.wins / best.visits if best is not None and best.visits else 0.5
+    move = PASS if best is None else best.move
+    return {
+        "move": move,
+        "resign": bool(
+            BOT_RESIGN_THRESHOLD > 0 and playouts >= BOT_RESIGN_MIN_PLAYOUTS and win_rate < BOT_RESIGN_THRESHOLD
+        ),
+        "win_rate": round(win_rate, 4),
+        "visits": best.visits if best is not None else 0,
+        "playouts": playouts,
+        "tt_size": len(_tt),
+        "elapsed": round(time.monotonic() - started, 3),
+    }
+
+
+def point_to_xy(size: int, move: int):
+    """位序号 -> (x, y)；PASS -> (None, None)"""
+    if move == PASS:
+        return None, None
+    return move // size, move % size
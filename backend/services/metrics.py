@@ -0,0 +1,258 @@
+# backend/services/metrics.py
+
+import abc
+import bisect
+import math
+import threading
+from typing import Callable, Dict, Iterable, Optional, Tuple
+
+# 默认的延迟桶(秒)
+LATENCY_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5)
+# 默认的数量桶(广播人数等)
+SIZE_BUCKETS = (1, 2, 5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000)
+# 默认的字节桶
+BYTES_BUCKETS = (128, 256, 512, 1024, 2048, 4096, 8192, 16384, 65536, 262144)
+
+
+def _format_value(value: float) -> str:
+    if value == math.inf:
+        return "+Inf"
+    if float(value).is_integer():
+        return str(int(value))
+    return repr(float(value))
+
+
+def _escape(value: str) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _label_str(names: Tuple[str, ...], values: Tuple[str, ...], extra: str = "") -> str:
+    parts = [f'{n}="{_escape(v)}"' for n, v in zip(names, values)]
+    if extra:
+        parts.append(extra)
+    return "{" + ",".join(parts) + "}" if parts else ""
+
+
+class _Metric(abc.ABC):
+    """
+    所有指标的公共部分。带标签的指标通过 labels(...) 取子序列，子序列会被缓存，
+    热路径上可以直接持有子序列对象，避免每次都查字典。
+    更新既来自事件循环，也来自后台线程(清理线程、休眠、用户库/密码哈希线程池等)，
+    所以每个序列各带一把锁：创建子序列、更新数值和 render 读取都在锁内进行。
+    """
+
+    type_name = ""
+
+    def __init__(self, name: str, documentation: str, labelnames: Iterable[str] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._children: Dict[Tuple[str, ...], "_Metric"] = {}
+        self._lock = threading.Lock()
+
+    def labels(self, *values):
+        key = tuple(str(v) for v in values)
+        child = self._children.get(key)
+        if child is None:
+            if len(key) != len(self.labelnames):
+                raise ValueError(f"{self.name} expects labels {self.labelnames}, got {key}")
+            with self._lock:
+                # 两个线程同时创建同一子序列时只保留先创建的那个
+                child = self._children.get(key)
+                if child is None:
+                    child = self._children[key] = self._new_child()
+        return child
+
+    @abc.abstractmethod
+    def _new_child(self):
+        """创建一个同类型、无标签的子序列"""
+
+    @abc.abstractmethod
+    def _render_samples(self, name, labelnames, values):
+        """本序列的样本行"""
+
+    def _series(self):
+        if self.labelnames:
+            with self._lock:
+                return list(self._children.items())
+        return [((), self)]
+
+    def render(self) -> str:
+        lines = [
+            f"# HELP {self.name} {self.documentation}",
+            f"# TYPE {self.name} {self.type_name}",
+        ]
+        for values, child in self._series():
+            lines.extend(child._render_samples(self.name, self.labelnames, values))
+        return "\n".join(lines)
+
+
+class Counter(_Metric):
+    type_name = "counter"
+
+    def __init__(self, name, documentation, labelnames=()):
+        super().__init__(name, documentation, labelnames)
+        self.value = 0.0
+
+    def _new_child(self):
+        return Counter(self.name, self.documentation)
+
+    def inc(self, amount: float = 1):
+        with self._lock:
+            self.value += amount
+
+    def _render_samples(self, name, labelnames, values):
+        with self._lock:
+            value = self.value
+        return [f"{name}{_label_str(labelnames, values)} {_format_value(value)}"]
+
+
+class Gauge(_Metric):
+    type_name = "gauge"
+
+    def __init__(self, name, documentation, labelnames=()):
+        super().__init__(name, documentation, labelnames)
+        self.value = 0.0
+        self._function: Optional[Callable[[], float]] = None
+
+    def _new_child(self):
+        return Gauge(self.name, self.documentation)
+
+    def set(self, value: float):
+        with self._lock:
+            self.value = value
+
+    def inc(self, amount: float = 1):
+        with self._lock:
+            self.value += amount
+
+    def dec(self, amount: float = 1):
+        with self._lock:
+            self.value -= amount
+
+    def set_function(self, fn: Callable[[], float]):
+        """抓取时才计算当前值，适合 len(matches) 这类已有的数据"""
+        self._function = fn
+
+    def _render_samples(self, name, labelnames, values):
+        with self._lock:
+            value = self.value
+        if self._function is not None:
+            try:
+                value = self._function()
+            except Exception:
+                value = math.nan
+        return [f"{name}{_label_str(labelnames, values)} {_format_value(value)}"]
+
+
+class Histogram(_Metric):
+    type_name = "histogram"
+
+    def __init__(self, name, documentation, labelnames=(), buckets=LATENCY_BUCKETS):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(sorted(buckets))
+        self.counts = [0] * (len(self.buckets) + 1)
+        self.sum = 0.0
+        self.count = 0
+
+    def _new_child(self):
+        return Histogram(self.name, self.documentation, buckets=self.buckets)
+
+    def observe(self, value: float):
+        i = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            self.counts[i] += 1
+            self.sum += value
+            self.count += 1
+
+    def _render_samples(self, name, labelnames, values):
+        # 在锁内取一份快照，保证各桶、sum 和 count 彼此一致
+        with self._lock:
+            counts, total, count = list(self.counts), self.sum, self.count
+        lines = []
+        cumulative = 0
+        for bound, n in zip(self.buckets + (math.inf,), counts):
+            cumulative += n
+            le = f'le="{_format_value(bound)}"'
+            lines.append(f"{name}_bucket{_label_str(labelnames, values, le)} {cumulative}")
+        lines.append(f"{name}_sum{_label_str(labelnames, values)} {_format_value(total)}")
+        lines.append(f"{name}_count{_label_str(labelnames, values)} {count}")
+        return lines
+
+
+class MetricsRegistry:
+    def __init__(self):
+        self._metrics: Dict[str, _Metric] = {}
+        self._lock = threading.Lock()
+
+    def _register(self, metric: _Metric) -> _Metric:
+        with self._lock:
+            existing = self._metrics.get(metric.name)
+            if existing is not None:
+                return existing
+            self._metrics[metric.name] = metric
+            return metric
+
+    def counter(self, name, documentation, labelnames=()) -> Counter:
+        return self._register(Counter(name, documentation, labelnames))
+
+    def gauge(self, name, documentation, labelnames=()) -> Gauge:
+        return self._register(Gauge(name, documentation, labelnames))
+
+    def histogram(self, name, documentation, labelnames=(), buckets=LATENCY_BUCKETS) -> Histogram:
+        return self._register(Histogram(name, documentation, labelnames, buckets))
+
+    def render(self) -> str:
+        """Prometheus 文本格式(0.0.4)"""
+        with self._lock:
+            metrics = list(self._metrics.values())
+        return "\n".join(m.render() for m in metrics) + "\n"
+
+
+# 全局注册表
+registry = MetricsRegistry()
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+#########################
+# 各子系统共用的指标定义
+#########################
+
+# 对局
+move_validation_seconds = registry.histogram(
+    "go_move_validation_seconds", "Time spent in GoGame.play_move for a socket move")
+moves_total = registry.counter(
+    "go_moves_total", "Moves received over the socket, by result", ["result"])
+active_matches = registry.gauge(
+    "go_active_matches", "Matches held in memory")
+active_rooms = registry.gauge(
+    "go_active_rooms", "Rooms held in memory")
+
+# 对局过期清理
+expiry_sweeps_total = registry.counter(
+    "match_expiry_sweeps_total", "Expired-match cleanup sweeps")
+expired_matches_total = registry.counter(
+    "match_expired_total", "Matches removed by the expiry sweep")
+expiry_sweep_seconds = registry.histogram(
+    "match_expiry_sweep_seconds", "Duration of an expired-match cleanup sweep")
+
+# Socket
+connected_sids = registry.gauge(
+    "socket_connected_sids", "Currently connected Socket.IO sids")
+broadcast_recipients = registry.histogram(
+    "socket_broadcast_recipients", "Fan-out size of a socket emit", ["event"], buckets=SIZE_BUCKETS)
+broadcast_seconds = registry.histogram(
+    "socket_broadcast_seconds", "Time spent emitting a socket event", ["event"])
+payload_bytes = registry.histogram(
+    "socket_payload_bytes", "Encoded JSON payload size per emitted event", ["event"], buckets=BYTES_BUCKETS)
+
+# 认证
+auth_cache_total = registry.counter(
+    "auth_user_cache_total", "User lookups in get_current_user, by cache result", ["result"])
+hash_queue_wait_seconds = registry.histogram(
+    "auth_hash_queue_wait_seconds", "Time a bcrypt job waited for a worker")
+hash_seconds = registry.histogram(
+    "auth_hash_seconds", "Time spent computing a bcrypt hash/verify",
+    buckets=(0.01, 0.025, 0.05, 0.1, 0.2, 0.3, 0.5, 1.0, 2.5))
+hash_rejected_total = registry.counter(
+    "auth_hash_rejected_total", "bcrypt jobs rejected because the queue was full")
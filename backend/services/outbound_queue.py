@@ -0,0 +1,181 @@
+# backend/services/outbound_queue.py
+
+import asyncio
+import logging
+import os
+import time
+from collections import deque
+from typing import Dict, Iterable, Optional
+
+import socketio
+
+from backend.services import metrics
+
+logger = logging.getLogger(__name__)
+
+# 每个 sid 在我们这一层最多排队的消息数，超出时丢弃最旧的
+OUTBOUND_QUEUE_MAX = int(os.getenv("OUTBOUND_QUEUE_MAX", "64"))
+# engineio 层(已交给 websocket 但对端还没读走)积压超过这么多包，就暂停向该 sid 推送
+SLOW_CLIENT_BACKLOG = int(os.getenv("SLOW_CLIENT_BACKLOG", "128"))
+# 持续处于积压状态超过这么多秒，判定为卡死并断开
+SLOW_CLIENT_TIMEOUT = float(os.getenv("SLOW_CLIENT_TIMEOUT", "15"))
+# 看门狗扫描间隔；engineio 积压超过 SLOW_CLIENT_BACKLOG * 4 的连接(包括观战房间的直接 emit)直接断开
+WATCHDOG_INTERVAL = float(os.getenv("SLOW_CLIENT_WATCHDOG_INTERVAL", "5"))
+
+# 全局实例，供其他模块导入使用
+outbound = None
+
+queued_total = metrics.registry.counter(
+    "socket_outbound_queued_total", "Messages queued for a sid", ["event"])
+collapsed_total = metrics.registry.counter(
+    "socket_outbound_collapsed_total", "Queued messages replaced by a newer one with the same key", ["event"])
+dropped_total = metrics.registry.counter(
+    "socket_outbound_dropped_total", "Queued messages dropped because the sid queue was full", ["event"])
+slow_disconnects_total = metrics.registry.counter(
+    "socket_slow_client_disconnects_total", "Sockets disconnected for not draining their send buffer")
+queued_messages = metrics.registry.gauge(
+    "socket_outbound_queued_messages", "Messages currently waiting in per-sid queues")
+
+
+def init_outbound_dispatcher(sio: socketio.AsyncServer):
+    """初始化全局 outbound 实例"""
+    global outbound
+    if outbound is None:
+        outbound = OutboundDispatcher(sio)
+    return outbound
+
+
+class _SidQueue:
+    __slots__ = ("items", "keys", "task", "stalled_since")
+
+    def __init__(self):
+        # 每个元素为 [event, data, key]，用 list 以便原地替换 data
+        self.items = deque()
+        self.keys: Dict[tuple, list] = {}
+        self.task: Optional[asyncio.Task] = None
+        self.stalled_since: Optional[float] = None
+
+
+class OutboundDispatcher:
+    """
+    每个 sid 一个有界发送队列，发送与产生消息的 handler 解耦:
+      - send() 只做入队，不 await；handler 的耗时与最慢的接收者无关
+      - 带 key 的消息(如 game_update/match_id、lobby_update)在队列里只保留最新一条
+      - 队列满时丢弃最旧的消息
+      - 每个 sid 的写任务按需创建，队列排空后退出，空闲连接不占任务
+      - 对端读得慢(engineio 积压)时暂停推送，让 key 合并生效；积压超过
+        SLOW_CLIENT_TIMEOUT 秒则断开该连接
+    """
+
+    def __init__(self, sio: socketio.AsyncServer, max_queue: int = OUTBOUND_QUEUE_MAX):
+        self.sio = sio
+        self.max_queue = max_queue
+        self.queues: Dict[str, _SidQueue] = {}
+        self.pending = 0
+        self._watchdog: Optional[asyncio.Task] = None
+        queued_messages.set_function(lambda: self.pending)
+
+    def start(self):
+        if self._watchdog is None:
+            self._watchdog = asyncio.create_task(self._watchdog_loop())
+
+    def send(self, sid: str, event: str, data, key: tuple = None):
+        q = self.queues.get(sid)
+        if q is None:
+            q = self.queues[sid] = _SidQueue()
+
+        if key is not None:
+            entry = q.keys.get(key)
+            if entry is not None:
+                entry[1] = data
+                collapsed_total.labels(event).inc()
+                return
+
+        if len(q.items) >= self.max_queue:
+            old_event, _, old_key = q.items.popleft()
+            if old_key is not None:
+                q.keys.pop(old_key, None)
+            self.pending -= 1
+            dropped_total.labels(old_event).inc()
+
+        entry = [event, data, key]
+        q.items.append(entry)
+        if key is not None:
+            q.keys[key] = entry
+        self.pending += 1
+        queued_total.labels(event).inc()
+
+        if q.task is None:
+            q.task = asyncio.create_task(self._drain(sid, q))
+
+    def broadcast(self, sids: Iterable[str], event: str, data, key: tuple = None):
+        for sid in sids:
+            self.send(sid, event, data, key)
+
+    def drop(self, sid: str):
+        """sid 断开时清理其队列"""
+        q = self.queues.pop(sid, None)
+        if q is None:
+            return
+        self.pending -= len(q.items)
+        q.items.clear()
+        q.keys.clear()
+        if q.task is not None and q.task is not asyncio.current_task():
+            q.task.cancel()
+
+    def _eio_backlog(self, sid: str) -> int:
+        try:
+            eio_sid = self.sio.manager.eio_sid_from_sid(sid, '/')
+            sock = self.sio.eio.sockets.get(eio_sid)
+            return sock.queue.qsize() if sock is not None else 0
+        except Exception:
+            return 0
+
+    async def _disconnect_slow(self, sid: str, backlog: int):
+        slow_disconnects_total.inc()
+        logger.warning(f"Disconnecting slow client sid={sid}, backlog={backlog}")
+        self.drop(sid)
+        try:
+            await self.sio.disconnect(sid)
+        except Exception as e:
+            logger.error(f"Error disconnecting slow client {sid}: {e}")
+
+    async def _drain(self, sid: str, q: _SidQueue):
+        try:
+            while q.items:
+                backlog = self._eio_backlog(sid)
+                if backlog > SLOW_CLIENT_BACKLOG:
+                    now = time.monotonic()
+                    if q.stalled_since is None:
+                        q.stalled_since = now
+                    elif now - q.stalled_since > SLOW_CLIENT_TIMEOUT:
+                        await self._disconnect_slow(sid, backlog)
+                        return
+                    await asyncio.sleep(0.05)
+                    continue
+                q.stalled_since = None
+
+                event, data, key = q.items.popleft()
+                if key is not None:
+                    q.keys.pop(key, None)
+                self.pending -= 1
+                try:
+                    await self.sio.emit(event, data, to=sid)
+                except Exception as e:
+                    logger.error(f"Error sending {event} to {sid}: {e}")
+        finally:
+            q.task = None
+
+    async def _watchdog_loop(self):
+        hard_limit = SLOW_CLIENT_BACKLOG * 4
+        while True:
+            await asyncio.sleep(WATCHDOG_INTERVAL)
+            try:
+                for eio_sid, sock in list(self.sio.eio.sockets.items()):
+                    backlog = sock.queue.qsize()
+                    if backlog > hard_limit:
+                        sid = self.sio.manager.sid_from_eio_sid(eio_sid, '/')
+                        if sid:
+                            await self._disconnect_slow(sid, backlog)
+            except Exception as e:
+                logger.error(f"Error in slow-client watchdog: {e}")
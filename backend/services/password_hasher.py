@@ -0,0 +1,122 @@
+# backend/services/password_hasher.py
+
+import asyncio
+import logging
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from backend.services import metrics
+
+logger = logging.getLogger(__name__)
+
+# bcrypt 的 C 实现在计算时会释放 GIL，所以用线程池就能真正并行，且无需 pickle
+HASH_WORKERS = int(os.getenv("HASH_WORKERS", "2"))
+# 已提交(排队 + 正在计算)的哈希任务上限，超过则直接拒绝
+HASH_MAX_PENDING = int(os.getenv("HASH_MAX_PENDING", "32"))
+
+# 全局实例，供其他模块导入使用
+password_hasher = None
+
+
+class HasherOverloaded(Exception):
+    """哈希队列已满，调用方应返回 429。"""
+    pass
+
+
+class PasswordHasher:
+    """
+    在独立、有界的线程池里执行 bcrypt hash/verify，避免阻塞事件循环。
+    - pending 超过 max_pending 时立即抛 HasherOverloaded(快速拒绝，不排队)
+    - 记录排队等待时间和实际哈希耗时
+    """
+
+    def __init__(self, context, workers: int = HASH_WORKERS, max_pending: int = HASH_MAX_PENDING):
+        self.context = context
+        self.workers = workers
+        self.max_pending = max_pending
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="bcrypt")
+        self.pending = 0
+
+        self.completed = 0
+        self.rejected = 0
+        self.wait_total = 0.0
+        self.wait_max = 0.0
+        self.hash_total = 0.0
+        self.hash_max = 0.0
+
+    async def _submit(self, fn, *args):
+        if self.pending >= self.max_pending:
+            self.rejected += 1
+            metrics.hash_rejected_total.inc()
+            logger.warning(f"Password hasher overloaded: pending={self.pending}, rejecting request")
+            raise HasherOverloaded()
+
+        self.pending += 1
+        enqueued = time.perf_counter()
+        timing = []
+
+        def job():
+            started = time.perf_counter()
+            try:
+                return fn(*args)
+            finally:
+                # hash/verify 抛异常(如数据库里的哈希格式不对)时也计入统计
+                timing.append((started - enqueued, time.perf_counter() - started))
+
+        try:
+            loop = asyncio.get_running_loop()
+            return await loop.run_in_executor(self._executor, job)
+        finally:
+            self.pending -= 1
+            if timing:
+                self._record(*timing[0])
+
+    def _record(self, waited: float, took: float):
+        self.completed += 1
+        self.wait_total += waited
+        self.wait_max = max(self.wait_max, waited)
+        self.hash_total += took
+        self.hash_max = max(self.hash_max, took)
+        metrics.hash_queue_wait_seconds.observe(waited)
+        metrics.hash_seconds.observe(took)
+
+    async def hash(self, password: str) -> str:
+        return await self._submit(self.context.hash, password)
+
+    async def verify(self, password: str, hashed: str) -> bool:
+        return await self._submit(self.context.verify, password, hashed)
+
+    def stats(self) -> dict:
+        done = self.completed or 1
+        return {
+            "workers": self.workers,
+            "max_pending": self.max_pending,
+            "pending": self.pending,
+            "completed": self.completed,
+            "rejected": self.rejected,
+            "queue_wait_avg_ms": round(self.wait_total / done * 1000, 3),
+            "queue_wait_max_ms": round(self.wait_max * 1000, 3),
+            "hash_time_avg_ms": round(self.hash_total / done * 1000, 3),
+            "hash_time_max_ms": round(self.hash_max * 1000, 3),
+        }
+
+    def close(self):
+        self._executor.shutdown(wait=False)
+
+
+def get_password_hasher(context=None) -> PasswordHasher:
+    """初始化(或获取)全局 password_hasher 实例"""
+    global password_hasher
+    if password_hasher is None:
+        if context is None:
+            from backend.auth import get_pwd_context
+            context = get_pwd_context()
+        password_hasher = PasswordHasher(context)
+    return password_hasher
+
+
+def close_password_hasher():
+    """关机时调用：只关闭已经创建的实例，不为了关闭而新建(也就不会导入 passlib)"""
+    if password_hasher is not None:
+        password_hasher.close()
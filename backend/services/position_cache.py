@@ -0,0 +1,172 @@
+# backend/services/position_cache.py
+
+"""
+局面评估缓存(置换表)，点目估计、死活判断、机器人搜索共用。
+
+  - 键为 (kind, Zobrist key, 轮到谁走, variant)：kind 区分评估种类("estimate" 等)，
+    variant 放影响结果的参数(贴目、模拟次数等)，同一局面在不同对局、不同请求间命中
+  - 按估算字节数限额，超出时按 LRU 淘汰
+  - 命中率、淘汰数、占用字节数通过 metrics 暴露
+  - 可选落盘：设置 POSITION_CACHE_PATH 后关机时写入文件，启动时读回，重启后缓存仍是热的
+"""
+
+import logging
+import os
+import pickle
+import sys
+import threading
+from collections import OrderedDict
+from typing import Any, Hashable, Optional
+
+from backend.services import metrics
+
+logger = logging.getLogger(__name__)
+
+# 全局缓存的内存上限(MB)
+POSITION_CACHE_MB = float(os.getenv("POSITION_CACHE_MB", "64"))
+# 落盘文件路径，留空则不落盘
+POSITION_CACHE_PATH = os.getenv("POSITION_CACHE_PATH", "")
+
+# 每个条目的固定开销估算：OrderedDict 节点 + 键元组 + 记录的大小
+ENTRY_OVERHEAD = 200
+PERSIST_VERSION = 1
+
+# 全局实例，供其他模块导入使用
+position_cache = None
+
+cache_requests = metrics.registry.counter(
+    "position_cache_requests_total", "Position cache lookups", ["cache", "result"])
+cache_evictions = metrics.registry.counter(
+    "position_cache_evictions_total", "Entries evicted from the position cache", ["cache"])
+cache_bytes = metrics.registry.gauge(
+    "position_cache_bytes", "Estimated memory held by the position cache", ["cache"])
+cache_entries = metrics.registry.gauge(
+    "position_cache_entries", "Entries in the position cache", ["cache"])
+
+
+def estimate_size(value: Any) -> int:
+    """粗略估算对象占用的字节数，只展开评估结果里常见的 dict/list/tuple"""
+    size = sys.getsizeof(value)
+    if isinstance(value, dict):
+        for k, v in value.items():
+            size += estimate_size(k) + estimate_size(v)
+    elif isinstance(value, (list, tuple)):
+        for v in value:
+            size += estimate_size(v)
+    return size
+
+
+class PositionCache:
+    """
+    线程安全的 LRU 缓存(同步路由在线程池里执行，会并发访问)。
+    put() 可以直接给出条目大小，省去估算(如机器人置换表的定长记录)。
+    """
+
+    def __init__(self, name: str, max_bytes: int):
+        self.name = name
+        self.max_bytes = max_bytes
+        self.bytes = 0
+        self._entries: "OrderedDict[tuple, tuple]" = OrderedDict()   # key -> (value, size)
+        self._lock = threading.Lock()
+        self._hits = cache_requests.labels(name, "hit")
+        self._misses = cache_requests.labels(name, "miss")
+        self._evictions = cache_evictions.labels(name)
+        cache_bytes.labels(name).set_function(lambda: self.bytes)
+        cache_entries.labels(name).set_function(lambda: len(self._entries))
+
+    def __len__(self):
+        return len(self._entries)
+
+    @staticmethod
+    def make_key(kind: str, zobrist: int, to_play: int, variant: Hashable = None) -> tuple:
+        return kind, zobrist, to_play, variant
+
+    def get(self, key: tuple) -> Optional[Any]:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self._misses.inc()
+                return None
+            self._entries.move_to_end(key)
+            self._hits.inc()
+            return entry[0]
+
+    def put(self, key: tuple, value: Any, size: Optional[int] = None):
+        if size is None:
+            size = estimate_size(value)
+        size += ENTRY_OVERHEAD
+        if size > self.max_bytes:
+            return
+        with self._lock:
+            old = self._entries.pop(key, None)
+            if old is not None:
+                self.bytes -= old[1]
+            self._entries[key] = (value, size)
+            self.bytes += size
+            while self.bytes > self.max_bytes:
+                _, (_, evicted) = self._entries.popitem(last=False)
+                self.bytes -= evicted
+                self._evictions.inc()
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self.bytes = 0
+
+    #########################################
+    # 落盘
+    #########################################
+    def save(self, path: str) -> int:
+        """按 LRU 顺序(旧 -> 新)写入文件，先写临时文件再改名；返回写入条数"""
+        with self._lock:
+            items = [(key, value) for key, (value, _) in self._entries.items()]
+        tmp = f"{path}.tmp"
+        with open(tmp, "wb") as f:
+            pickle.dump({"version": PERSIST_VERSION, "name": self.name, "items": items}, f,
+                        protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(tmp, path)
+        return len(items)
+
+    def load(self, path: str) -> int:
+        """读回 save() 写的文件；文件不存在或格式不对时忽略。返回载入条数"""
+        try:
+            with open(path, "rb") as f:
+                data = pickle.load(f)
+        except FileNotFoundError:
+            return 0
+        except Exception as e:
+            logger.warning(f"Ignoring unreadable position cache file {path}: {e}")
+            return 0
+        if not isinstance(data, dict) or data.get("version") != PERSIST_VERSION:
+            logger.warning(f"Ignoring position cache file {path} with unknown format")
+            return 0
+        for key, value in data["items"]:
+            self.put(key, value)
+        return len(data["items"])
+
+
+def get_position_cache() -> PositionCache:
+    """初始化(或获取)全局 position_cache 实例"""
+    global position_cache
+    if position_cache is None:
+        position_cache = PositionCache("shared", int(POSITION_CACHE_MB * 1024 * 1024))
+    return position_cache
+
+
+def load_position_cache():
+    """启动时调用：配置了 POSITION_CACHE_PATH 则读回上次保存的缓存"""
+    if not POSITION_CACHE_PATH:
+        return
+    count = get_position_cache().load(POSITION_CACHE_PATH)
+    logger.info(f"Loaded {count} position cache entries from {POSITION_CACHE_PATH}")
+
+
+def save_position_cache():
+    """关机时调用：配置了 POSITION_CACHE_PATH 则保存缓存"""
+    if not POSITION_CACHE_PATH or position_cache is None:
+        return
+    try:
+        count = position_cache.save(POSITION_CACHE_PATH)
+        logger.info(f"Saved {count} position cache entries to {POSITION_CACHE_PATH}")
+    except OSError as e:
+        logger.error(f"Failed to save position cache to {POSITION_CACHE_PATH}: {e}")
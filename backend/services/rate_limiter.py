@@ -0,0 +1,163 @@
+# backend/services/rate_limiter.py
+
+import json
+import logging
+import os
+import time
+from typing import Dict, Tuple
+
+from backend.services import metrics
+
+logger = logging.getLogger(__name__)
+
+# 每种事件的令牌桶: (每秒补充的令牌数, 桶容量)
+DEFAULT_EVENT_LIMITS: Dict[str, Tuple[float, float]] = {
+    "move_stone": (4, 8),
+    "mark_dead_stone": (4, 8),
+    "confirm_scoring": (1, 3),
+    "resign": (1, 3),
+    "update_status": (2, 5),
+    "joinGame": (2, 10),
+    "watch_game": (2, 10),
+    "unwatch_game": (2, 10),
+    "join_lobby": (1, 5),
+    "join_custom_room": (1, 5),
+    "leave_room": (2, 5),
+    "message": (5, 20),
+    # message 的子类型，在通用 message 限额之外再单独限
+    "message:get_rooms": (0.5, 3),
+    "message:pull_room_info": (1, 5),
+    "message:relay": (2, 10),
+}
+DEFAULT_LIMIT = (10, 20)
+
+# 同一用户可能开多个 socket；按用户的桶容量/速率是单个 sid 的倍数
+USER_LIMIT_MULTIPLIER = float(os.getenv("USER_RATE_LIMIT_MULTIPLIER", "2"))
+# JSON 覆盖，例如 '{"move_stone": [2, 4], "message:get_rooms": [0.2, 2]}'
+SOCKET_RATE_LIMITS = os.getenv("SOCKET_RATE_LIMITS", "")
+# 空闲超过这么久的桶会在清理时被移除(此时桶必然已满，移除不影响限流结果)
+BUCKET_IDLE_SECONDS = 300
+
+# 全局实例，供其他模块导入使用
+rate_limiter = None
+
+rejected_total = metrics.registry.counter(
+    "socket_events_rejected_total", "Socket events rejected by rate limits", ["event", "scope"])
+
+
+class TokenBucket:
+    __slots__ = ("tokens", "updated")
+
+    def __init__(self, capacity: float, now: float):
+        self.tokens = capacity
+        self.updated = now
+
+    def take(self, rate: float, capacity: float, now: float) -> bool:
+        tokens = min(capacity, self.tokens + (now - self.updated) * rate)
+        self.updated = now
+        if tokens >= 1:
+            self.tokens = tokens - 1
+            return True
+        self.tokens = tokens
+        return False
+
+
+class RateLimiter:
+    """
+    按 sid 和按用户的令牌桶限流，在任何对局/房间逻辑之前调用 allow()。
+    所有调用都在事件循环线程里，不加锁。
+    """
+
+    def __init__(self, limits: Dict[str, Tuple[float, float]] = None,
+                 user_multiplier: float = USER_LIMIT_MULTIPLIER):
+        self.limits = dict(DEFAULT_EVENT_LIMITS)
+        if limits:
+            self.limits.update(limits)
+        self.user_multiplier = user_multiplier
+        self.sid_users: Dict[str, str] = {}
+        # {sid: {event: bucket}} / {username: {event: bucket}}，断开时整个 sid 一次删掉
+        self._sid_buckets: Dict[str, Dict[str, TokenBucket]] = {}
+        self._user_buckets: Dict[str, Dict[str, TokenBucket]] = {}
+        self._calls = 0
+
+    def register(self, sid: str, username: str):
+        self.sid_users[sid] = username
+
+    def forget(self, sid: str):
+        self.sid_users.pop(sid, None)
+        self._sid_buckets.pop(sid, None)
+
+    def _bucket(self, buckets, owner, event, capacity, now) -> TokenBucket:
+        owned = buckets.get(owner)
+        if owned is None:
+            owned = buckets[owner] = {}
+        bucket = owned.get(event)
+        if bucket is None:
+            bucket = owned[event] = TokenBucket(capacity, now)
+        return bucket
+
+    def allow(self, sid: str, event: str) -> bool:
+        rate, capacity = self.limits.get(event, DEFAULT_LIMIT)
+        now = time.monotonic()
+
+        self._calls += 1
+        if self._calls % 4096 == 0:
+            self._prune(now)
+
+        if not self._bucket(self._sid_buckets, sid, event, capacity, now).take(rate, capacity, now):
+            rejected_total.labels(event, "sid").inc()
+            logger.debug("Rate limited sid=%s event=%s", sid, event)
+            return False
+
+        username = self.sid_users.get(sid)
+        if username:
+            m = self.user_multiplier
+            bucket = self._bucket(self._user_buckets, username, event, capacity * m, now)
+            if not bucket.take(rate * m, capacity * m, now):
+                rejected_total.labels(event, "user").inc()
+                logger.debug("Rate limited user=%s event=%s", username, event)
+                return False
+        return True
+
+    def _prune(self, now: float):
+        for buckets in (self._sid_buckets, self._user_buckets):
+            for owner, owned in list(buckets.items()):
+                idle = [event for event, b in owned.items() if now - b.updated > BUCKET_IDLE_SECONDS]
+                for event in idle:
+                    del owned[event]
+                if not owned:
+                    del buckets[owner]
+
+
+def _parse_limits(spec: str) -> Dict[str, Tuple[float, float]]:
+    if not spec:
+        return {}
+    try:
+        return {event: (float(v[0]), float(v[1])) for event, v in json.loads(spec).items()}
+    except Exception as e:
+        logger.error(f"Invalid SOCKET_RATE_LIMITS, using defaults: {e}")
+        return {}
+
+
+def get_rate_limiter() -> RateLimiter:
+    """初始化(或获取)全局 rate_limiter 实例"""
+    global rate_limiter
+    if rate_limiter is None:
+        rate_limiter = RateLimiter(_parse_limits(SOCKET_RATE_LIMITS))
+    return rate_limiter
+
+
+def notify_rejected(sid: str, event: str):
+    """
+    告诉客户端某个事件被限流了。走 outbound 队列并按事件合并，
+    刷屏的客户端在队列里最多只有一条 rate_limited。
+    """
+    from backend.services.outbound_queue import outbound
+    if outbound is None:
+        return
+    rate, _ = get_rate_limiter().limits.get(event, DEFAULT_LIMIT)
+    # rate 为 0 表示该事件被禁用(桶不再补充)，没有可等待的时间
+    retry_after = round(1 / rate, 3) if rate > 0 else None
+    outbound.send(sid, "rate_limited", {"event": event, "retry_after": retry_after},
+                  key=("rate_limited", event))
+
@@ -0,0 +1,413 @@
+# backend/services/ratings.py
+
+"""
+Glicko-2 等级分。
+
+  - 增量模式(线上)：每局结束由终局流水线调用 record_game()，双方各按"只有这一局的评分周期"更新，
+    O(1)；上次对局之后空过的周期数先用于放大 RD(久不下棋的不确定度增加)
+  - 批量模式(离线)：batch_recompute() 按评分周期(RATING_PERIOD_DAYS)分组，
+    每个周期内所有对局用周期开始时的分数，一次向量化计算所有棋手，用于调参后重跑全部历史：
+
+        python -m backend.services.ratings --recompute game_archive.jsonl --out ratings.jsonl
+
+  - 对外显示的 elo 取 Glicko-2 的 rating 四舍五入
+  - 持久化：RATINGS_PATH 为 JSON Lines 日志，每批只追加本批变化的棋手，读回时后写的覆盖先写的；
+    关机时重写为每人一行
+"""
+
+import argparse
+import asyncio
+import json
+import logging
+import math
+import os
+import sys
+import time
+from typing import Dict, Iterable, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_RATING = 1500.0
+DEFAULT_RD = 350.0
+DEFAULT_VOLATILITY = 0.06
+MIN_RD = 30.0
+# 系统常数 tau：越小，波动率变化越慢
+RATING_TAU = float(os.getenv("RATING_TAU", "0.5"))
+RATING_PERIOD_DAYS = float(os.getenv("RATING_PERIOD_DAYS", "7"))
+RATINGS_PATH = os.getenv("RATINGS_PATH", "ratings.jsonl")
+
+GLICKO_SCALE = 173.7178
+VOLATILITY_EPSILON = 1e-6
+PERIOD_SECONDS = RATING_PERIOD_DAYS * 86400
+
+# 全局实例，供其他模块导入使用
+rating_engine = None
+
+
+def result_for_black(winner: Optional[str]) -> Optional[float]:
+    """
+    把 GoGame.winner 文本转成黑方得分(1 胜 / 0 负 / 0.5 和)，无法识别时返回 None。
+    例: "white resigned, black wins" / "black wins by timeout" / "White by scoring" / "Draw by scoring"
+    """
+    if not winner:
+        return None
+    text = winner.lower()
+    if text.startswith("draw"):
+        return 0.5
+    if "black wins" in text or text.startswith("black by"):
+        return 1.0
+    if "white wins" in text or text.startswith("white by"):
+        return 0.0
+    return None
+
+
+class PlayerRating:
+    __slots__ = ("rating", "rd", "volatility", "games", "last_played")
+
+    def __init__(self, rating=DEFAULT_RATING, rd=DEFAULT_RD, volatility=DEFAULT_VOLATILITY,
+                 games=0, last_played=0.0):
+        self.rating = rating
+        self.rd = rd
+        self.volatility = volatility
+        self.games = games
+        self.last_played = last_played
+
+    @property
+    def elo(self) -> int:
+        return int(round(self.rating))
+
+    def to_list(self) -> list:
+        return [round(self.rating, 3), round(self.rd, 3), round(self.volatility, 6), self.games, self.last_played]
+
+
+#########################################
+# Glicko-2 公式(Glickman, "Example of the Glicko-2 system")
+#########################################
+def _g(phi):
+    return 1.0 / math.sqrt(1.0 + 3.0 * phi * phi / (math.pi * math.pi))
+
+
+def _new_volatility(phi: float, sigma: float, v: float, delta: float, tau: float) -> float:
+    """第 5 步：Illinois 迭代求新的波动率"""
+    a = math.log(sigma * sigma)
+    d2, p2 = delta * delta, phi * phi
+
+    def f(x):
+        ex = math.exp(x)
+        return ex * (d2 - p2 - v - ex) / (2.0 * (p2 + v + ex) ** 2) - (x - a) / (tau * tau)
+
+    A = a
+    if d2 > p2 + v:
+        B = math.log(d2 - p2 - v)
+    else:
+        k = 1
+        while f(a - k * tau) < 0:
+            k += 1
+        B = a - k * tau
+    fA, fB = f(A), f(B)
+    while abs(B - A) > VOLATILITY_EPSILON:
+        C = A + (A - B) * fA / (fB - fA)
+        fC = f(C)
+        if fC * fB <= 0:
+            A, fA = B, fB
+        else:
+            fA /= 2.0
+        B, fB = C, fC
+    return math.exp(A / 2.0)
+
+
+def glicko2_update(rating: float, rd: float, volatility: float,
+                   games: Iterable[Tuple[float, float, float]], tau: float = RATING_TAU) -> Tuple[float, float, float]:
+    """一个评分周期的更新；games 为 [(对手 rating, 对手 rd, 得分)]。返回 (rating, rd, volatility)"""
+    mu = (rating - DEFAULT_RATING) / GLICKO_SCALE
+    phi = rd / GLICKO_SCALE
+    v_inv = 0.0
+    score_sum = 0.0
+    for opp_rating, opp_rd, score in games:
+        g = _g(opp_rd / GLICKO_SCALE)
+        e = 1.0 / (1.0 + math.exp(-g * (mu - (opp_rating - DEFAULT_RATING) / GLICKO_SCALE)))
+        v_inv += g * g * e * (1.0 - e)
+        score_sum += g * (score - e)
+    if v_inv == 0.0:
+        return rating, min(math.sqrt(phi * phi + volatility * volatility) * GLICKO_SCALE, DEFAULT_RD), volatility
+    v = 1.0 / v_inv
+    sigma = _new_volatility(phi, volatility, v, v * score_sum, tau)
+    phi_star = math.sqrt(phi * phi + sigma * sigma)
+    phi_new = 1.0 / math.sqrt(1.0 / (phi_star * phi_star) + v_inv)
+    mu_new = mu + phi_new * phi_new * score_sum
+    return (mu_new * GLICKO_SCALE + DEFAULT_RATING,
+            max(MIN_RD, min(phi_new * GLICKO_SCALE, DEFAULT_RD)), sigma)
+
+
+#########################################
+# 增量模式
+#########################################
+class RatingEngine:
+    def __init__(self, tau: float = RATING_TAU, period_seconds: float = PERIOD_SECONDS):
+        self.tau = tau
+        self.period_seconds = period_seconds
+        self.players: Dict[str, PlayerRating] = {}
+
+    def get(self, username: str) -> PlayerRating:
+        player = self.players.get(username)
+        return player if player is not None else PlayerRating()
+
+    def elo(self, username: Optional[str]) -> int:
+        player = self.players.get(username) if username else None
+        return player.elo if player is not None else int(DEFAULT_RATING)
+
+    def _current_rd(self, player: PlayerRating, now: float) -> float:
+        """按上次对局之后完整空过的评分周期数放大 RD(与批量模式一致)"""
+        if not player.games or self.period_seconds <= 0:
+            return player.rd
+        periods = now // self.period_seconds - player.last_played // self.period_seconds - 1
+        if periods <= 0:
+            return player.rd
+        phi = player.rd / GLICKO_SCALE
+        phi = math.sqrt(phi * phi + player.volatility * player.volatility * periods)
+        return min(phi * GLICKO_SCALE, DEFAULT_RD)
+
+    def record_game(self, black: str, white: str, black_score: float, finished_at: Optional[float] = None):
+        """一局结束后更新双方，O(1)"""
+        now = finished_at if finished_at is not None else time.time()
+        b = self.players.setdefault(black, PlayerRating())
+        w = self.players.setdefault(white, PlayerRating())
+        b_rd, w_rd = self._current_rd(b, now), self._current_rd(w, now)
+        b_new = glicko2_update(b.rating, b_rd, b.volatility, [(w.rating, w_rd, black_score)], self.tau)
+        w_new = glicko2_update(w.rating, w_rd, w.volatility, [(b.rating, b_rd, 1.0 - black_score)], self.tau)
+        for player, (rating, rd, vol) in ((b, b_new), (w, w_new)):
+            player.rating, player.rd, player.volatility = rating, rd, vol
+            player.games += 1
+            player.last_played = now
+
+    #########################################
+    # 持久化
+    #########################################
+    def dump_lines(self, usernames: Iterable[str]) -> List[str]:
+        return [json.dumps([name] + self.players[name].to_list(), ensure_ascii=False) + "\n"
+                for name in usernames if name in self.players]
+
+    def load(self, path: str) -> int:
+        try:
+            with open(path, encoding="utf-8") as f:
+                for line in f:
+                    if line.strip():
+                        name, *values = json.loads(line)
+                        self.players[name] = PlayerRating(*values)
+        except FileNotFoundError:
+            return 0
+        return len(self.players)
+
+
+def get_rating_engine() -> RatingEngine:
+    """初始化(或获取)全局 rating_engine 实例"""
+    global rating_engine
+    if rating_engine is None:
+        rating_engine = RatingEngine()
+    return rating_engine
+
+
+def _append_lines(path: str, lines: List[str]):
+    with open(path, "a", encoding="utf-8") as f:
+        f.write("".join(lines))
+
+
+def _rewrite_lines(path: str, lines: List[str]):
+    tmp = f"{path}.tmp"
+    with open(tmp, "w", encoding="utf-8") as f:
+        f.write("".join(lines))
+    os.replace(tmp, path)
+
+
+async def rate_games(batch):
+    """
+    终局流水线的评分阶段：整批更新后把变化的棋手追加到 RATINGS_PATH。
+    写文件失败时流水线会重跑本阶段，已计分的局(item.rated)不再重复计分，只重写这些棋手。
+    """
+    engine = get_rating_engine()
+    changed = set()
+    for item in batch:
+        game = item.game
+        score = result_for_black(game.winner)
+        if score is None or not game.black_player or not game.white_player:
+            continue
+        if not game.move_records:
+            # 一手未下就结束(开局即认输/超时)的对局不计分
+            continue
+        if not item.rated:
+            engine.record_game(game.black_player, game.white_player, score, item.finished_at)
+            item.rated = True
+        changed.update((game.black_player, game.white_player))
+    if changed and RATINGS_PATH:
+        await asyncio.to_thread(_append_lines, RATINGS_PATH, engine.dump_lines(changed))
+
+
+def load_ratings():
+    """启动时调用：从 RATINGS_PATH 读回等级分"""
+    if not RATINGS_PATH:
+        return
+    count = get_rating_engine().load(RATINGS_PATH)
+    logger.info(f"Loaded ratings for {count} players from {RATINGS_PATH}")
+
+
+def save_ratings():
+    """关机时调用：把追加日志压缩成每人一行"""
+    if not RATINGS_PATH or rating_engine is None or not rating_engine.players:
+        return
+    try:
+        _rewrite_lines(RATINGS_PATH, rating_engine.dump_lines(list(rating_engine.players)))
+    except OSError as e:
+        logger.error(f"Failed to save ratings to {RATINGS_PATH}: {e}")
+
+
+#########################################
+# 批量模式(NumPy，只在离线重算时导入)
+#########################################
+def _new_volatility_vec(phi, sigma, v, delta, tau):
+    import numpy as np
+
+    a = np.log(sigma * sigma)
+    d2, p2 = delta * delta, phi * phi
+
+    def f(x):
+        ex = np.exp(x)
+        return ex * (d2 - p2 - v - ex) / (2.0 * (p2 + v + ex) ** 2) - (x - a) / (tau * tau)
+
+    A = a.copy()
+    big = d2 > p2 + v
+    B = np.where(big, np.log(np.where(big, d2 - p2 - v, 1.0)), a - tau)
+    search = ~big
+    while True:
+        search &= f(B) < 0
+        if not search.any():
+            break
+        B = np.where(search, B - tau, B)
+    fA, fB = f(A), f(B)
+    active = np.abs(B - A) > VOLATILITY_EPSILON
+    for _ in range(100):
+        if not active.any():
+            break
+        with np.errstate(divide="ignore", invalid="ignore"):
+            C = np.where(active, A + (A - B) * fA / (fB - fA), B)
+        fC = f(C)
+        swap = active & (fC * fB <= 0)
+        A = np.where(swap, B, A)
+        fA = np.where(swap, fB, np.where(active, fA / 2.0, fA))
+        B = np.where(active, C, B)
+        fB = np.where(active, fC, fB)
+        active &= np.abs(B - A) > VOLATILITY_EPSILON
+    return np.exp(A / 2.0)
+
+
+def batch_recompute(black, white, black_score, period, player_count: int, tau: float = RATING_TAU):
+    """
+    全量重算。black/white 为棋手下标，black_score 为黑方得分，period 为评分周期序号(非递减)。
+    返回 (rating, rd, volatility, games) 四个长度为 player_count 的数组。
+    同一周期内的对局都使用周期开始时的分数；没有对局的周期只放大 RD。
+    """
+    import numpy as np
+
+    mu = np.zeros(player_count)
+    phi = np.full(player_count, DEFAULT_RD / GLICKO_SCALE)
+    sigma = np.full(player_count, DEFAULT_VOLATILITY)
+    games = np.zeros(player_count, dtype=np.int64)
+    max_phi, min_phi = DEFAULT_RD / GLICKO_SCALE, MIN_RD / GLICKO_SCALE
+    if len(period) == 0:
+        return mu * GLICKO_SCALE + DEFAULT_RATING, phi * GLICKO_SCALE, sigma, games
+
+    bounds = np.flatnonzero(np.diff(period)) + 1
+    starts = np.concatenate(([0], bounds))
+    ends = np.concatenate((bounds, [len(period)]))
+    previous = period[0]
+    for start, end in zip(starts, ends):
+        # 空周期：没下棋的人 RD 按周期数放大(有过对局的人才放大，新人保持初始 RD)
+        idle = int(period[start] - previous) - 1
+        if idle > 0:
+            seen = games > 0
+            phi[seen] = np.minimum(np.sqrt(phi[seen] ** 2 + sigma[seen] ** 2 * idle), max_phi)
+        previous = period[start]
+
+        b, w, s = black[start:end], white[start:end], black_score[start:end]
+        idx = np.concatenate((b, w))
+        opp = np.concatenate((w, b))
+        score = np.concatenate((s, 1.0 - s))
+        g = 1.0 / np.sqrt(1.0 + 3.0 * phi[opp] ** 2 / np.pi ** 2)
+        e = 1.0 / (1.0 + np.exp(-g * (mu[idx] - mu[opp])))
+        v_inv = np.bincount(idx, g * g * e * (1.0 - e), minlength=player_count)
+        score_sum = np.bincount(idx, g * (score - e), minlength=player_count)
+        games += np.bincount(idx, minlength=player_count)
+
+        played = v_inv > 0
+        v = 1.0 / v_inv[played]
+        new_sigma = _new_volatility_vec(phi[played], sigma[played], v, v * score_sum[played], tau)
+        phi_star = np.sqrt(phi[played] ** 2 + new_sigma ** 2)
+        new_phi = 1.0 / np.sqrt(1.0 / phi_star ** 2 + v_inv[played])
+        mu[played] += new_phi ** 2 * score_sum[played]
+        sigma[played] = new_sigma
+
+        rest = ~played & (games > 0)
+        phi[rest] = np.sqrt(phi[rest] ** 2 + sigma[rest] ** 2)
+        phi[played] = new_phi
+        np.clip(phi, min_phi, max_phi, out=phi)
+
+    return mu * GLICKO_SCALE + DEFAULT_RATING, phi * GLICKO_SCALE, sigma, games
+
+
+def recompute_from_archive(path: str, tau: float = RATING_TAU,
+                           period_seconds: float = PERIOD_SECONDS) -> RatingEngine:
+    """读取终局流水线写的对局存档，批量重算所有棋手的等级分"""
+    import numpy as np
+
+    names: Dict[str, int] = {}
+    black, white, scores, finished = [], [], [], []
+    with open(path, encoding="utf-8") as f:
+        for line in f:
+            if not line.strip():
+                continue
+            record = json.loads(line)
+            score = result_for_black(record.get("winner"))
+            if score is None or not record.get("black_player") or not record.get("white_player"):
+                continue
+            if not record.get("moves"):
+                # 与增量模式一致：一手未下就结束的对局不计分
+                continue
+            black.append(names.setdefault(record["black_player"], len(names)))
+            white.append(names.setdefault(record["white_player"], len(names)))
+            scores.append(score)
+            finished.append(record.get("finished_at", 0.0))
+
+    finished = np.asarray(finished, dtype=np.float64)
+    order = np.argsort(finished, kind="stable")
+    period = (finished[order] // period_seconds).astype(np.int64)
+    rating, rd, vol, games = batch_recompute(
+        np.asarray(black, dtype=np.int64)[order], np.asarray(white, dtype=np.int64)[order],
+        np.asarray(scores, dtype=np.float64)[order], period, len(names), tau,
+    )
+    last_played = np.zeros(len(names))
+    np.maximum.at(last_played, np.asarray(black, dtype=np.int64), finished)
+    np.maximum.at(last_played, np.asarray(white, dtype=np.int64), finished)
+
+    engine = RatingEngine(tau, period_seconds)
+    for name, i in names.items():
+        engine.players[name] = PlayerRating(float(rating[i]), float(rd[i]), float(vol[i]),
+                                            int(games[i]), float(last_played[i]))
+    return engine
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Recompute Glicko-2 ratings from the game archive")
+    parser.add_argument("--recompute", required=True, help="game archive (JSON Lines)")
+    parser.add_argument("--out", default=RATINGS_PATH, help="ratings file to write")
+    parser.add_argument("--tau", type=float, default=RATING_TAU)
+    parser.add_argument("--period-days", type=float, default=RATING_PERIOD_DAYS)
+    args = parser.parse_args(argv)
+
+    started = time.perf_counter()
+    engine = recompute_from_archive(args.recompute, args.tau, args.period_days * 86400)
+    _rewrite_lines(args.out, engine.dump_lines(list(engine.players)))
+    print(f"Rated {len(engine.players)} players in {time.perf_counter() - started:.2f}s -> {args.out}",
+          file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,119 @@
+# backend/services/replay_log.py
+
+"""
+对局事件序号与重连补发。
+
+  - 每局一个单调递增的 seq，每次向对局双方广播 game_update 时加一，快照里带 seq 字段
+  - 同时记录相对上一次广播的增量(落子/提子的格子变化 + 变化了的状态字段)，
+    放在长度为 REPLAY_BUFFER_SIZE 的环形缓冲里
+  - 客户端重连时在 joinGame 里带上 last_seq：缓冲里还有 last_seq 之后的全部增量时
+    只发一条 game_replay(按顺序应用 deltas 即可追上)，否则退回发完整快照
+
+日志挂在 GoGame 上(game._replay)，对局对象回收时一起释放，不需要单独清理。
+"""
+
+import os
+from collections import deque
+from typing import Optional
+
+from backend.services import metrics
+from backend.services.game_snapshot import EncodedPayload, encode_message, get_game_snapshot
+
+REPLAY_BUFFER_SIZE = int(os.getenv("REPLAY_BUFFER_SIZE", "64"))
+
+replay_total = metrics.registry.counter(
+    "game_replay_total", "joinGame resyncs, by how the client was brought up to date", ["result"])
+replay_deltas = metrics.registry.histogram(
+    "game_replay_deltas", "Deltas sent in one game_replay", buckets=metrics.SIZE_BUCKETS)
+
+
+def _state_fields(game) -> dict:
+    return {
+        "current_player": game.current_player,
+        "game_over": game.game_over,
+        "winner": game.winner,
+        "captured": dict(game.captured),
+        "black_timer": game.timers["black"].to_dict(),
+        "white_timer": game.timers["white"].to_dict(),
+        **({"legal_moves": format(game.legal_moves(), "x")} if game.push_legal_moves else {}),
+    }
+
+
+class ReplayLog:
+    __slots__ = ("seq", "events", "board", "state")
+
+    def __init__(self, game, size: int = REPLAY_BUFFER_SIZE):
+        self.seq = 0
+        self.events = deque(maxlen=size)   # 增量 dict，events[-1]["seq"] == self.seq
+        self.board = [row[:] for row in game.board]
+        self.state = _state_fields(game)
+
+    def record(self, game, extra: dict = None) -> dict:
+        """记下当前局面相对上一次记录的增量，seq 加一"""
+        changes = []
+        for x, (old_row, new_row) in enumerate(zip(self.board, game.board)):
+            if old_row != new_row:
+                for y, (a, b) in enumerate(zip(old_row, new_row)):
+                    if a != b:
+                        changes.append([x, y, b])
+                self.board[x] = new_row[:]
+        state = _state_fields(game)
+        self.seq += 1
+        delta = {"seq": self.seq, "changes": changes}
+        delta.update({k: v for k, v in state.items() if self.state.get(k) != v})
+        if extra:
+            delta.update(extra)
+        self.state = state
+        self.events.append(delta)
+        return delta
+
+    def since(self, last_seq: int) -> Optional[list]:
+        """last_seq 之后的全部增量；缓冲里已经不全(或 last_seq 不合法)时返回 None"""
+        if last_seq > self.seq or last_seq < 0:
+            return None
+        missing = self.seq - last_seq
+        if missing > len(self.events):
+            return None
+        return list(self.events)[len(self.events) - missing:] if missing else []
+
+
+def get_replay_log(game) -> ReplayLog:
+    log = game._replay
+    if log is None:
+        log = game._replay = ReplayLog(game)
+    return log
+
+
+def publish_game_update(match_id: str, game, **extra) -> EncodedPayload:
+    """
+    要广播给对局双方的 game_update：记录增量、seq 加一，返回带 seq(及 extra 字段)的快照。
+    只发给单个 sid 的消息(如错误提示)用 stamped_snapshot，不占用 seq。
+    """
+    log = get_replay_log(game)
+    log.record(game, extra)
+    return get_game_snapshot(match_id, game).with_fields(seq=log.seq, **extra)
+
+
+def stamped_snapshot(match_id: str, game, **extra) -> EncodedPayload:
+    """当前快照 + 当前 seq"""
+    return get_game_snapshot(match_id, game).with_fields(seq=get_replay_log(game).seq, **extra)
+
+
+def resync_message(match_id: str, game, last_seq: Optional[int]) -> EncodedPayload:
+    """
+    重连补发：last_seq 之后的增量都还在缓冲里时返回 game_replay，否则返回完整快照
+    """
+    log = get_replay_log(game)
+    deltas = log.since(last_seq) if last_seq is not None else None
+    if deltas is None:
+        replay_total.labels("snapshot" if last_seq is None else "gap").inc()
+        return stamped_snapshot(match_id, game)
+    replay_total.labels("replay").inc()
+    replay_deltas.observe(len(deltas))
+    return encode_message({
+        "type": "game_replay",
+        "match_id": match_id,
+        "from_seq": last_seq,
+        "seq": log.seq,
+        "deltas": deltas,
+    })
@@ -0,0 +1,217 @@
+# backend/services/room_reaper.py
+
+"""
+房间回收。
+
+房间按状态有不同的存活时间(TTL)：
+  - waiting  (未开始)：最后一次变化后 ROOM_TTL_WAITING 秒；房里的真人都不在线时缩短为 ROOM_TTL_ABANDONED 秒
+  - playing  (对局中)：跟随对局过期(match_service 的 last_activity + MATCH_TIMEOUT)，对局已不存在则立即回收
+  - finished (已结束)：与 waiting 相同的在线规则——有真人在线按 ROOM_TTL_WAITING 保留(可以接着再下一盘)，
+    真人都不在线时为最后一人下线后 ROOM_TTL_ABANDONED 秒，且不超过结束后 ROOM_TTL_FINISHED 秒
+
+到期时间放在最小堆里(惰性删除：每次 touch 房间版本号加一，旧的堆项出堆时直接丢弃)，
+后台任务只在堆顶到期时醒来，重新判断一次状态，仍然到期才删除；不做全量扫描。
+同一轮删掉的房间交给 on_removed 一起处理(通知房间成员、合并成一次大厅广播)。
+
+触发重新计算到期时间的时机：房间变化(broadcast_update)、对局结束(终局流水线)、玩家上线/全部下线。
+"""
+
+import asyncio
+import heapq
+import logging
+import os
+import time
+from typing import Awaitable, Callable, Dict, List, Optional, Set
+
+from backend.services import metrics
+
+logger = logging.getLogger(__name__)
+
+ROOM_TTL_WAITING = float(os.getenv("ROOM_TTL_WAITING", "1800"))
+ROOM_TTL_ABANDONED = float(os.getenv("ROOM_TTL_ABANDONED", "120"))
+ROOM_TTL_FINISHED = float(os.getenv("ROOM_TTL_FINISHED", "600"))
+# 堆为空时的最长休眠，以及两次回收之间的最短间隔(让同一时刻到期的房间合并成一批)
+REAPER_MAX_SLEEP = 60.0
+REAPER_MIN_INTERVAL = 1.0
+
+# 全局实例，供其他模块导入使用
+room_reaper = None
+
+rooms_reaped = metrics.registry.counter(
+    "rooms_reaped_total", "Rooms removed by the reaper", ["state"])
+reaper_heap_size = metrics.registry.gauge(
+    "room_reaper_heap_entries", "Entries in the room expiry heap, including stale ones")
+
+
+def room_state(room: dict) -> str:
+    if room["started"]:
+        return "playing"
+    return "finished" if room.get("match_id") else "waiting"
+
+
+class RoomReaper:
+    def __init__(self, rooms: Dict[str, dict], on_removed: Callable[[Dict[str, dict]], Awaitable[None]]):
+        self.rooms = rooms
+        self.on_removed = on_removed
+        self._heap: List[tuple] = []             # (deadline, room_id, version)
+        self._version: Dict[str, int] = {}
+        self._touched: Dict[str, float] = {}     # room_id -> 最后一次变化时间
+        self._online: Dict[str, int] = {}        # username -> 在线 sid 数
+        self._offline_since: Dict[str, float] = {}
+        self._user_rooms: Dict[str, Set[str]] = {}
+        self._wakeup = asyncio.Event()
+        self._task: Optional[asyncio.Task] = None
+        reaper_heap_size.set_function(lambda: len(self._heap))
+
+    def start(self):
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    #########################################
+    # 触发点
+    #########################################
+    def touch(self, room_id: str):
+        """房间有变化：记录变化时间并重新计算到期时间"""
+        room = self.rooms.get(room_id)
+        if room is None:
+            self._forget(room_id)
+            return
+        self._touched[room_id] = time.time()
+        for username in room["players"]:
+            self._user_rooms.setdefault(username, set()).add(room_id)
+        self._schedule(room_id)
+
+    def user_online(self, username: str):
+        self._online[username] = self._online.get(username, 0) + 1
+        if self._offline_since.pop(username, None) is not None:
+            self._reschedule_user(username)
+
+    def user_offline(self, username: str) -> bool:
+        """一个连接断开；返回 True 表示这是该用户的最后一个连接(用户已离线)"""
+        count = self._online.get(username, 0) - 1
+        if count > 0:
+            self._online[username] = count
+            return False
+        self._online.pop(username, None)
+        self._offline_since[username] = time.time()
+        self._reschedule_user(username)
+        return True
+
+    def is_online(self, username: str) -> bool:
+        return username in self._online
+
+    def _reschedule_user(self, username: str):
+        room_ids = self._user_rooms.get(username)
+        if not room_ids:
+            return
+        for room_id in list(room_ids):
+            room = self.rooms.get(room_id)
+            if room is None or username not in room["players"]:
+                room_ids.discard(room_id)
+                continue
+            self._schedule(room_id)
+        if not room_ids:
+            del self._user_rooms[username]
+
+    #########################################
+    # 到期时间
+    #########################################
+    def deadline(self, room_id: str, room: dict) -> float:
+        from backend.services.bot_player import is_bot
+        from backend.services.match_service import MATCH_TIMEOUT, matches
+
+        touched = self._touched.get(room_id, room["timer"])
+        state = room_state(room)
+        if state == "playing":
+            match = matches.get(room.get("match_id"))
+            if match is None:
+                return 0.0
+            return match["last_activity"].timestamp() + MATCH_TIMEOUT.total_seconds()
+        ttl = ROOM_TTL_FINISHED if state == "finished" else ROOM_TTL_WAITING
+
+        humans = [p for p in room["players"] if not is_bot(p)]
+        if any(p in self._online for p in humans):
+            return touched + ROOM_TTL_WAITING
+        # 没有真人在线：从最后一个人下线(或房间最后变化)开始算
+        gone = max([touched] + [self._offline_since.get(p, touched) for p in humans])
+        return min(gone + ROOM_TTL_ABANDONED, touched + ttl)
+
+    def _schedule(self, room_id: str):
+        room = self.rooms.get(room_id)
+        if room is None:
+            return
+        version = self._version.get(room_id, 0) + 1
+        self._version[room_id] = version
+        deadline = self.deadline(room_id, room)
+        heapq.heappush(self._heap, (deadline, room_id, version))
+        if len(self._heap) > 2 * len(self._version) + 64:
+            # 过期项太多(房间频繁变化)时重建一次堆，避免无界增长
+            self._heap = [e for e in self._heap if self._version.get(e[1]) == e[2]]
+            heapq.heapify(self._heap)
+        if self._heap[0][2] == version and self._heap[0][1] == room_id:
+            # 新的堆顶更早，唤醒后台任务重新计算休眠时间
+            self._wakeup.set()
+
+    def _forget(self, room_id: str):
+        self._version.pop(room_id, None)
+        self._touched.pop(room_id, None)
+
+    #########################################
+    # 后台回收
+    #########################################
+    def reap(self, now: Optional[float] = None) -> Dict[str, dict]:
+        """弹出所有到期的堆项，仍然到期的房间删除(标记 deleting)；返回 {房间 ID: 被删除的房间}"""
+        now = now if now is not None else time.time()
+        removed = {}
+        heap = self._heap
+        while heap and heap[0][0] <= now:
+            _, room_id, version = heapq.heappop(heap)
+            if self._version.get(room_id) != version:
+                continue
+            room = self.rooms.get(room_id)
+            if room is None:
+                self._forget(room_id)
+                continue
+            deadline = self.deadline(room_id, room)
+            if deadline > now:
+                # 状态已变(如对局有新动作)，按新的到期时间重新入堆
+                heapq.heappush(heap, (deadline, room_id, version))
+                continue
+            state = room_state(room)
+            del self.rooms[room_id]
+            self._forget(room_id)
+            room["deleting"] = True
+            rooms_reaped.labels(state).inc()
+            removed[room_id] = room
+            logger.info(f"[reaper] removed {state} room {room_id}")
+        return removed
+
+    async def _run(self):
+        while True:
+            timeout = REAPER_MAX_SLEEP
+            if self._heap:
+                timeout = min(REAPER_MAX_SLEEP, max(REAPER_MIN_INTERVAL, self._heap[0][0] - time.time()))
+            self._wakeup.clear()
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), timeout)
+                continue
+            except asyncio.TimeoutError:
+                pass
+            try:
+                removed = self.reap()
+                if removed:
+                    await self.on_removed(removed)
+            except Exception as e:
+                logger.error(f"[reaper] failed: {e}")
+
+
+def init_room_reaper(rooms: Dict[str, dict], on_removed: Callable[[Dict[str, dict]], Awaitable[None]]) -> RoomReaper:
+    """初始化全局 room_reaper 实例；on_removed({room_id: room}) 负责通知房间成员和大厅"""
+    global room_reaper
+    if room_reaper is None:
+        room_reaper = RoomReaper(rooms, on_removed)
+    return room_reaper
+
+
+def get_room_reaper() -> Optional[RoomReaper]:
+    return room_reaper
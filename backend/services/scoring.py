@@ -1,5 +1,13 @@
 # backend/services/scoring.py
 
+import logging
+from typing import Optional
+
+from backend.services.geometry import get_geometry
+
+logger = logging.getLogger(__name__)
+
+
 def mark_dead_stone(game, x, y, current_player):
     """
     简单逻辑：只允许标记当前执棋方颜色的子为死子。
@@ -11,6 +19,43 @@ def mark_dead_stone(game, x, y, current_player):
         game.dead_stones.remove(pos)
     else:
         game.dead_stones.add(pos)
+    game.touch()
+
+
+async def auto_resolve_dead_stones(game) -> Optional[dict]:
+    """
+    确认点目前用死活求解器裁定已标记的死子(在 compute_pool 子进程里计算，有时间上限)：
+    判活的棋串取消死子标记，判死的棋串整串标记为死子，无法判断的保留双方的手工标记。
+    没人标记的棋串不会被自动改动，判死的放在 suggested 里供前端提示。
+    结果按 (局面, 已标记死子) 放进共享的局面缓存。返回 {"dead", "alive", "suggested"} 坐标列表，
+    求解失败时返回 None，死子保持原样。
+    """
+    from backend.services.compute_pool import get_compute_pool
+    from backend.services.legal_moves import COLOR_CODES
+    from backend.services.life_death import resolve_dead_stones
+    from backend.services.position_cache import PositionCache, get_position_cache
+
+    size = game.board_size
+    tracker = game.position()
+    marked = sorted(x * size + y for (x, y) in game.dead_stones)
+    cache = get_position_cache()
+    key = PositionCache.make_key("dead_stones", tracker.key, COLOR_CODES[game.current_player], tuple(marked))
+    result = cache.get(key)
+    if result is None:
+        try:
+            # 复制一份再交出去，序列化期间局面不会被改动
+            result = await get_compute_pool().run("life_death", resolve_dead_stones, tracker.copy(), marked)
+        except Exception as e:
+            logger.error(f"[auto_resolve_dead_stones] solver failed: {e}")
+            return None
+        cache.put(key, result)
+
+    dead = [divmod(p, size) for p in result["dead"]]
+    alive = [divmod(p, size) for p in result["alive"]]
+    game.dead_stones.difference_update(alive)
+    game.dead_stones.update(dead)
+    game.touch()
+    return {"dead": dead, "alive": alive, "suggested": [divmod(p, size) for p in result["suggested"]]}
 
 
 def final_scoring(game):
@@ -29,12 +74,7 @@ def final_scoring(game):
     visited = set()
     black_territory = 0
     white_territory = 0
-
-    def neighbors(r, c):
-        for (dr, dc) in [(-1,0),(1,0),(0,-1),(0,1)]:
-            nr, nc = r+dr, c+dc
-            if 0 <= nr < size and 0 <= nc < size:
-                yield nr, nc
+    adjacent = get_geometry(size).adjacent
 
     # flood fill 空交点
     for r in range(size):
@@ -49,12 +89,11 @@ def final_scoring(game):
                         continue
                     visited.add((rr, cc))
                     territory_points.append((rr, cc))
-                    for nr, nc in neighbors(rr, cc):
-                        if 0 <= nr < size and 0 <= nc < size:
-                            if board_copy[nr][nc] is None and (nr,nc) not in visited:
-                                queue.append((nr,nc))
-                            elif board_copy[nr][nc] in ("black", "white"):
-                                color_set.add(board_copy[nr][nc])
+                    for nr, nc in adjacent[rr][cc]:
+                        if board_copy[nr][nc] is None and (nr,nc) not in visited:
+                            queue.append((nr,nc))
+                        elif board_copy[nr][nc] in ("black", "white"):
+                            color_set.add(board_copy[nr][nc])
 
                 if len(color_set) == 1:
                     if "black" in color_set:
@@ -84,4 +123,7 @@ def final_scoring(game):
 
     game.game_over = True
     game.winner = winner + " by scoring"
+    game.touch()
+    from backend.services.go_game import finalize_game
+    finalize_game(game.match_id, game)
     return black_score, white_score, game.winner
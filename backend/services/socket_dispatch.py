@@ -0,0 +1,231 @@
+# backend/services/socket_dispatch.py
+
+"""
+Socket.IO 事件分发层。
+
+  - 会话缓存：connect 时把 sid -> username 放进进程内字典，handler 不再每次 await sio.get_session
+  - 载荷校验：每个事件注册时绑定一个 pydantic 模型(类定义时已编译好校验器)，不合法的载荷在进入 handler 前丢弃
+  - 对局授权：同一个 (sid, match_id) 只查一次该用户执哪一方，之后直接用缓存；对局不存在时清掉缓存
+  - message 事件按 type 查表分发，表里没有的 type 走转发 handler
+
+handler 的参数是 SocketRequest：sid、username、校验后的 data，对局事件还带 game 和 colors。
+
+    dispatcher = init_socket_dispatcher(sio)
+
+    @dispatcher.event(schema=MoveEvent, match="player")
+    async def move_stone(req: SocketRequest): ...
+"""
+
+import functools
+import logging
+import time
+from typing import Awaitable, Callable, Dict, Optional, Tuple, Type
+
+from pydantic import BaseModel, ValidationError
+
+from backend.services import metrics
+from backend.services.match_service import get_match
+from backend.services.rate_limiter import get_rate_limiter, notify_rejected
+
+logger = logging.getLogger(__name__)
+
+# 全局实例，供其他模块导入使用
+socket_dispatcher = None
+
+socket_events = metrics.registry.counter(
+    "socket_events_total", "Socket.IO events received, by dispatch result", ["event", "result"])
+socket_event_seconds = metrics.registry.histogram(
+    "socket_event_seconds", "Time spent handling a Socket.IO event", ["event"])
+
+
+class Session:
+    __slots__ = ("sid", "username", "matches")
+
+    def __init__(self, sid: str, username: str):
+        self.sid = sid
+        self.username = username
+        self.matches: Dict[str, Tuple[object, Tuple[str, ...]]] = {}   # match_id -> (game, 执的颜色)
+
+
+class SocketRequest:
+    __slots__ = ("sid", "username", "data", "raw", "match_id", "game", "colors")
+
+    def __init__(self, session: Session, data, raw):
+        self.sid = session.sid
+        self.username = session.username
+        self.data = data
+        self.raw = raw
+        self.match_id: Optional[str] = None
+        self.game = None
+        self.colors: Tuple[str, ...] = ()
+
+
+Handler = Callable[[SocketRequest], Awaitable[None]]
+
+
+def player_colors(game, username: str) -> Tuple[str, ...]:
+    """username 在这局里执的颜色；自己和自己下时两种都有"""
+    return tuple(c for c, p in (("black", game.black_player), ("white", game.white_player)) if p == username)
+
+
+class SocketDispatcher:
+    def __init__(self, sio):
+        self.sio = sio
+        self.sessions: Dict[str, Session] = {}
+        self.message_handlers: Dict[str, Tuple[Optional[Type[BaseModel]], Handler]] = {}
+        self.relay_handler: Optional[Handler] = None
+        sio.on("message", self._on_message)
+
+    #########################################
+    # 会话
+    #########################################
+    def open_session(self, sid: str, username: str) -> Session:
+        session = self.sessions[sid] = Session(sid, username)
+        return session
+
+    def close_session(self, sid: str) -> Optional[Session]:
+        return self.sessions.pop(sid, None)
+
+    async def _session(self, sid: str) -> Optional[Session]:
+        session = self.sessions.get(sid)
+        if session is None:
+            # 正常情况下 connect 已建好缓存；这里兜底读一次 python-socketio 的会话
+            try:
+                username = (await self.sio.get_session(sid)).get("username")
+            except KeyError:
+                return None
+            if username:
+                session = self.open_session(sid, username)
+        return session
+
+    def authorize(self, session: Session, match_id: str, game) -> Tuple[str, ...]:
+        cached = session.matches.get(match_id)
+        if cached is not None and cached[0] is game:
+            return cached[1]
+        colors = player_colors(game, session.username)
+        session.matches[match_id] = (game, colors)
+        return colors
+
+    #########################################
+    # 注册
+    #########################################
+    def event(self, name: str = None, schema: Type[BaseModel] = None, match: str = None):
+        """
+        注册 Socket.IO 事件(事件名默认取函数名)：
+          schema: 载荷模型，None 表示不校验(data 原样给 handler)
+          match:  None | "any"(对局必须存在) | "player"(且当前用户是对局一方)
+        """
+        def decorator(handler: Handler):
+            event = name or handler.__name__
+            self.sio.on(event, self._wrap(event, schema, match, handler))
+            return handler
+        return decorator
+
+    def message(self, msg_type: str, schema: Type[BaseModel] = None):
+        """注册 message 事件里某个 type 的 handler"""
+        def decorator(handler: Handler):
+            self.message_handlers[msg_type] = (schema, handler)
+            return handler
+        return decorator
+
+    def relay(self, handler: Handler):
+        """message 里 type 不在表中的消息交给这个 handler(转发给对局/房间)"""
+        self.relay_handler = handler
+        return handler
+
+    #########################################
+    # 分发
+    #########################################
+    def _wrap(self, event: str, schema, match: Optional[str], handler: Handler):
+        limiter = get_rate_limiter()
+        accepted = socket_events.labels(event, "ok")
+        elapsed = socket_event_seconds.labels(event)
+
+        @functools.wraps(handler)
+        async def wrapper(sid, data=None, *args):
+            if not limiter.allow(sid, event):
+                notify_rejected(sid, event)
+                socket_events.labels(event, "rate_limited").inc()
+                return None
+            req = await self._request(event, sid, data, schema, match)
+            if req is None:
+                return None
+            accepted.inc()
+            started = time.perf_counter()
+            try:
+                return await handler(req)
+            finally:
+                elapsed.observe(time.perf_counter() - started)
+
+        return wrapper
+
+    async def _request(self, event: str, sid: str, data, schema, match: Optional[str]) -> Optional[SocketRequest]:
+        session = await self._session(sid)
+        if session is None:
+            logger.warning(f"[{event}] no session for sid={sid}")
+            socket_events.labels(event, "no_session").inc()
+            return None
+        parsed = data
+        if schema is not None:
+            try:
+                parsed = schema.model_validate(data if data is not None else {})
+            except ValidationError as e:
+                logger.info(f"[{event}] invalid payload from {session.username}: {e.errors(include_url=False)}")
+                socket_events.labels(event, "invalid").inc()
+                return None
+        req = SocketRequest(session, parsed, data)
+        if match is None:
+            return req
+
+        match_id = parsed.match_id
+        game = get_match(match_id)
+        if game is None:
+            session.matches.pop(match_id, None)
+            logger.info(f"[{event}] Match not found: {match_id}")
+            socket_events.labels(event, "not_found").inc()
+            return None
+        req.match_id = match_id
+        req.game = game
+        req.colors = self.authorize(session, match_id, game)
+        if match == "player" and not req.colors:
+            logger.info(f"[{event}] {session.username} is not a player in match {match_id}")
+            socket_events.labels(event, "forbidden").inc()
+            return None
+        return req
+
+    async def _on_message(self, sid, data=None, *args):
+        limiter = get_rate_limiter()
+        if not limiter.allow(sid, "message"):
+            notify_rejected(sid, "message")
+            return None
+        if not isinstance(data, dict):
+            socket_events.labels("message", "invalid").inc()
+            return None
+        # 在通用 message 限额之外，按子类型再限一次；转发类消息共用 message:relay
+        msg_type = data.get("type")
+        entry = self.message_handlers.get(msg_type)
+        if entry is None:
+            msg_type, entry = "relay", (None, self.relay_handler)
+        if not limiter.allow(sid, f"message:{msg_type}"):
+            notify_rejected(sid, f"message:{msg_type}")
+            return None
+        schema, handler = entry
+        if handler is None:
+            return None
+        req = await self._request(f"message:{msg_type}", sid, data, schema, None)
+        if req is None:
+            return None
+        socket_events.labels(f"message:{msg_type}", "ok").inc()
+        return await handler(req)
+
+
+def init_socket_dispatcher(sio) -> SocketDispatcher:
+    """初始化全局 socket_dispatcher 实例"""
+    global socket_dispatcher
+    if socket_dispatcher is None:
+        socket_dispatcher = SocketDispatcher(sio)
+    return socket_dispatcher
+
+
+def get_socket_dispatcher() -> Optional[SocketDispatcher]:
+    return socket_dispatcher
@@ -0,0 +1,183 @@
+# backend/services/spectator_hub.py
+
+import asyncio
+import logging
+import os
+from typing import Dict, Optional
+
+import socketio
+
+from backend.services import metrics
+from backend.services.game_snapshot import get_game_snapshot
+
+logger = logging.getLogger(__name__)
+
+# 每个对局给观战者推送的最高频率(次/秒)，期间的多步棋合并成一次增量
+SPECTATOR_UPDATES_PER_SEC = float(os.getenv("SPECTATOR_UPDATES_PER_SEC", "2"))
+
+# 全局实例，供其他模块导入使用
+spectator_hub = None
+
+spectators_gauge = metrics.registry.gauge(
+    "spectator_sids", "Sockets currently watching a match")
+spectator_flush_seconds = metrics.registry.histogram(
+    "spectator_flush_seconds", "Time spent building and emitting one spectator delta")
+
+
+def init_spectator_hub(sio: socketio.AsyncServer):
+    """初始化全局 spectator_hub 实例"""
+    global spectator_hub
+    if spectator_hub is None:
+        spectator_hub = SpectatorHub(sio)
+    return spectator_hub
+
+
+def _watch_room(match_id: str) -> str:
+    return f"watch_{match_id}"
+
+
+class SpectatorHub:
+    """
+    观战者的只读推送通道，与对局双方的 game_{match_id} 房间完全分开。
+
+    - 观战者加入 Socket.IO 房间 watch_{match_id}，每局只记一个计数
+    - 落子路径只调用 notify()：O(1)，只把对局标记为 dirty，不感知观战人数
+    - 后台任务按 SPECTATOR_UPDATES_PER_SEC 定期把 dirty 对局合并成一条增量，
+      对整个 watch 房间 emit 一次(编码一次，发给所有观战者)
+    - 增量带 from_version / version，changes 为 [x, y, color] 绝对值，重复应用无害；
+      观战者发现断档(from_version 比本地更新)时重新 watch_game 拿快照即可
+    """
+
+    def __init__(self, sio: socketio.AsyncServer, updates_per_sec: float = SPECTATOR_UPDATES_PER_SEC):
+        self.sio = sio
+        self.interval = 1.0 / max(updates_per_sec, 0.01)
+
+        self.counts: Dict[str, int] = {}      # match_id -> 观战人数
+        self.watching: Dict[str, str] = {}    # sid -> match_id，只在进出观战时使用
+        # match_id -> (version, board 副本, 附加状态)，即观战者当前已知的局面
+        self._baseline: Dict[str, tuple] = {}
+        self._dirty: Dict[str, object] = {}   # match_id -> game
+        self._task: Optional[asyncio.Task] = None
+
+    def start(self):
+        if self._task is None:
+            self._task = asyncio.create_task(self._flush_loop())
+
+    def spectator_count(self, match_id: str) -> int:
+        return self.counts.get(match_id, 0)
+
+    def notify(self, match_id: str, game):
+        """落子/状态变化后调用；没有观战者时什么都不做"""
+        if match_id in self.counts:
+            self._dirty[match_id] = game
+
+    async def on_games_finished(self, batch):
+        """
+        终局流水线的一个阶段：超时判负、点目结算等不一定经过落子路径，
+        所有结束的对局都会进流水线，在这里统一标记 dirty(运行在事件循环线程里)。
+        """
+        for item in batch:
+            self.notify(item.match_id, item.game)
+
+    @staticmethod
+    def _state_of(game) -> tuple:
+        return (
+            game.version,
+            [row[:] for row in game.board],
+            {
+                "current_player": game.current_player,
+                "game_over": game.game_over,
+                "winner": game.winner,
+                "captured": dict(game.captured),
+                "black_timer": game.timers["black"].to_dict(),
+                "white_timer": game.timers["white"].to_dict(),
+            },
+        )
+
+    async def watch(self, sid: str, match_id: str, game):
+        old = self.watching.get(sid)
+        if old and old != match_id:
+            await self.unwatch(sid)
+
+        # 先把尚未推送的变化发给已有观战者，再把基线重置为当前局面
+        if match_id in self._dirty:
+            await self._flush_match(match_id, self._dirty.pop(match_id))
+
+        if old != match_id:
+            await self.sio.enter_room(sid, _watch_room(match_id))
+            self.watching[sid] = match_id
+            self.counts[match_id] = self.counts.get(match_id, 0) + 1
+            spectators_gauge.inc()
+
+        # 基线与快照之间没有 await，二者对应同一个 version
+        self._baseline[match_id] = self._state_of(game)
+        snapshot = get_game_snapshot(match_id, game).with_fields(
+            version=game.version, spectators=self.counts[match_id]
+        )
+        await self.sio.emit("spectator_snapshot", snapshot, to=sid)
+        logger.info(f"sid={sid} watching match {match_id}, spectators={self.counts[match_id]}")
+
+    async def unwatch(self, sid: str):
+        match_id = self.watching.pop(sid, None)
+        if match_id is None:
+            return
+        spectators_gauge.dec()
+        remaining = self.counts.get(match_id, 1) - 1
+        if remaining <= 0:
+            self.counts.pop(match_id, None)
+            self._baseline.pop(match_id, None)
+            self._dirty.pop(match_id, None)
+        else:
+            self.counts[match_id] = remaining
+        try:
+            await self.sio.leave_room(sid, _watch_room(match_id))
+        except Exception:
+            # sid 已断开时房间已由 socketio 自动清理
+            pass
+
+    def _build_delta(self, match_id: str, game) -> Optional[dict]:
+        baseline = self._baseline.get(match_id)
+        if baseline is None:
+            return None
+        from_version, old_board, old_state = baseline
+        if game.version == from_version:
+            return None
+        new_version, new_board, new_state = self._state_of(game)
+
+        changes = []
+        for x, (old_row, new_row) in enumerate(zip(old_board, new_board)):
+            if old_row != new_row:
+                for y, (a, b) in enumerate(zip(old_row, new_row)):
+                    if a != b:
+                        changes.append([x, y, b])
+
+        self._baseline[match_id] = (new_version, new_board, new_state)
+        delta = {
+            "type": "spectator_update",
+            "match_id": match_id,
+            "from_version": from_version,
+            "version": new_version,
+            "changes": changes,
+            "spectators": self.counts.get(match_id, 0),
+        }
+        delta.update({k: v for k, v in new_state.items() if old_state.get(k) != v})
+        return delta
+
+    async def _flush_match(self, match_id: str, game):
+        started = asyncio.get_running_loop().time()
+        delta = self._build_delta(match_id, game)
+        if delta is not None:
+            await self.sio.emit("spectator_update", delta, room=_watch_room(match_id))
+        spectator_flush_seconds.observe(asyncio.get_running_loop().time() - started)
+
+    async def _flush_loop(self):
+        while True:
+            await asyncio.sleep(self.interval)
+            if not self._dirty:
+                continue
+            dirty, self._dirty = self._dirty, {}
+            for match_id, game in dirty.items():
+                try:
+                    await self._flush_match(match_id, game)
+                except Exception as e:
+                    logger.error(f"Error flushing spectator update for {match_id}: {e}")
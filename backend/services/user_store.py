@@ -0,0 +1,307 @@
+# backend/services/user_store.py
+
+import abc
+import asyncio
+import logging
+import os
+import random
+import sqlite3
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, Iterable, List, Optional
+
+logger = logging.getLogger(__name__)
+
+# 用户存储后端: "dynamodb"(默认, 线上) 或 "sqlite"(本地/压测, 无需网络)
+USER_STORE_BACKEND = os.getenv("USER_STORE", "dynamodb")
+USER_STORE_POOL_SIZE = int(os.getenv("USER_STORE_POOL_SIZE", "8"))
+
+DYNAMODB_REGION = os.getenv("DYNAMODB_REGION", "ap-east-1")
+DYNAMODB_USER_TABLE = os.getenv("DYNAMODB_USER_TABLE", "user_passwords")
+
+SQLITE_USER_DB = os.getenv("USER_DB_PATH", "users.db")
+
+# BatchGetItem 返回 UnprocessedKeys(被限流)时的重试：指数退避 + 抖动
+DYNAMODB_BATCH_RETRIES = 8
+DYNAMODB_BACKOFF_BASE = 0.05
+DYNAMODB_BACKOFF_MAX = 2.0
+
+# 全局实例，供其他模块导入使用
+user_repository = None
+
+
+class UserRepository(abc.ABC):
+    """
+    用户存储接口。所有方法都是 async，具体实现负责不阻塞事件循环。
+
+    用户记录统一为 dict: {"username", "email", "password"(bcrypt hash)}
+    """
+
+    @abc.abstractmethod
+    async def get_user(self, username: str) -> Optional[dict]:
+        ...
+
+    @abc.abstractmethod
+    async def create_user(self, user: dict) -> bool:
+        """写入新用户；用户名已存在时返回 False，不覆盖。"""
+
+    @abc.abstractmethod
+    async def get_users(self, usernames: Iterable[str]) -> Dict[str, dict]:
+        """批量读取，返回 {username: user}，不存在的用户不出现在结果里。"""
+
+    @abc.abstractmethod
+    async def put_users(self, users: Iterable[dict]) -> int:
+        """批量写入(存在则覆盖)，返回写入条数。"""
+
+    def close(self):
+        pass
+
+
+class _PooledRepository(UserRepository):
+    """
+    把阻塞的驱动调用放到固定大小的线程池里执行。
+    每个工作线程持有自己的连接(threading.local)，线程数即连接池大小。
+    子类只实现同步的 _open_connection / _close_connection / _get_user / _create_user / _get_users / _put_users。
+    """
+
+    def __init__(self, pool_size: int, name: str):
+        self.pool_size = pool_size
+        self._local = threading.local()
+        self._executor = ThreadPoolExecutor(max_workers=pool_size, thread_name_prefix=name)
+        # 所有工作线程打开的连接，close() 时统一关闭
+        self._connections = []
+        self._connections_lock = threading.Lock()
+
+    def _connection(self):
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = self._open_connection()
+            self._local.conn = conn
+            with self._connections_lock:
+                self._connections.append(conn)
+        return conn
+
+    @abc.abstractmethod
+    def _open_connection(self):
+        ...
+
+    def _close_connection(self, conn):
+        conn.close()
+
+    @abc.abstractmethod
+    def _get_user(self, username: str) -> Optional[dict]:
+        ...
+
+    @abc.abstractmethod
+    def _create_user(self, user: dict) -> bool:
+        ...
+
+    @abc.abstractmethod
+    def _get_users(self, usernames: List[str]) -> Dict[str, dict]:
+        ...
+
+    @abc.abstractmethod
+    def _put_users(self, users: List[dict]) -> int:
+        ...
+
+    async def _run(self, fn, *args):
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self._executor, fn, *args)
+
+    async def get_user(self, username: str) -> Optional[dict]:
+        return await self._run(self._get_user, username)
+
+    async def create_user(self, user: dict) -> bool:
+        return await self._run(self._create_user, user)
+
+    async def get_users(self, usernames: Iterable[str]) -> Dict[str, dict]:
+        usernames = list(dict.fromkeys(usernames))
+        if not usernames:
+            return {}
+        return await self._run(self._get_users, usernames)
+
+    async def put_users(self, users: Iterable[dict]) -> int:
+        users = list(users)
+        if not users:
+            return 0
+        return await self._run(self._put_users, users)
+
+    def close(self):
+        """等进行中的请求结束后关闭线程池和各线程的连接"""
+        self._executor.shutdown(wait=True)
+        with self._connections_lock:
+            connections, self._connections = self._connections, []
+        for conn in connections:
+            try:
+                self._close_connection(conn)
+            except Exception as e:
+                logger.warning(f"Failed to close user store connection: {e}")
+
+
+class DynamoUserRepository(_PooledRepository):
+    """
+    DynamoDB 实现。boto3 resource 不是线程安全的，所以每个工作线程各建一个，
+    并共享同一个 botocore 连接池上限。boto3 只在第一次真正访问时才导入和创建。
+    """
+
+    def __init__(self, table_name: str = DYNAMODB_USER_TABLE, region: str = DYNAMODB_REGION,
+                 pool_size: int = USER_STORE_POOL_SIZE):
+        super().__init__(pool_size, "dynamo-users")
+        self.table_name = table_name
+        self.region = region
+
+    def _open_connection(self):
+        import boto3
+        from botocore.config import Config
+
+        session = boto3.session.Session()
+        resource = session.resource(
+            "dynamodb",
+            region_name=self.region,
+            config=Config(max_pool_connections=self.pool_size),
+        )
+        return resource
+
+    def _close_connection(self, resource):
+        resource.meta.client.close()
+
+    def _table(self):
+        return self._connection().Table(self.table_name)
+
+    def _get_user(self, username: str) -> Optional[dict]:
+        response = self._table().get_item(Key={"username": username})
+        return response.get("Item")
+
+    def _create_user(self, user: dict) -> bool:
+        from botocore.exceptions import ClientError
+
+        try:
+            self._table().put_item(
+                Item=user,
+                ConditionExpression="attribute_not_exists(username)",
+            )
+            return True
+        except ClientError as e:
+            if e.response.get("Error", {}).get("Code") == "ConditionalCheckFailedException":
+                return False
+            raise
+
+    def _get_users(self, usernames: List[str]) -> Dict[str, dict]:
+        resource = self._connection()
+        result = {}
+        # BatchGetItem 每次最多 100 个 key
+        for i in range(0, len(usernames), 100):
+            keys = [{"username": u} for u in usernames[i:i + 100]]
+            request = {self.table_name: {"Keys": keys}}
+            attempt = 0
+            while request:
+                response = resource.batch_get_item(RequestItems=request)
+                for item in response.get("Responses", {}).get(self.table_name, []):
+                    result[item["username"]] = item
+                request = response.get("UnprocessedKeys") or None
+                if request:
+                    # 表被限流：退避后只重试未处理的 key，次数用完仍有剩余则报错(不能当作用户不存在)
+                    if attempt >= DYNAMODB_BATCH_RETRIES:
+                        raise RuntimeError(
+                            f"BatchGetItem on {self.table_name} still has unprocessed keys after {attempt} retries")
+                    delay = min(DYNAMODB_BACKOFF_MAX, DYNAMODB_BACKOFF_BASE * 2 ** attempt)
+                    time.sleep(delay * random.uniform(0.5, 1.0))
+                    attempt += 1
+        return result
+
+    def _put_users(self, users: List[dict]) -> int:
+        with self._table().batch_writer(overwrite_by_pkeys=["username"]) as writer:
+            for user in users:
+                writer.put_item(Item=user)
+        return len(users)
+
+
+class SQLiteUserRepository(_PooledRepository):
+    """
+    嵌入式 SQLite 实现，用于本地部署和压测。
+    - WAL 模式: 读写互不阻塞，多个线程连接可以并发读
+    - SQL 文本全部是常量，配合 sqlite3 的语句缓存，等价于预编译语句
+    - 批量读按固定宽度分块(不足的用 NULL 补齐)，保证只编译一条 IN 语句
+    """
+
+    BATCH_WIDTH = 64
+
+    _CREATE_TABLE = (
+        "CREATE TABLE IF NOT EXISTS users ("
+        "username TEXT PRIMARY KEY, email TEXT NOT NULL, password TEXT NOT NULL)"
+    )
+    _SELECT_ONE = "SELECT username, email, password FROM users WHERE username = ?"
+    _SELECT_BATCH = (
+        "SELECT username, email, password FROM users WHERE username IN ("
+        + ",".join("?" * BATCH_WIDTH) + ")"
+    )
+    _INSERT = "INSERT OR IGNORE INTO users (username, email, password) VALUES (?, ?, ?)"
+    _UPSERT = "INSERT OR REPLACE INTO users (username, email, password) VALUES (?, ?, ?)"
+
+    def __init__(self, path: str = SQLITE_USER_DB, pool_size: int = USER_STORE_POOL_SIZE):
+        super().__init__(pool_size, "sqlite-users")
+        self.path = path
+        # 建表只需做一次，用一个临时连接完成，顺便把数据库切到 WAL
+        conn = self._open_connection()
+        conn.close()
+
+    def _open_connection(self):
+        # 每个连接只在打开它的工作线程里使用；关闭时(close)由其他线程在线程池停止后统一关闭
+        conn = sqlite3.connect(self.path, timeout=30, cached_statements=64, isolation_level=None,
+                               check_same_thread=False)
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        conn.execute(self._CREATE_TABLE)
+        return conn
+
+    @staticmethod
+    def _row_to_user(row) -> dict:
+        return {"username": row[0], "email": row[1], "password": row[2]}
+
+    def _get_user(self, username: str) -> Optional[dict]:
+        row = self._connection().execute(self._SELECT_ONE, (username,)).fetchone()
+        return self._row_to_user(row) if row else None
+
+    def _create_user(self, user: dict) -> bool:
+        cur = self._connection().execute(
+            self._INSERT, (user["username"], user["email"], user["password"])
+        )
+        return cur.rowcount == 1
+
+    def _get_users(self, usernames: List[str]) -> Dict[str, dict]:
+        conn = self._connection()
+        result = {}
+        width = self.BATCH_WIDTH
+        for i in range(0, len(usernames), width):
+            chunk = usernames[i:i + width]
+            params = chunk + [None] * (width - len(chunk))
+            for row in conn.execute(self._SELECT_BATCH, params):
+                result[row[0]] = self._row_to_user(row)
+        return result
+
+    def _put_users(self, users: List[dict]) -> int:
+        conn = self._connection()
+        rows = [(u["username"], u["email"], u["password"]) for u in users]
+        conn.execute("BEGIN")
+        try:
+            conn.executemany(self._UPSERT, rows)
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+        return len(rows)
+
+
+def get_user_repository() -> UserRepository:
+    """按 USER_STORE 环境变量创建(并缓存)全局的用户存储实例"""
+    global user_repository
+    if user_repository is None:
+        if USER_STORE_BACKEND == "sqlite":
+            user_repository = SQLiteUserRepository()
+        elif USER_STORE_BACKEND == "dynamodb":
+            user_repository = DynamoUserRepository()
+        else:
+            raise ValueError(f"Unknown USER_STORE backend: {USER_STORE_BACKEND}")
+        logger.info(f"User repository initialized: {type(user_repository).__name__}")
+    return user_repository
@@ -1,9 +1,19 @@
 # backend/services/websocket_manager.py
 
 import logging
+import time
 import socketio
 from typing import Dict, List
 
+from backend.services import metrics
+from backend.services.game_snapshot import EncodedPayload, encode_message
+from backend.services.outbound_queue import init_outbound_dispatcher
+
+# 这些事件是完整状态，旧的一条可以被新的一条直接替换；
+# game_update 还要求是 get_game_snapshot 生成的快照(EncodedPayload.collapsible)
+COLLAPSIBLE_EVENTS = {'game_update', 'lobby_update', 'room_update', 'readyStateUpdate'}
+KNOWN_EVENTS = COLLAPSIBLE_EVENTS | {'game_replay'}
+
 logger = logging.getLogger(__name__)
 
 # 全局实例，供其他模块导入使用
@@ -31,6 +41,7 @@ class SocketIOManager:
         此后所有的 emit/broadcast 操作都走 self.sio。
         """
         self.sio = sio
+        self.outbound = init_outbound_dispatcher(sio)
 
         # active_connections: { room_id: [sid1, sid2, ...] }
         self.active_connections: Dict[str, List[str]] = {}
@@ -122,51 +133,59 @@ class SocketIOManager:
         """
         return self.user_mapping.get(sid)
 
-    async def send_message(self, room_id: str, message: dict, target_sid: str=None):
+    async def send_message(self, room_id: str, message, target_sid: str=None, relayed: bool=False):
         """
         向指定房间里的所有连接(or单个sid)发送事件。
+        - message 可以是 dict，也可以是已编码的 EncodedPayload(直接复用，不再编码)
         - 根据 message['type'] 确定事件名 => 'lobby_update' / 'room_update' / 'game_update' / 'readyStateUpdate' ...
         - 如果 target_sid 不为空，则只发给该SID
+        - relayed=True 表示客户端转发的内容：不参与队列合并，未知类型走 'message' 事件，
+          不会冒充(或替换掉)服务端的状态快照
         """
         if room_id not in self.active_connections:
             logger.warning(f"No active connections for room {room_id}")
             return
 
-        msg_type = message.get('type')
-        if msg_type == 'lobby_update':
-            event_name = 'lobby_update'
-        elif msg_type == 'room_update':
-            event_name = 'room_update'
-        elif msg_type == 'readyStateUpdate':
-            event_name = 'readyStateUpdate'
-        elif msg_type == 'game_update':
-            event_name = 'game_update'
+        if not isinstance(message, EncodedPayload):
+            # 编码一次，所有接收者共用
+            message = encode_message(message)
+        msg_type = message.type
+        if msg_type in KNOWN_EVENTS:
+            event_name = msg_type
+        elif relayed:
+            event_name = 'message'
         else:
             event_name = 'game_update'
             logger.warning(f"[send_message] Unknown message type: {msg_type}, falling back to game_update")
 
+        # 状态类消息在每个 sid 的发送队列里只保留最新一条
+        if relayed or event_name not in COLLAPSIBLE_EVENTS:
+            key = None
+        elif event_name == 'game_update' and not message.collapsible:
+            key = None
+        else:
+            key = (event_name, room_id)
+
+        metrics.payload_bytes.labels(event_name).observe(len(message))
+        metrics.broadcast_recipients.labels(event_name).observe(
+            1 if target_sid else len(self.active_connections[room_id]))
+        started = time.perf_counter()
+
+        # 只入队，不等待网络发送；见 outbound_queue.py
         if target_sid:
             # 仅发给目标SID
-            try:
-                await self.sio.emit(event_name, message, room=f'game_{room_id}', to=target_sid)
+            self.outbound.send(target_sid, event_name, message, key)
+            if logger.isEnabledFor(logging.DEBUG):
                 username = self.user_mapping.get(target_sid, f"guest-{target_sid[:6]}")
-                logger.info(f"Message sent to user {username} in {room_id}, event={event_name}")
-                if event_name == 'game_update':
-                    logger.info(f"[send_message] game_update sent to {username}")
-            except Exception as e:
-                logger.error(f"Error sending message to {target_sid} in {room_id}: {e}")
-                self.disconnect(room_id, target_sid)
+                logger.debug("Message queued for user %s in %s, event=%s", username, room_id, event_name)
         else:
             # 广播给房间内所有sid
-            user_list = [
-                self.user_mapping.get(s, f"guest-{s[:6]}")
-                for s in self.active_connections[room_id]
-            ]
-            logger.info(f"Broadcasting to room {room_id}, active users: {', '.join(user_list)} with event {event_name}")
-            if event_name == 'game_update':
-                logger.info(f"[send_message] Broadcasting game_update to users: {', '.join(user_list)}")
-            try:
-                await self.sio.emit(event_name, message, room=f'game_{room_id}')
-                logger.info(f"[send_message] Broadcast to room game_{room_id} complete")
-            except Exception as e:
-                logger.error(f"Error broadcasting to room {room_id}: {e}")
+            if logger.isEnabledFor(logging.DEBUG):
+                user_list = [
+                    self.user_mapping.get(s, f"guest-{s[:6]}")
+                    for s in self.active_connections[room_id]
+                ]
+                logger.debug("Broadcasting to room %s, active users: %s with event %s", room_id, ', '.join(user_list), event_name)
+            self.outbound.broadcast(self.active_connections[room_id], event_name, message, key)
+
+        metrics.broadcast_seconds.labels(event_name).observe(time.perf_counter() - started)
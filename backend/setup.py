@@ -14,6 +14,7 @@ setup(
         "sqlalchemy",
         "pydantic",
         "python-dotenv",
+        "numpy",
     ],
-    python_requires=">=3.8",
+    python_requires=">=3.10",
 )
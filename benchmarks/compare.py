@@ -0,0 +1,46 @@
+# benchmarks/compare.py
+
+"""
+对比两次 engine_bench 的 JSON 结果:
+
+    python -m benchmarks.compare base.json new.json
+"""
+
+import argparse
+import json
+
+
+def _rows(base, new):
+    for size, benches in new["sizes"].items():
+        old_benches = base["sizes"].get(size, {})
+        for name, result in benches.items():
+            if not isinstance(result, dict) or "per_unit_us" not in result:
+                continue
+            old = old_benches.get(name) or {}
+            before = old.get("per_unit_us")
+            after = result["per_unit_us"]
+            change = (after / before - 1) * 100 if before else None
+            yield size, name, before, after, change
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Compare two engine_bench JSON files")
+    parser.add_argument("base")
+    parser.add_argument("new")
+    args = parser.parse_args(argv)
+
+    with open(args.base) as f:
+        base = json.load(f)
+    with open(args.new) as f:
+        new = json.load(f)
+
+    print(f"base={base['meta'].get('commit')}  new={new['meta'].get('commit')}  (median us per unit)")
+    print(f"{'size':>4}  {'benchmark':<24}{'base':>12}{'new':>12}{'change':>10}")
+    for size, name, before, after, change in _rows(base, new):
+        before_s = f"{before:.2f}" if before is not None else "-"
+        change_s = f"{change:+.1f}%" if change is not None else "-"
+        print(f"{size:>4}  {name:<24}{before_s:>12}{after:>12.2f}{change_s:>10}")
+
+
+if __name__ == "__main__":
+    main()
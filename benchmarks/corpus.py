@@ -0,0 +1,98 @@
+# benchmarks/corpus.py
+
+"""
+基准测试用的棋谱语料:
+  - generate_game(): 用固定随机种子通过 GoGame 自我对弈生成合法棋谱(可复现)
+  - load_sgf_dir(): 读取目录下真实对局的 .sgf 文件
+  - to_sgf(): 把落子序列写成 SGF 文本，用于测 _init_from_sgf
+"""
+
+import os
+import random
+from typing import List, Tuple
+
+from backend.services.geometry import get_geometry
+from backend.services.go_game import GoGame
+
+Move = Tuple[str, int, int]  # (color, x, y)
+
+# 基准测试里的对局不应因为真实时间流逝而超时
+BENCH_MAIN_TIME = 10 ** 9
+
+SGF_COORDS = "abcdefghijklmnopqrstuvwxyz"
+
+
+def new_game(board_size: int) -> GoGame:
+    return GoGame(board_size=board_size, main_time=BENCH_MAIN_TIME)
+
+
+def _is_own_eye(game: GoGame, x: int, y: int, color: str) -> bool:
+    for nx, ny in game.geometry.adjacent[x][y]:
+        if game.board[nx][ny] != color:
+            return False
+    return True
+
+
+def generate_game(board_size: int, seed: int, max_moves: int = None) -> List[Move]:
+    """
+    随机但合法的对局：不填自己的眼，非法(自杀/打劫)就换一个点，
+    没有可下的点或达到 max_moves 时结束。同一 seed 结果完全一致。
+    """
+    rng = random.Random(seed)
+    max_moves = max_moves or board_size * board_size
+    game = new_game(board_size)
+    moves = []
+    while len(moves) < max_moves:
+        color = game.current_player
+        empties = [
+            (x, y)
+            for x in range(board_size)
+            for y in range(board_size)
+            if game.board[x][y] is None and not _is_own_eye(game, x, y, color)
+        ]
+        rng.shuffle(empties)
+        for x, y in empties:
+            ok, _ = game.play_move(x, y)
+            if ok:
+                moves.append((color, x, y))
+                break
+        else:
+            break
+    return moves
+
+
+def generated_corpus(board_size: int, games: int, seed: int = 0) -> List[List[Move]]:
+    return [generate_game(board_size, seed * 1000 + i) for i in range(games)]
+
+
+def to_sgf(board_size: int, moves: List[Move]) -> str:
+    """x=0 在底行, SGF row=0 在顶行 => row=(board_size-1 - x), col=y (与 export_sgf 一致)"""
+    geometry = get_geometry(board_size)
+    nodes = []
+    for color, x, y in moves:
+        row, col = geometry.to_sgf(x, y)
+        c = "B" if color == "black" else "W"
+        nodes.append(f";{c}[{SGF_COORDS[col]}{SGF_COORDS[row]}]")
+    return f"(;GM[1]FF[4]SZ[{board_size}]KM[6.5]" + "".join(nodes) + ")"
+
+
+def load_sgf_dir(path: str) -> List[Tuple[int, List[Move], str]]:
+    """读取目录下的 .sgf 文件，返回 [(board_size, moves, sgf_text), ...]；需要 sgfmill"""
+    from sgfmill import sgf
+
+    games = []
+    for name in sorted(os.listdir(path)):
+        if not name.lower().endswith(".sgf"):
+            continue
+        with open(os.path.join(path, name), "rb") as f:
+            content = f.read()
+        sgf_game = sgf.Sgf_game.from_bytes(content)
+        size = sgf_game.get_size()
+        geometry = get_geometry(size)
+        moves = []
+        for node in sgf_game.get_main_sequence():
+            color, move = node.get_move()
+            if color and move:
+                moves.append(("black" if color == "b" else "white", *geometry.from_sgf(*move)))
+        games.append((size, moves, content.decode("utf-8", errors="replace")))
+    return games
@@ -0,0 +1,280 @@
+# benchmarks/engine_bench.py
+
+"""
+GoGame / scoring 微基准测试。
+
+    python -m benchmarks.engine_bench --out bench.json
+    python -m benchmarks.engine_bench --sgf-dir path/to/sgfs --sizes 19
+    python -m benchmarks.compare old.json new.json
+
+所有结果输出为 JSON，包含 git commit，便于跨提交对比。
+"""
+
+import argparse
+import json
+import logging
+import platform
+import statistics
+import subprocess
+import sys
+import time
+
+from backend.services.go_game import GoGame
+from backend.services.scoring import final_scoring
+from benchmarks.corpus import (
+    BENCH_MAIN_TIME, generate_game, generated_corpus, load_sgf_dir, new_game, to_sgf,
+)
+
+
+def _summary(samples, unit_count=1):
+    """samples 为每轮耗时(秒)；unit_count 为每轮处理的单位数(步数/调用次数)"""
+    best = min(samples)
+    median = statistics.median(samples)
+    return {
+        "rounds": len(samples),
+        "best_s": best,
+        "median_s": median,
+        "units_per_round": unit_count,
+        "per_unit_us": median / unit_count * 1e6 if unit_count else None,
+        "units_per_sec": unit_count / median if median > 0 else None,
+    }
+
+
+def _replay(board_size, moves):
+    game = new_game(board_size)
+    for color, x, y in moves:
+        game.current_player = color
+        game.play_move(x, y)
+    return game
+
+
+def bench_play_move(games, repeat):
+    """整局重放：每轮把语料里所有对局从空棋盘通过 play_move 下一遍"""
+    total_moves = sum(len(moves) for _, moves in games)
+    samples = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        for board_size, moves in games:
+            _replay(board_size, moves)
+        samples.append(time.perf_counter() - started)
+    return _summary(samples, total_moves)
+
+
+def bench_is_valid_move(board_size, seed, repeat, fill=0.85):
+    """拥挤棋盘(约 fill 比例的交叉点有子)上，对所有空点各调用一次 is_valid_move"""
+    moves = generate_game(board_size, seed, max_moves=int(board_size * board_size * fill))
+    game = _replay(board_size, moves)
+    empties = [
+        (x, y) for x in range(board_size) for y in range(board_size) if game.board[x][y] is None
+    ]
+    samples = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        for color in ("black", "white"):
+            for x, y in empties:
+                game.is_valid_move(x, y, color)
+        samples.append(time.perf_counter() - started)
+    result = _summary(samples, len(empties) * 2)
+    result["stones"] = sum(1 for row in game.board for cell in row if cell)
+    return result
+
+
+def bench_legal_moves(games, repeat):
+    """整局重放，每步之后取一次当前执棋方的合法着点位图(含落子本身的耗时)"""
+    total_moves = sum(len(moves) for _, moves in games)
+    samples = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        for board_size, moves in games:
+            game = new_game(board_size)
+            for color, x, y in moves:
+                game.current_player = color
+                game.play_move(x, y)
+                game.legal_moves()
+        samples.append(time.perf_counter() - started)
+    return _summary(samples, total_moves)
+
+
+def bench_batch_playouts(board_size, seed, repeat, count=512):
+    """批量引擎：从空棋盘同时跑 count 盘随机 playout，单位为一盘 playout"""
+    try:
+        from backend.services.batch_engine import BatchGo
+    except ImportError:
+        return {"skipped": "numpy not installed"}
+    samples = []
+    moves = 0
+    for i in range(repeat):
+        engine = BatchGo(board_size, count, seed=seed + i)
+        started = time.perf_counter()
+        engine.playout()
+        samples.append(time.perf_counter() - started)
+        moves = float(engine.moves.mean())
+    result = _summary(samples, count)
+    result["avg_moves"] = moves
+    return result
+
+
+def _ko_setup(game):
+    """
+    在上边摆一个劫:
+        . B W .
+        B W . W
+        . B W .
+    黑提 (1,2)，白不能立即提回 (1,1)
+    """
+    for x, y in ((0, 1), (1, 0), (2, 1)):
+        game.board[x][y] = "black"
+    for x, y in ((0, 2), (1, 3), (2, 2), (1, 1)):
+        game.board[x][y] = "white"
+    game.history.append(game.get_board_hash())
+    game.refresh_legal_moves()
+
+
+def _threat_points(board_size, rows):
+    return [(x, y) for x in rows for y in range(board_size)]
+
+
+def bench_ko(board_size, repeat):
+    """
+    劫争序列：提劫 -> 对方立即提回(被判打劫) -> 找劫材 -> 应劫 -> 提回 ...
+    每个循环包含 2 次成功的提劫、2 次被拒的提回、4 步劫材/应劫。
+    """
+    if board_size < 13:
+        return {"skipped": "needs board_size >= 13"}
+    black_area = _threat_points(board_size, range(6, 9))
+    white_area = _threat_points(board_size, range(10, 13))
+    samples = []
+    cycles = 0
+    for _ in range(repeat):
+        game = new_game(board_size)
+        _ko_setup(game)
+        bi = wi = 0
+        started = time.perf_counter()
+        cycles = 0
+        while bi + 2 <= len(black_area) and wi + 2 <= len(white_area):
+            # 黑提劫
+            game.current_player = "black"
+            ok, msg = game.play_move(1, 2)
+            assert ok, msg
+            # 白立即提回 => 打劫被拒；白找劫材，黑应
+            ok, _ = game.play_move(1, 1)
+            assert not ok
+            game.play_move(*white_area[wi]); wi += 1
+            game.play_move(*black_area[bi]); bi += 1
+            # 白提回
+            ok, msg = game.play_move(1, 1)
+            assert ok, msg
+            # 黑立即提回 => 打劫被拒；黑找劫材，白应
+            ok, _ = game.play_move(1, 2)
+            assert not ok
+            game.play_move(*black_area[bi]); bi += 1
+            game.play_move(*white_area[wi]); wi += 1
+            cycles += 1
+        samples.append(time.perf_counter() - started)
+    result = _summary(samples, cycles * 8)
+    result["cycles"] = cycles
+    return result
+
+
+def bench_sgf_import(sgf_texts, repeat):
+    try:
+        import sgfmill  # noqa: F401
+    except ImportError:
+        return {"skipped": "sgfmill not installed"}
+    samples = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        for text in sgf_texts:
+            GoGame(sgf_content=text, main_time=BENCH_MAIN_TIME)
+        samples.append(time.perf_counter() - started)
+    return _summary(samples, len(sgf_texts))
+
+
+def bench_final_scoring(games, repeat):
+    finished = [_replay(board_size, moves) for board_size, moves in games]
+    samples = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        for game in finished:
+            final_scoring(game)
+            # final_scoring 会 finalize_game：重置 finalized，每轮都走同样的入队路径
+            game.game_over = False
+            game.winner = None
+            game.finalized = False
+        samples.append(time.perf_counter() - started)
+    return _summary(samples, len(finished))
+
+
+def _git_commit():
+    try:
+        return subprocess.check_output(
+            ["git", "rev-parse", "--short", "HEAD"], stderr=subprocess.DEVNULL, text=True
+        ).strip()
+    except Exception:
+        return None
+
+
+def run(sizes, games_per_size, repeat, seed, sgf_dir=None):
+    corpus = {}
+    if sgf_dir:
+        for board_size, moves, _ in load_sgf_dir(sgf_dir):
+            corpus.setdefault(board_size, []).append(moves)
+        sizes = sorted(corpus)
+    else:
+        for board_size in sizes:
+            corpus[board_size] = generated_corpus(board_size, games_per_size, seed)
+
+    results = {
+        "meta": {
+            "commit": _git_commit(),
+            "python": sys.version.split()[0],
+            "platform": platform.platform(),
+            "timestamp": int(time.time()),
+            "repeat": repeat,
+            "seed": seed,
+            "corpus": sgf_dir or "generated",
+        },
+        "sizes": {},
+    }
+    for board_size in sizes:
+        games = [(board_size, moves) for moves in corpus[board_size]]
+        sgf_texts = [to_sgf(board_size, moves) for moves in corpus[board_size]]
+        results["sizes"][str(board_size)] = {
+            "games": len(games),
+            "avg_moves": statistics.mean(len(m) for _, m in games) if games else 0,
+            "play_move": bench_play_move(games, repeat),
+            "legal_moves_replay": bench_legal_moves(games, repeat),
+            "is_valid_move_crowded": bench_is_valid_move(board_size, seed, repeat),
+            "ko_sequence": bench_ko(board_size, repeat),
+            "sgf_import": bench_sgf_import(sgf_texts, repeat),
+            "final_scoring": bench_final_scoring(games, repeat),
+            "batch_playouts": bench_batch_playouts(board_size, seed, repeat),
+        }
+    return results
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="GoGame engine microbenchmarks")
+    parser.add_argument("--sizes", type=int, nargs="+", default=[9, 13, 19])
+    parser.add_argument("--games", type=int, default=5, help="generated games per board size")
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--sgf-dir", help="replay real games from this directory instead")
+    parser.add_argument("--out", help="write JSON here instead of stdout")
+    args = parser.parse_args(argv)
+
+    # 引擎内部的日志(包括 SGF 复盘不提子产生的 "already occupied" 警告)会干扰计时
+    logging.disable(logging.WARNING)
+
+    results = run(args.sizes, args.games, args.repeat, args.seed, args.sgf_dir)
+    text = json.dumps(results, indent=2)
+    if args.out:
+        with open(args.out, "w") as f:
+            f.write(text)
+        print(f"Wrote {args.out}", file=sys.stderr)
+    else:
+        print(text)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,411 @@
+# benchmarks/load_gen.py
+
+"""
+Socket.IO 压测 / 长稳测试工具。
+
+模拟大量客户端，走与前端完全相同的流程:
+  1. create_access_token 签发 token，Socket.IO 连接并 join_lobby
+  2. 两两配对: POST /rooms 建房 -> /rooms/{id}/join -> 双方 /ready 得到 match_id
+  3. 双方 joinGame，然后轮流 move_stone，直到终局/达到步数，再开下一局
+统计 move_stone -> game_update 的延迟(p50/p99)、事件吞吐、服务端 RSS 随时间的变化。
+
+    # 自动拉起一个本地服务端(SQLite 用户库, 不需要 AWS)
+    python -m benchmarks.load_gen --spawn --clients 200 --duration 60 --out load.json
+
+    # 压一个已经在跑的服务端(需与服务端使用相同的 JWT_SECRET 和用户库)
+    USER_STORE=sqlite USER_DB_PATH=users.db python -m benchmarks.load_gen \\
+        --url http://127.0.0.1:8000 --server-pid 12345 --seed-users
+
+依赖: python-socketio[asyncio_client], aiohttp
+"""
+
+import argparse
+import asyncio
+import json
+import logging
+import os
+import random
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import timedelta
+
+import aiohttp
+import socketio
+
+logger = logging.getLogger("load_gen")
+
+ROOM_CONFIG = {
+    "eloMin": 0,
+    "eloMax": 3000,
+    "whoIsBlack": "creator",
+    "timeRule": "byoyomi",
+    "mainTime": 3600,
+    "byoYomiPeriods": 3,
+    "byoYomiTime": 30,
+    "boardSize": 19,
+    "handicap": 0,
+}
+
+
+def percentile(samples, pct):
+    if not samples:
+        return None
+    ordered = sorted(samples)
+    k = min(len(ordered) - 1, max(0, int(round(pct / 100 * (len(ordered) - 1)))))
+    return ordered[k]
+
+
+class Stats:
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.move_latencies = []
+        self.moves_sent = 0
+        self.move_errors = 0
+        self.rate_limited = 0
+        self.events_received = 0
+        self.games_started = 0
+        self.games_finished = 0
+        self.failures = {}
+        self.rss_samples = []  # [(elapsed_s, rss_mb)]
+
+    def fail(self, where: str, exc: Exception):
+        key = f"{where}: {type(exc).__name__}"
+        self.failures[key] = self.failures.get(key, 0) + 1
+
+    def report(self, clients: int) -> dict:
+        elapsed = time.perf_counter() - self.started
+        lat_ms = [v * 1000 for v in self.move_latencies]
+        return {
+            "clients": clients,
+            "elapsed_s": round(elapsed, 2),
+            "games_started": self.games_started,
+            "games_finished": self.games_finished,
+            "moves_sent": self.moves_sent,
+            "move_errors": self.move_errors,
+            "rate_limited": self.rate_limited,
+            "events_received": self.events_received,
+            "events_per_sec": round(self.events_received / elapsed, 1) if elapsed else None,
+            "moves_per_sec": round(len(lat_ms) / elapsed, 1) if elapsed else None,
+            "move_latency_ms": {
+                "count": len(lat_ms),
+                "p50": percentile(lat_ms, 50),
+                "p90": percentile(lat_ms, 90),
+                "p99": percentile(lat_ms, 99),
+                "max": max(lat_ms) if lat_ms else None,
+                "mean": statistics.mean(lat_ms) if lat_ms else None,
+            },
+            "server_rss_mb": self.rss_samples,
+            "failures": self.failures,
+        }
+
+
+class SimClient:
+    """一个模拟用户：一个 Socket.IO 连接 + 一个 HTTP 会话"""
+
+    def __init__(self, base_url: str, username: str, token: str, stats: Stats):
+        self.base_url = base_url
+        self.username = username
+        self.token = token
+        self.stats = stats
+        self.sio = socketio.AsyncClient(reconnection=False)
+        self.http = None
+        self.last_update = None
+        self.update_event = asyncio.Event()
+
+        @self.sio.on("*")
+        async def _any(event, *args):
+            self.stats.events_received += 1
+
+        @self.sio.on("game_update")
+        async def _game_update(data):
+            self.stats.events_received += 1
+            self.last_update = data
+            self.update_event.set()
+
+        @self.sio.on("rate_limited")
+        async def _rate_limited(data):
+            self.stats.events_received += 1
+            self.stats.rate_limited += 1
+            self.last_update = dict(self.last_update or {}, error="rate_limited")
+            self.update_event.set()
+
+    async def connect(self):
+        self.http = aiohttp.ClientSession(
+            base_url=self.base_url, headers={"Authorization": f"Bearer {self.token}"}
+        )
+        await self.sio.connect(self.base_url, auth={"token": self.token}, transports=["websocket"])
+        await self.sio.emit("join_lobby", {})
+
+    async def close(self):
+        try:
+            await self.sio.disconnect()
+        finally:
+            if self.http:
+                await self.http.close()
+
+    async def post(self, path: str, payload=None) -> dict:
+        async with self.http.post(f"/api/v1{path}", json=payload) as resp:
+            body = await resp.json(content_type=None)
+            if resp.status >= 400:
+                raise RuntimeError(f"POST {path} -> {resp.status}: {body}")
+            return body
+
+    async def wait_update(self, timeout: float):
+        await asyncio.wait_for(self.update_event.wait(), timeout)
+        self.update_event.clear()
+        return self.last_update
+
+    async def wait_reply(self, after_seq: int, timeout: float):
+        """
+        等待对自己这一手的回复：seq 比 after_seq 大的 game_update，或带 error 的回复。
+        之前积压的(如对手那一手的)旧 game_update 跳过，不计入落子延迟。
+        """
+        deadline = time.perf_counter() + timeout
+        while True:
+            update = await self.wait_update(max(0.0, deadline - time.perf_counter()))
+            if update.get("error") or update.get("seq", 0) > after_seq:
+                return update
+
+    async def delete(self, path: str) -> dict:
+        async with self.http.delete(f"/api/v1{path}") as resp:
+            body = await resp.json(content_type=None)
+            if resp.status >= 400:
+                raise RuntimeError(f"DELETE {path} -> {resp.status}: {body}")
+            return body
+
+
+async def start_game(black: SimClient, white: SimClient):
+    room = await black.post("/rooms", ROOM_CONFIG)
+    room_id = room["room_id"]
+    await white.post(f"/rooms/{room_id}/join")
+    await black.post(f"/rooms/{room_id}/ready")
+    resp = await white.post(f"/rooms/{room_id}/ready")
+    if not resp.get("started"):
+        raise RuntimeError(f"room {room_id} did not start: {resp}")
+    return room_id, resp["match_id"]
+
+
+async def play_game(black: SimClient, white: SimClient, match_id: str, args, rng, deadline):
+    stats = black.stats
+    for client in (black, white):
+        client.update_event.clear()
+        await client.sio.emit("joinGame", {"match_id": match_id})
+        await client.wait_update(args.timeout)
+    stats.games_started += 1
+
+    state = black.last_update
+    moves = 0
+    while moves < args.moves_per_game and time.perf_counter() < deadline:
+        if state.get("game_over"):
+            break
+        mover = black if state["current_player"] == "black" else white
+        board = state["board"]
+        empties = [
+            (x, y) for x in range(len(board)) for y in range(len(board)) if board[x][y] is None
+        ]
+        if not empties:
+            break
+        x, y = rng.choice(empties)
+
+        mover.update_event.clear()
+        sent = time.perf_counter()
+        await mover.sio.emit("move_stone", {"match_id": match_id, "x": x, "y": y})
+        stats.moves_sent += 1
+        reply = await mover.wait_reply(state.get("seq", 0), args.timeout)
+        stats.move_latencies.append(time.perf_counter() - sent)
+        if reply.get("error"):
+            stats.move_errors += 1
+            # 服务端的错误回复是当前快照(seq 不变)；限流回复可能基于更旧的快照，不用它
+            if reply.get("seq", -1) >= state.get("seq", 0):
+                state = reply
+        else:
+            state = reply
+            moves += 1
+        if args.think_ms:
+            await asyncio.sleep(args.think_ms / 1000 * rng.random())
+
+    if not state.get("game_over"):
+        black.update_event.clear()
+        await black.sio.emit("resign", {"match_id": match_id, "player": "black"})
+        while not (await black.wait_update(args.timeout)).get("game_over"):
+            pass
+    stats.games_finished += 1
+
+
+async def run_pair(black: SimClient, white: SimClient, args, seed: int, deadline: float):
+    rng = random.Random(seed)
+    stats = black.stats
+    while time.perf_counter() < deadline:
+        try:
+            room_id, match_id = await start_game(black, white)
+            await play_game(black, white, match_id, args, rng, deadline)
+            # 和前端一样，终局后由房主删除房间，双方才能开下一局
+            await black.delete(f"/rooms/{room_id}")
+        except Exception as e:
+            stats.fail("game", e)
+            logger.warning(f"game loop failed: {e}")
+            await asyncio.sleep(1)
+
+
+def read_rss_mb(pid: int):
+    try:
+        with open(f"/proc/{pid}/status") as f:
+            for line in f:
+                if line.startswith("VmRSS:"):
+                    return int(line.split()[1]) / 1024
+    except OSError:
+        return None
+    return None
+
+
+async def sample_rss(pid: int, stats: Stats, interval: float, stop: asyncio.Event):
+    while not stop.is_set():
+        rss = read_rss_mb(pid)
+        if rss is not None:
+            stats.rss_samples.append((round(time.perf_counter() - stats.started, 1), round(rss, 1)))
+        try:
+            await asyncio.wait_for(stop.wait(), interval)
+        except asyncio.TimeoutError:
+            pass
+
+
+async def seed_users(usernames):
+    """往 SQLite 用户库批量写入压测用户(get_current_user 需要能查到用户)"""
+    from backend.services.user_store import SQLiteUserRepository, SQLITE_USER_DB
+
+    repo = SQLiteUserRepository(os.getenv("USER_DB_PATH", SQLITE_USER_DB))
+    try:
+        await repo.put_users(
+            {"username": u, "email": f"{u}@load.test", "password": "!"} for u in usernames
+        )
+    finally:
+        repo.close()
+
+
+def spawn_server(port: int) -> subprocess.Popen:
+    env = dict(os.environ)
+    env.setdefault("LOG_LEVEL", "WARNING")
+    # 压测衡量的是吞吐，不是限流；模拟用户的落子频率远高于真人
+    env.setdefault("SOCKET_RATE_LIMITS", '{"move_stone": [1000, 1000]}')
+    return subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "backend.main:application",
+         "--host", "127.0.0.1", "--port", str(port), "--log-level", "warning"],
+        env=env,
+    )
+
+
+async def wait_for_server(base_url: str, timeout: float = 30):
+    deadline = time.perf_counter() + timeout
+    async with aiohttp.ClientSession() as session:
+        while time.perf_counter() < deadline:
+            try:
+                async with session.get(f"{base_url}/test") as resp:
+                    if resp.status == 200:
+                        return
+            except aiohttp.ClientError:
+                pass
+            await asyncio.sleep(0.2)
+    raise RuntimeError(f"server at {base_url} did not become ready")
+
+
+async def run(args) -> dict:
+    from backend.auth import create_access_token
+
+    stats = Stats()
+    prefix = f"load-{int(time.time()) % 100000}"
+    usernames = [f"{prefix}-{i}" for i in range(args.clients - args.clients % 2)]
+    if args.seed_users:
+        await seed_users(usernames)
+
+    clients = [
+        SimClient(args.url, u, create_access_token({"sub": u}, expires_delta=timedelta(hours=12)), stats)
+        for u in usernames
+    ]
+
+    # 逐步建立连接，避免瞬时连接风暴本身成为瓶颈
+    delay = args.ramp / max(1, len(clients))
+    connected = []
+    for client in clients:
+        try:
+            await client.connect()
+            connected.append(client)
+        except Exception as e:
+            stats.fail("connect", e)
+        if delay:
+            await asyncio.sleep(delay)
+    if len(connected) % 2:
+        await connected.pop().close()
+    logger.info(f"{len(connected)} clients connected")
+
+    stop = asyncio.Event()
+    rss_task = None
+    if args.server_pid:
+        rss_task = asyncio.create_task(sample_rss(args.server_pid, stats, args.rss_interval, stop))
+
+    deadline = time.perf_counter() + args.duration
+    pairs = [
+        run_pair(connected[i], connected[i + 1], args, seed=i, deadline=deadline)
+        for i in range(0, len(connected), 2)
+    ]
+    await asyncio.gather(*pairs)
+
+    stop.set()
+    if rss_task:
+        await rss_task
+    await asyncio.gather(*(c.close() for c in connected), return_exceptions=True)
+    return stats.report(len(connected))
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Socket.IO load generator for backend.main:application")
+    parser.add_argument("--url", default="http://127.0.0.1:8000")
+    parser.add_argument("--clients", type=int, default=100, help="simulated users (paired into games)")
+    parser.add_argument("--duration", type=float, default=60, help="seconds of play after ramp-up")
+    parser.add_argument("--ramp", type=float, default=10, help="seconds to spread connects over")
+    parser.add_argument("--moves-per-game", type=int, default=150)
+    parser.add_argument("--think-ms", type=float, default=200, help="max random pause between moves")
+    parser.add_argument("--timeout", type=float, default=10, help="seconds to wait for a game_update")
+    parser.add_argument("--server-pid", type=int, help="sample this process's RSS")
+    parser.add_argument("--rss-interval", type=float, default=1.0)
+    parser.add_argument("--seed-users", action="store_true", help="write load users into the SQLite user store")
+    parser.add_argument("--spawn", action="store_true", help="start a local server with a temporary user store, archive and ratings file")
+    parser.add_argument("--port", type=int, default=8765, help="port for --spawn")
+    parser.add_argument("--out", help="write JSON report here instead of stdout")
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(name)s %(message)s")
+
+    server = None
+    if args.spawn:
+        # 用户库、对局存档、等级分都写到临时目录，压测数据不混进当前目录的真实文件
+        workdir = tempfile.mkdtemp(prefix="load_gen_")
+        os.environ["USER_STORE"] = "sqlite"
+        os.environ.setdefault("USER_DB_PATH", os.path.join(workdir, "load_users.db"))
+        os.environ.setdefault("GAME_ARCHIVE_PATH", os.path.join(workdir, "game_archive.jsonl"))
+        os.environ.setdefault("RATINGS_PATH", os.path.join(workdir, "ratings.jsonl"))
+        args.url = f"http://127.0.0.1:{args.port}"
+        args.seed_users = True
+        server = spawn_server(args.port)
+        args.server_pid = server.pid
+
+    try:
+        if server:
+            asyncio.run(wait_for_server(args.url))
+        report = asyncio.run(run(args))
+    finally:
+        if server:
+            server.terminate()
+            server.wait(timeout=10)
+
+    text = json.dumps(report, indent=2)
+    if args.out:
+        with open(args.out, "w") as f:
+            f.write(text)
+    print(text)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,184 @@
+# benchmarks/memory_bench.py
+
+"""
+GoGame 内存基准：每局 200 手时一个对局对象占多少字节。
+
+  - lean：当前的 GoGame(__slots__、array 落子记录、64 位 key 的同形历史、slots 计时器)
+  - legacy：同一局按旧布局(实例 __dict__、(color, x, y) 元组列表、sha256 十六进制串历史、
+    嵌套 dict 计时器)重新组装出来的对象，用来对比
+
+state 为对局自身的字段(不含合法着点 tracker)，total 再加上 tracker；
+按大小共享的只读表(Zobrist 表、几何表)、小整数和颜色字符串不计入。
+
+    python -m benchmarks.memory_bench --games 20
+    python -m benchmarks.memory_bench --check --max-state-bytes 12000 --max-ratio 0.5
+
+--check 超出预算时以非零状态退出，可放进 CI。
+"""
+
+import argparse
+import hashlib
+import json
+import logging
+import platform
+import statistics
+import subprocess
+import sys
+import time
+from array import array
+
+from backend.services.geometry import get_geometry
+from backend.services.legal_moves import zobrist_table
+from benchmarks.corpus import generate_game, new_game
+
+MOVES_PER_GAME = 200
+
+
+class _LegacyGame:
+    """旧布局：普通类，字段在实例 __dict__ 里"""
+
+
+def _commit():
+    try:
+        return subprocess.check_output(["git", "rev-parse", "--short", "HEAD"], text=True,
+                                       stderr=subprocess.DEVNULL).strip()
+    except Exception:
+        return None
+
+
+def deep_size(obj, seen: set) -> int:
+    """obj 及其引用的全部对象的 sys.getsizeof 之和；seen 里的对象(已计过或共享的)跳过"""
+    total = 0
+    stack = [obj]
+    while stack:
+        o = stack.pop()
+        if id(o) in seen or o is None or isinstance(o, bool) or (isinstance(o, int) and -5 <= o <= 256):
+            continue
+        seen.add(id(o))
+        total += sys.getsizeof(o)
+        if isinstance(o, dict):
+            stack.extend(o.keys())
+            stack.extend(o.values())
+        elif isinstance(o, (list, tuple, set, frozenset)):
+            stack.extend(o)
+        elif isinstance(o, (str, bytes, int, float, array)):
+            continue
+        else:
+            if hasattr(o, "__dict__"):
+                stack.append(o.__dict__)
+            for cls in type(o).__mro__:
+                for name in getattr(cls, "__slots__", ()):
+                    if hasattr(o, name):
+                        stack.append(getattr(o, name))
+    return total
+
+
+def _shared(size: int) -> set:
+    """按棋盘大小共享的只读对象(Zobrist 表、几何表)，以及所有对局都引用的字符串"""
+    seen = {id("black"), id("white")}
+    geometry = get_geometry(size)
+    stack = [zobrist_table(size), geometry] + [getattr(geometry, name) for name in type(geometry).__slots__]
+    while stack:
+        o = stack.pop()
+        seen.add(id(o))
+        if isinstance(o, tuple):
+            stack.extend(o)
+    return seen
+
+
+def legacy_layout(game) -> _LegacyGame:
+    """把一局按旧布局重新组装；sha256 串与旧实现长度相同(内容不影响大小)"""
+    legacy = _LegacyGame()
+    state = {name: getattr(game, name) for name in type(game).__slots__ if hasattr(game, name)}
+    state.pop("_blob", None)
+    state["board"] = [row[:] for row in game.board]
+    state["history"] = [hashlib.sha256(key.to_bytes(8, "little")).hexdigest() for key in game.history]
+    state["move_records"] = list(game.move_records)
+    state["timers"] = {color: game.timers[color].to_dict() for color in ("black", "white")}
+    state["captured"] = dict(game.captured)
+    state["dead_stones"] = set(game.dead_stones)
+    legacy.__dict__.update(state)
+    return legacy
+
+
+def measure(board_size: int, games: int, seed: int) -> dict:
+    lean_state, lean_total, legacy_state, legacy_total, moves = [], [], [], [], []
+    for i in range(games):
+        game = new_game(board_size)
+        for color, x, y in generate_game(board_size, seed + i, max_moves=MOVES_PER_GAME):
+            game.current_player = color
+            game.play_move(x, y)
+        legacy = legacy_layout(game)
+        tracker = game._legal
+
+        # tracker 两种布局相同，单独计一次
+        tracker_bytes = deep_size(tracker, _shared(board_size))
+        lean_state.append(deep_size(game, _shared(board_size) | {id(tracker)}))
+        lean_total.append(lean_state[-1] + tracker_bytes)
+        legacy_state.append(deep_size(legacy, _shared(board_size) | {id(tracker)}))
+        legacy_total.append(legacy_state[-1] + tracker_bytes)
+        moves.append(len(game.move_records))
+
+    def summary(samples):
+        return {"median": int(statistics.median(samples)), "max": max(samples)}
+
+    lean = summary(lean_state)
+    legacy = summary(legacy_state)
+    return {
+        "games": games,
+        "avg_moves": statistics.mean(moves),
+        "lean": {"state_bytes": lean, "total_bytes": summary(lean_total)},
+        "legacy": {"state_bytes": legacy, "total_bytes": summary(legacy_total)},
+        "state_ratio": round(lean["median"] / legacy["median"], 3),
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="GoGame memory benchmark")
+    parser.add_argument("--sizes", type=int, nargs="+", default=[9, 13, 19])
+    parser.add_argument("--games", type=int, default=10, help="generated games per board size")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--check", action="store_true", help="exit non-zero when over budget")
+    parser.add_argument("--max-state-bytes", type=int, default=12000,
+                        help="budget for the lean state of one 19x19 game")
+    parser.add_argument("--max-ratio", type=float, default=0.5, help="budget for lean / legacy state bytes")
+    parser.add_argument("--out", help="write JSON here instead of stdout")
+    args = parser.parse_args(argv)
+
+    logging.disable(logging.WARNING)
+    results = {
+        "meta": {
+            "commit": _commit(),
+            "python": platform.python_version(),
+            "timestamp": int(time.time()),
+            "seed": args.seed,
+            "moves_per_game": MOVES_PER_GAME,
+        },
+        "sizes": {str(size): measure(size, args.games, args.seed) for size in args.sizes},
+    }
+
+    problems = []
+    for size, result in results["sizes"].items():
+        if result["state_ratio"] > args.max_ratio:
+            problems.append(f"{size}x{size}: lean/legacy state {result['state_ratio']} > {args.max_ratio}")
+    if "19" in results["sizes"]:
+        state = results["sizes"]["19"]["lean"]["state_bytes"]["median"]
+        if state > args.max_state_bytes:
+            problems.append(f"19x19: lean state {state} B > {args.max_state_bytes} B")
+    results["problems"] = problems
+
+    text = json.dumps(results, indent=2)
+    if args.out:
+        with open(args.out, "w") as f:
+            f.write(text)
+        print(f"Wrote {args.out}", file=sys.stderr)
+    else:
+        print(text)
+    if args.check and problems:
+        for problem in problems:
+            print(f"FAIL: {problem}", file=sys.stderr)
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
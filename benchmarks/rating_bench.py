@@ -0,0 +1,122 @@
+# benchmarks/rating_bench.py
+
+"""
+等级分基准测试：增量更新(每局 O(1)) 与 NumPy 批量重算(按评分周期)。
+
+    python -m benchmarks.rating_bench --players 100000 --games 1000000 --periods 104
+    python -m benchmarks.rating_bench --archive game_archive.jsonl
+
+生成的对局：棋手有隐藏实力，胜负按 Elo 期望随机产生；输出 JSON，
+包含吞吐量以及重算结果与隐藏实力的相关系数(检查结果是否合理)。
+"""
+
+import argparse
+import json
+import platform
+import subprocess
+import sys
+import time
+
+import numpy as np
+
+from backend.services.ratings import RatingEngine, batch_recompute, recompute_from_archive
+
+
+def _commit():
+    try:
+        return subprocess.check_output(["git", "rev-parse", "--short", "HEAD"], text=True).strip()
+    except Exception:
+        return None
+
+
+def generate_games(players: int, games: int, periods: int, seed: int):
+    rng = np.random.default_rng(seed)
+    strength = rng.normal(1500, 300, players)
+    black = rng.integers(0, players, games)
+    white = (black + rng.integers(1, players, games)) % players
+    expected = 1.0 / (1.0 + 10 ** ((strength[white] - strength[black]) / 400))
+    score = (rng.random(games) < expected).astype(np.float64)
+    period = np.sort(rng.integers(0, periods, games))
+    return strength, black, white, score, period
+
+
+def bench_batch(black, white, score, period, players, repeat):
+    samples = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        result = batch_recompute(black, white, score, period, players)
+        samples.append(time.perf_counter() - started)
+    best = min(samples)
+    return result, {
+        "rounds": repeat,
+        "best_s": best,
+        "games_per_sec": len(black) / best,
+    }
+
+
+def bench_incremental(black, white, score, limit):
+    engine = RatingEngine(period_seconds=0)
+    names = [f"p{i}" for i in range(int(max(black.max(), white.max())) + 1)]
+    count = min(limit, len(black))
+    b, w, s = black[:count].tolist(), white[:count].tolist(), score[:count].tolist()
+    started = time.perf_counter()
+    for i in range(count):
+        engine.record_game(names[b[i]], names[w[i]], s[i], 0.0)
+    elapsed = time.perf_counter() - started
+    return {
+        "games": count,
+        "elapsed_s": elapsed,
+        "per_game_us": elapsed / count * 1e6,
+        "games_per_sec": count / elapsed,
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Rating engine benchmarks")
+    parser.add_argument("--players", type=int, default=100000)
+    parser.add_argument("--games", type=int, default=1000000)
+    parser.add_argument("--periods", type=int, default=104, help="rating periods spanned by the games")
+    parser.add_argument("--incremental-games", type=int, default=200000)
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--archive", help="time recompute_from_archive on this game archive instead")
+    parser.add_argument("--out", help="write JSON here instead of stdout")
+    args = parser.parse_args(argv)
+
+    results = {
+        "meta": {
+            "commit": _commit(),
+            "python": platform.python_version(),
+            "numpy": np.__version__,
+            "timestamp": int(time.time()),
+        },
+    }
+    if args.archive:
+        started = time.perf_counter()
+        engine = recompute_from_archive(args.archive)
+        results["archive"] = {"path": args.archive, "players": len(engine.players),
+                              "elapsed_s": time.perf_counter() - started}
+    else:
+        strength, black, white, score, period = generate_games(
+            args.players, args.games, args.periods, args.seed)
+        (rating, rd, _, games), batch = bench_batch(black, white, score, period, args.players, args.repeat)
+        played = games > 0
+        batch["players"] = args.players
+        batch["games"] = args.games
+        batch["periods"] = args.periods
+        batch["strength_correlation"] = float(np.corrcoef(strength[played], rating[played])[0, 1])
+        batch["median_rd"] = float(np.median(rd[played]))
+        results["batch_recompute"] = batch
+        results["incremental"] = bench_incremental(black, white, score, args.incremental_games)
+
+    text = json.dumps(results, indent=2)
+    if args.out:
+        with open(args.out, "w") as f:
+            f.write(text)
+        print(f"Wrote {args.out}", file=sys.stderr)
+    else:
+        print(text)
+
+
+if __name__ == "__main__":
+    main()
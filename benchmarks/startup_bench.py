@@ -0,0 +1,162 @@
+# benchmarks/startup_bench.py
+
+"""
+冷启动基准测试：每一轮都在新的解释器里测量
+
+  - import：`import backend.main` 的耗时，以及导入后是否已经加载了应当延迟的重模块、
+    是否已经启动了后台线程
+  - ready：启动 uvicorn 到第一次 GET /test 返回 200 的耗时(包括解释器启动和启动事件)
+
+    python -m benchmarks.startup_bench --rounds 5
+    python -m benchmarks.startup_bench --check --import-budget-ms 800 --ready-budget-ms 1000
+
+--check 超出预算或导入时加载了延迟模块时以非零状态退出，可放进 CI。
+tests/test_startup.py 用同样的测量做单元测试(取几轮中的最小值，减少机器抖动的影响)。
+"""
+
+import argparse
+import json
+import os
+import platform
+import socket
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+import urllib.request
+
+# 导入 backend.main 时不应加载的模块(都在第一次用到或启动后的预热线程里导入)
+DEFERRED_MODULES = ("numpy", "jose", "passlib", "sgfmill", "boto3", "botocore")
+
+_IMPORT_PROBE = """
+import json, sys, threading, time
+started = time.perf_counter()
+import backend.main
+elapsed = time.perf_counter() - started
+print(json.dumps({
+    "import_ms": elapsed * 1000,
+    "loaded": [m for m in %r if m in sys.modules],
+    "threads": [t.name for t in threading.enumerate() if t is not threading.main_thread()],
+}))
+""" % (DEFERRED_MODULES,)
+
+
+def _commit():
+    try:
+        return subprocess.check_output(["git", "rev-parse", "--short", "HEAD"], text=True).strip()
+    except Exception:
+        return None
+
+
+def _env():
+    env = dict(os.environ)
+    env.setdefault("LOG_LEVEL", "WARNING")
+    env.setdefault("USER_STORE", "sqlite")
+    env.setdefault("USER_DB_PATH", os.path.join(tempfile.mkdtemp(), "startup_users.db"))
+    return env
+
+
+def _free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def measure_import(env) -> dict:
+    out = subprocess.check_output([sys.executable, "-c", _IMPORT_PROBE], env=env, text=True,
+                                  stderr=subprocess.DEVNULL)
+    return json.loads(out.strip().splitlines()[-1])
+
+
+def measure_ready(env, timeout: float = 30.0) -> float:
+    port = _free_port()
+    started = time.perf_counter()
+    server = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "backend.main:application",
+         "--host", "127.0.0.1", "--port", str(port), "--log-level", "warning"],
+        env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+    )
+    try:
+        while time.perf_counter() - started < timeout:
+            if server.poll() is not None:
+                raise RuntimeError(f"server exited with {server.returncode}")
+            try:
+                with urllib.request.urlopen(f"http://127.0.0.1:{port}/test", timeout=1) as resp:
+                    if resp.status == 200:
+                        return (time.perf_counter() - started) * 1000
+            except OSError:
+                time.sleep(0.005)
+        raise RuntimeError("server did not become ready")
+    finally:
+        server.terminate()
+        try:
+            server.wait(5)
+        except subprocess.TimeoutExpired:
+            server.kill()
+
+
+def _summary(samples) -> dict:
+    return {
+        "rounds": len(samples),
+        "min_ms": round(min(samples), 1),
+        "median_ms": round(statistics.median(samples), 1),
+        "max_ms": round(max(samples), 1),
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Cold start benchmark")
+    parser.add_argument("--rounds", type=int, default=5)
+    parser.add_argument("--skip-ready", action="store_true", help="only measure the import")
+    parser.add_argument("--check", action="store_true", help="exit non-zero when over budget")
+    parser.add_argument("--import-budget-ms", type=float, default=800)
+    parser.add_argument("--ready-budget-ms", type=float, default=1000)
+    parser.add_argument("--out", help="write JSON here instead of stdout")
+    args = parser.parse_args(argv)
+
+    env = _env()
+    # 第一轮只用来生成 .pyc，不计入结果
+    measure_import(env)
+    probes = [measure_import(env) for _ in range(args.rounds)]
+    results = {
+        "meta": {
+            "commit": _commit(),
+            "python": platform.python_version(),
+            "timestamp": int(time.time()),
+        },
+        "import": {
+            **_summary([p["import_ms"] for p in probes]),
+            "deferred_loaded": probes[-1]["loaded"],
+            "threads": probes[-1]["threads"],
+        },
+    }
+    if not args.skip_ready:
+        results["ready"] = _summary([measure_ready(env) for _ in range(args.rounds)])
+
+    problems = []
+    if results["import"]["deferred_loaded"]:
+        problems.append(f"deferred modules loaded at import: {results['import']['deferred_loaded']}")
+    if results["import"]["threads"]:
+        problems.append(f"threads started at import: {results['import']['threads']}")
+    if results["import"]["median_ms"] > args.import_budget_ms:
+        problems.append(f"import median {results['import']['median_ms']} ms > {args.import_budget_ms} ms")
+    if "ready" in results and results["ready"]["median_ms"] > args.ready_budget_ms:
+        problems.append(f"ready median {results['ready']['median_ms']} ms > {args.ready_budget_ms} ms")
+    results["problems"] = problems
+
+    text = json.dumps(results, indent=2)
+    if args.out:
+        with open(args.out, "w") as f:
+            f.write(text)
+        print(f"Wrote {args.out}", file=sys.stderr)
+    else:
+        print(text)
+    if args.check and problems:
+        for problem in problems:
+            print(f"FAIL: {problem}", file=sys.stderr)
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
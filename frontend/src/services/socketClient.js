@@ -21,6 +21,8 @@ class SocketClient {
     this.roomId = null;
     this.matchId = null;
     this.connectingPromises = new Map();
+    // matchId -> 最近一次完整的 game_update(带 seq)，重连时据此只拉取漏掉的增量
+    this.gameStates = new Map();
 
     this.lobbySocket = null;
     this.lobbyConnecting = false;
@@ -381,7 +383,7 @@ class SocketClient {
 
       const username = localStorage.getItem("username") || "unknownUser";
       console.log("[SocketClient] Joining game after connect:", matchId);
-      socket.emit("joinGame", { match_id: matchId, username });
+      socket.emit("joinGame", this.joinGamePayload(matchId, username));
 
       const connectCbs = this.eventListeners.get("connect") || [];
       connectCbs.forEach((cb) => cb());
@@ -401,23 +403,62 @@ class SocketClient {
 
     socket.on("game_update", (data) => {
       console.log("[SocketClient] Received game_update for match:", matchId);
-      const cbs = this.eventListeners.get("game_update") || [];
-      if (cbs.length === 0) {
-        console.warn("[SocketClient] No handlers registered for game_update");
+      if (data && data.board && data.seq !== undefined) {
+        this.gameStates.set(matchId, data);
+      }
+      this.emitGameUpdate(data);
+    });
+
+    // 重连补发：把漏掉的增量依次应用到本地保存的完整状态上，再按普通 game_update 交给回调
+    socket.on("game_replay", (data) => {
+      const base = this.gameStates.get(matchId);
+      if (!base || base.seq !== data.from_seq) {
+        console.warn("[SocketClient] game_replay does not match local state, requesting snapshot");
+        this.gameStates.delete(matchId);
+        socket.emit("joinGame", { match_id: matchId });
         return;
       }
-      cbs.forEach((cb, index) => {
-        try {
-          console.log(`[SocketClient] Executing callback ${index + 1} for game_update`);
-          cb(data);
-        } catch (err) {
-          console.error("[SocketClient] Error in game_update handler:", err);
-        }
+      const state = { ...base, board: base.board.map((row) => row.slice()) };
+      delete state.error;
+      data.deltas.forEach((delta) => {
+        delta.changes.forEach(([x, y, color]) => {
+          state.board[x][y] = color;
+        });
+        Object.keys(delta).forEach((key) => {
+          if (key !== "changes") state[key] = delta[key];
+        });
       });
+      state.seq = data.seq;
+      console.log(`[SocketClient] Replayed ${data.deltas.length} deltas for match ${matchId}, seq=${data.seq}`);
+      this.gameStates.set(matchId, state);
+      this.emitGameUpdate(state);
     });
     console.log("[SocketClient] Game socket listeners setup complete for match:", matchId);
   }
 
+  joinGamePayload(matchId, username) {
+    const known = this.gameStates.get(matchId);
+    return known
+      ? { match_id: matchId, username, last_seq: known.seq }
+      : { match_id: matchId, username };
+  }
+
+  emitGameUpdate(data) {
+    const cbs = this.eventListeners.get("game_update") || [];
+    if (cbs.length === 0) {
+      console.warn("[SocketClient] No handlers registered for game_update");
+      return;
+    }
+    cbs.forEach((cb, index) => {
+      try {
+        console.log(`[SocketClient] Executing callback ${index + 1} for game_update`);
+        cb(data);
+      } catch (err) {
+        console.error("[SocketClient] Error in game_update handler:", err);
+      }
+    });
+  }
+
   handleServerRestart() {
     if (this.lobbySocket) {
       this.lobbySocket.removeAllListeners();
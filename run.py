@@ -10,12 +10,10 @@ sys.path.append(str(project_root))
 if __name__ == "__main__":
     import uvicorn
     import logging
+    from backend.log_config import setup_logging
 
-    # Configure logging
-    logging.basicConfig(
-        level=logging.INFO,
-        format='%(asctime)s - %(name)s - %(levelname)s - %(message)s'
-    )
+    # Configure logging (queue-backed, see backend/log_config.py)
+    setup_logging()
     logger = logging.getLogger(__name__)
     
     # Disable auto-reload to maintain state
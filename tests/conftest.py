@@ -0,0 +1,7 @@
+# tests/conftest.py
+
+import os
+import sys
+
+# 直接运行 pytest(不经 python -m)时也能导入 backend / benchmarks
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
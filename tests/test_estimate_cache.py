@@ -0,0 +1,49 @@
+# tests/test_estimate_cache.py
+
+import asyncio
+
+import pytest
+
+from backend.services import batch_engine, compute_pool, position_cache
+from backend.services.go_game import GoGame
+from backend.services.position_cache import PositionCache
+
+
+class _InlinePool:
+    async def run(self, name, fn, *args):
+        return fn(*args)
+
+
+@pytest.fixture(autouse=True)
+def fresh_cache(monkeypatch):
+    monkeypatch.setattr(position_cache, "position_cache", PositionCache("test", 1 << 20))
+    monkeypatch.setattr(compute_pool, "get_compute_pool", lambda: _InlinePool())
+
+
+def _game():
+    game = GoGame(board_size=9)
+    game.play_move(4, 4)
+    return game
+
+
+def test_cache_hit_is_a_copy():
+    game = _game()
+    first = batch_engine.estimate_score(game, playouts=8)
+    first["black_margin"] = 999.0
+    first["ownership"][0][0] = 999.0
+
+    second = batch_engine.estimate_score(game, playouts=8)
+    assert second["black_margin"] != 999.0
+    assert second["ownership"][0][0] != 999.0
+    second["ownership"][0][0] = -999.0
+    assert batch_engine.estimate_score(game, playouts=8)["ownership"][0][0] != -999.0
+
+
+def test_async_cache_hit_is_a_copy():
+    game = _game()
+    first = asyncio.run(batch_engine.estimate_score_async(game, playouts=8))
+    first["ownership"][4][4] = 999.0
+
+    second = asyncio.run(batch_engine.estimate_score_async(game, playouts=8))
+    assert second["ownership"][4][4] != 999.0
+    assert second is not first
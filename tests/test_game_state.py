@@ -0,0 +1,66 @@
+# tests/test_game_state.py
+
+from array import array
+
+from backend.services.game_state import POINT_MASK, WHITE_BIT, GameTimers, MoveRecords, Timer
+from benchmarks.memory_bench import measure
+
+MOVES = [("black", 3, 3), ("white", 15, 15), ("black", 0, 18), ("white", 18, 0), ("black", 9, 9)]
+
+
+def test_move_records_round_trip():
+    records = MoveRecords(19)
+    for move in MOVES:
+        records.append(move)
+
+    assert len(records) == len(MOVES)
+    assert list(records) == MOVES
+    assert records[0] == MOVES[0]
+    assert records[-1] == MOVES[-1]
+    assert records.packed.typecode == "H"
+    assert records.packed[1] == WHITE_BIT | (15 * 19 + 15)
+    assert records.packed[2] & POINT_MASK == 18
+
+
+def test_move_records_slicing():
+    records = MoveRecords(19)
+    for move in MOVES:
+        records.append(move)
+
+    assert records[1:3] == MOVES[1:3]
+    assert records[::-1] == MOVES[::-1]
+    assert records[-2:] == MOVES[-2:]
+    assert records[10:] == []
+
+
+def test_move_records_share_packed_array():
+    packed = array("H", [0, WHITE_BIT | 10])
+    records = MoveRecords(9, packed)
+    assert records.packed is packed
+    assert list(records) == [("black", 0, 0), ("white", 1, 1)]
+    assert not MoveRecords(9)
+
+
+def test_timer_to_dict():
+    timer = Timer(600, 30, 3)
+    assert timer.to_dict() == {"main_time": 600, "byo_yomi": 30, "periods": 3, "last_update": None}
+    timer.main_time, timer.last_update = 0, 1234.5
+    assert timer.to_dict()["main_time"] == 0
+    assert timer.to_dict()["last_update"] == 1234.5
+
+
+def test_game_timers_by_color():
+    black, white = Timer(600, 30, 3), Timer(300, 20, 5)
+    timers = GameTimers(black, white)
+    assert timers["black"] is black
+    assert timers["white"] is white
+    assert timers["white"].to_dict()["periods"] == 5
+
+
+def test_lean_layout_smaller_than_legacy():
+    result = measure(19, games=2, seed=0)
+    lean = result["lean"]["state_bytes"]["median"]
+    legacy = result["legacy"]["state_bytes"]["median"]
+    assert lean < legacy
+    assert result["state_ratio"] <= 0.5
+    assert lean <= 12000
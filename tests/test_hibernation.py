@@ -0,0 +1,175 @@
+# tests/test_hibernation.py
+
+import random
+import threading
+
+import pytest
+
+from backend.services.game_snapshot import get_game_snapshot
+from backend.services.go_game import GoGame
+from backend.services.hibernation import hibernate_game, is_hibernated
+
+
+def _state(game):
+    return (
+        get_game_snapshot("m", game).raw,
+        [row[:] for row in game.board],
+        list(game.history),
+        list(game.move_records),
+        game.setup_moves,
+        game._legal.key,
+        set(game._legal.seen),
+        game.legal_moves(),
+        dict(game.captured),
+        set(game.dead_stones),
+        game.timers["black"].to_dict(),
+        game.timers["white"].to_dict(),
+        game.passes,
+        game.current_player,
+    )
+
+
+def _random_game(size=19, moves=200, seed=0):
+    game = GoGame(board_size=size, black_player="a", white_player="b")
+    rng = random.Random(seed)
+    tries = 0
+    while len(game.move_records) < moves and tries < 20000:
+        tries += 1
+        game.play_move(rng.randrange(size), rng.randrange(size))
+    return game
+
+
+def _round_trip(game):
+    before = _state(game)
+    assert hibernate_game(game) > 0
+    assert is_hibernated(game)
+    # 标量字段不触发恢复
+    assert game.black_player == "a"
+    assert is_hibernated(game)
+    assert _state(game) == before
+    assert not is_hibernated(game)
+
+
+def test_round_trip_plain_moves():
+    game = GoGame(board_size=9, black_player="a", white_player="b")
+    for x, y in ((2, 2), (6, 6), (2, 6), (6, 2)):
+        assert game.play_move(x, y)[0]
+    _round_trip(game)
+
+
+def test_round_trip_pass():
+    game = GoGame(board_size=9, black_player="a", white_player="b")
+    game.play_move(4, 4)
+    assert game.play_move(None, None)[0]
+    _round_trip(game)
+    assert game.passes == 1
+    assert game.current_player == "black"
+
+
+def test_round_trip_captures():
+    game = GoGame(board_size=9, black_player="a", white_player="b")
+    # 黑围住 (1, 1) 的白子并提掉
+    for black, white in (((0, 1), (1, 1)), ((1, 0), (5, 5)), ((2, 1), (5, 6))):
+        assert game.play_move(*black)[0]
+        assert game.play_move(*white)[0]
+    assert game.play_move(1, 2)[0]
+    assert game.captured["black"] == 1
+    game.dead_stones.add((5, 5))
+    game.touch()
+    _round_trip(game)
+    assert game.board[1][1] is None
+
+
+@pytest.mark.parametrize("seed", range(5))
+def test_round_trip_random_games(seed):
+    _round_trip(_random_game(size=(9, 13, 19)[seed % 3], seed=seed))
+
+
+def test_round_trip_sgf_setup():
+    pytest.importorskip("sgfmill")
+    sgf = "(;GM[1]SZ[9];B[aa];W[ba];B[ab];W[bb];B[cc])"
+    game = GoGame(board_size=9, black_player="a", white_player="b", sgf_content=sgf)
+    assert game.setup_moves == 5
+    assert game.play_move(4, 4)[0]
+    assert game.play_move(4, 5)[0]
+    _round_trip(game)
+    assert game.setup_moves == 5
+    # 恢复后可以继续下
+    assert game.play_move(3, 3)[0]
+
+
+def test_game_keeps_playing_after_round_trip():
+    game = _random_game(size=9, moves=40, seed=3)
+    twin = _random_game(size=9, moves=40, seed=3)
+    hibernate_game(game)
+    rng = random.Random(7)
+    for _ in range(50):
+        x, y = rng.randrange(9), rng.randrange(9)
+        assert game.play_move(x, y) == twin.play_move(x, y)
+    assert game.board == twin.board
+
+
+def test_concurrent_rehydrate():
+    game = _random_game(seed=11)
+    expected = ([row[:] for row in game.board], list(game.move_records),
+                game.timers["black"].to_dict(), set(game.dead_stones))
+    readers = (
+        lambda: [row[:] for row in game.board],
+        lambda: list(game.move_records),
+        lambda: game.timers["black"].to_dict(),
+        lambda: set(game.dead_stones),
+    )
+    errors = []
+    for _ in range(200):
+        hibernate_game(game)
+        barrier = threading.Barrier(len(readers))
+        results = [None] * len(readers)
+
+        def read(i):
+            barrier.wait()
+            try:
+                results[i] = readers[i]()
+            except Exception as e:  # pragma: no cover - 失败时收集起来一起报告
+                errors.append(e)
+
+        threads = [threading.Thread(target=read, args=(i,)) for i in range(len(readers))]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+        assert not errors, errors
+        assert tuple(results) == expected
+    assert not is_hibernated(game)
+
+
+def test_hibernate_while_reading():
+    game = _random_game(seed=12)
+    expected = list(game.move_records)
+    stop = threading.Event()
+    errors = []
+
+    def read():
+        while not stop.is_set():
+            try:
+                assert list(game.move_records) == expected
+                len(game.history)
+                game.board[0][0]
+            except Exception as e:
+                errors.append(e)
+                return
+
+    threads = [threading.Thread(target=read) for _ in range(4)]
+    for t in threads:
+        t.start()
+    for _ in range(200):
+        hibernate_game(game)
+    stop.set()
+    for t in threads:
+        t.join()
+    assert not errors, errors
+
+
+def test_hibernate_skips_recently_touched():
+    game = _random_game(size=9, moves=10)
+    assert hibernate_game(game, idle_before=game.touched_at - 1) == 0
+    assert not is_hibernated(game)
@@ -0,0 +1,110 @@
+# tests/test_legal_moves.py
+
+import random
+
+import pytest
+
+from backend.services.go_game import GoGame
+from backend.services.legal_moves import iter_bits
+
+OTHER = {"black": "white", "white": "black"}
+
+
+def _neighbors(size, x, y):
+    for nx, ny in ((x - 1, y), (x + 1, y), (x, y - 1), (x, y + 1)):
+        if 0 <= nx < size and 0 <= ny < size:
+            yield nx, ny
+
+
+def _chain(board, x, y):
+    """(x, y) 所在棋串的棋子集合和气数，逐点搜索"""
+    size, color = len(board), board[x][y]
+    stones, libs, todo = {(x, y)}, set(), [(x, y)]
+    while todo:
+        cx, cy = todo.pop()
+        for nx, ny in _neighbors(size, cx, cy):
+            if board[nx][ny] is None:
+                libs.add((nx, ny))
+            elif board[nx][ny] == color and (nx, ny) not in stones:
+                stones.add((nx, ny))
+                todo.append((nx, ny))
+    return stones, len(libs)
+
+
+def _board_after(board, x, y, color):
+    """落子并提子后的局面；自杀返回 None"""
+    board = [row[:] for row in board]
+    board[x][y] = color
+    for nx, ny in _neighbors(len(board), x, y):
+        if board[nx][ny] == OTHER[color]:
+            stones, libs = _chain(board, nx, ny)
+            if libs == 0:
+                for sx, sy in stones:
+                    board[sx][sy] = None
+    if _chain(board, x, y)[1] == 0:
+        return None
+    return tuple(tuple(row) for row in board)
+
+
+def _reference_legal(board, color, seen):
+    """暴力求合法着点：非占用、非自杀、不重复历史局面(全局同形)"""
+    size = len(board)
+    legal = set()
+    for x in range(size):
+        for y in range(size):
+            if board[x][y] is None:
+                after = _board_after(board, x, y, color)
+                if after is not None and after not in seen:
+                    legal.add((x, y))
+    return legal
+
+
+def _legal_points(game):
+    size = game.board_size
+    return {divmod(p, size) for p in iter_bits(game.legal_moves())}
+
+
+@pytest.mark.parametrize("seed", [1, 2, 3, 4])
+def test_random_games_match_reference(seed):
+    rng = random.Random(seed)
+    size = 5
+    game = GoGame(board_size=size)
+    seen = set()
+
+    for _ in range(150):
+        expected = _reference_legal(game.board, game.current_player, seen)
+        assert _legal_points(game) == expected
+
+        # 偶尔试一手非法着点，play_move 必须拒绝
+        illegal = [(x, y) for x in range(size) for y in range(size) if (x, y) not in expected]
+        if illegal and rng.random() < 0.3:
+            x, y = rng.choice(illegal)
+            assert not game.play_move(x, y)[0]
+
+        if not expected or (rng.random() < 0.05 and game.passes == 0):
+            ok, _ = game.play_move(None, None)
+            assert ok
+            if game.game_over:
+                break
+            continue
+        x, y = rng.choice(sorted(expected))
+        ok, message = game.play_move(x, y)
+        assert ok, message
+        seen.add(tuple(tuple(row) for row in game.board))
+
+
+def test_ko_recapture_forbidden_until_move_elsewhere():
+    game = GoGame(board_size=9)
+    for x, y in [(0, 1), (0, 2), (1, 0), (1, 1), (2, 1), (2, 2), (8, 8), (1, 3), (1, 2)]:
+        assert game.play_move(x, y)[0]
+    assert game.board[1][1] is None
+
+    # 白立即提回会重现上一手之前的局面
+    assert (1, 1) not in _legal_points(game)
+    assert game.play_move(1, 1) == (False, "Ko detected")
+
+    assert game.play_move(8, 0)[0]
+    assert game.play_move(8, 1)[0]
+    assert (1, 1) in _legal_points(game)
+    assert game.play_move(1, 1)[0]
+    assert game.board[1][2] is None
@@ -0,0 +1,75 @@
+# tests/test_life_death.py
+
+from backend.services.legal_moves import LegalMoveTracker
+from backend.services.life_death import chain_status, resolve_dead_stones
+
+SIZE = 9
+
+# 左上角的黑棋被白棋围住；X 黑 O 白，其余为空
+TWO_EYES = [
+    ".X.XO",
+    "XXXXO",
+    "OOOOO",
+]
+ONE_EYE = [
+    "XX.XO",
+    "XXXXO",
+    "OOOOO",
+]
+STRAIGHT_THREE = [
+    "...XO",
+    "XXXXO",
+    "OOOOO",
+]
+
+
+def _tracker(rows):
+    board = [[None] * SIZE for _ in range(SIZE)]
+    for x, row in enumerate(rows):
+        for y, ch in enumerate(row):
+            board[x][y] = {"X": "black", "O": "white"}.get(ch)
+    tracker = LegalMoveTracker(SIZE)
+    tracker.load_board(board)
+    return tracker
+
+
+def _black_stones(tracker):
+    return [p for p in range(SIZE * SIZE) if tracker.color[p] == 1]
+
+
+def test_two_eyes_alive():
+    tracker = _tracker(TWO_EYES)
+    assert chain_status(tracker, 1 * SIZE + 0) == "alive"
+
+    black = _black_stones(tracker)
+    result = resolve_dead_stones(tracker, black[:1])
+    assert sorted(result["alive"]) == black
+    assert result["dead"] == []
+
+
+def test_one_eye_dead():
+    tracker = _tracker(ONE_EYE)
+    assert chain_status(tracker, 0) == "dead"
+
+    black = _black_stones(tracker)
+    result = resolve_dead_stones(tracker, black[:1])
+    assert sorted(result["dead"]) == black
+    assert result["unknown"] == []
+
+
+def test_straight_three_in_corner_depends_on_who_moves():
+    tracker = _tracker(STRAIGHT_THREE)
+    assert chain_status(tracker, 1 * SIZE + 0) is None
+
+    black = _black_stones(tracker)
+    result = resolve_dead_stones(tracker, black[:1])
+    assert sorted(result["unknown"]) == black
+    assert result["dead"] == [] and result["alive"] == []
+
+
+def test_unmarked_dead_chain_is_only_suggested():
+    tracker = _tracker(ONE_EYE)
+    result = resolve_dead_stones(tracker, [])
+    assert result["dead"] == [] and result["alive"] == []
+    assert sorted(result["suggested"]) == _black_stones(tracker)
+    assert "elapsed" not in result
@@ -0,0 +1,78 @@
+# tests/test_match_service.py
+
+import asyncio
+import threading
+import time
+from datetime import datetime
+
+import pytest
+
+from backend.services import match_service
+from backend.services.go_game import GoGame
+
+
+@pytest.fixture
+def match(monkeypatch):
+    game = GoGame(board_size=9, black_player="alice", white_player="bob")
+    game.match_id = "m1"
+    monkeypatch.setitem(match_service.matches, "m1", {"game": game, "last_activity": datetime.now()})
+    return game
+
+
+def test_abandoned_scoring_phase_is_scored(match):
+    match.play_move(2, 2)
+    match.play_move(None, None)
+    match.play_move(None, None)
+    assert match.game_over and not match.finalized
+
+    assert match_service.settle_abandoned_scoring(time.time()) == 0
+    settled = match_service.settle_abandoned_scoring(time.time() + match_service.SCORING_TIMEOUT + 1)
+    assert settled == 1
+    assert match.finalized
+    assert match.winner == "Black by scoring"
+
+
+def test_expired_unfinished_game_is_finalized(match):
+    match.play_move(2, 2)
+    match_service.settle_game(match)
+    assert match.game_over and match.finalized
+    assert match.winner is None
+
+
+def test_delete_match_removes_match_and_cancels_bot(match, monkeypatch):
+    from backend.services import bot_player
+
+    async def scenario():
+        manager = bot_player.BotManager(on_move=None)
+        monkeypatch.setattr(bot_player, "bot_manager", manager)
+        manager._loop = asyncio.get_running_loop()
+        task = asyncio.ensure_future(asyncio.sleep(60))
+        manager._thinking["m1"] = task
+
+        # 清理线程里调用：转交给事件循环
+        await asyncio.to_thread(match_service.delete_match, "m1")
+        await asyncio.sleep(0)
+        assert "m1" not in manager._thinking
+        await asyncio.sleep(0)
+        return task.cancelled()
+
+    assert asyncio.run(scenario())
+    assert "m1" not in match_service.matches
+    assert not match_service.delete_match("m1")
+
+
+def test_settle_from_cleanup_thread_runs_in_loop(match, monkeypatch):
+    match.play_move(2, 2)
+
+    async def scenario():
+        monkeypatch.setattr(match_service, "_loop", asyncio.get_running_loop())
+        # join 期间事件循环被阻塞：清理线程里只是排进事件循环，还没有动对局
+        cleanup = threading.Thread(target=match_service.settle_game, args=(match,))
+        cleanup.start()
+        cleanup.join()
+        finalized_before_loop = match.finalized
+        await asyncio.sleep(0)
+        return finalized_before_loop
+
+    assert asyncio.run(scenario()) is False
+    assert match.game_over and match.finalized
@@ -0,0 +1,46 @@
+# tests/test_matchmaking.py
+
+import asyncio
+
+from backend.services.matchmaking import Matchmaker
+
+KEY = (19, 600, 30, 3)
+
+
+def test_failed_pair_is_requeued_and_others_still_paired():
+    paired = []
+
+    async def on_paired(a, b):
+        if "alice" in (a.username, b.username):
+            raise RuntimeError("create_match failed")
+        paired.append({a.username, b.username})
+
+    matchmaker = Matchmaker(on_paired)
+    alice = matchmaker.join("alice", 1500, KEY)
+    matchmaker.join("bob", 1510, KEY)
+    matchmaker.join("carol", 2000, KEY)
+    matchmaker.join("dave", 2005, KEY)
+
+    asyncio.run(matchmaker.run_tick(now=alice.joined_at))
+    assert paired == [{"carol", "dave"}]
+    assert matchmaker.status("alice")["status"] == "waiting"
+    assert matchmaker.status("bob")["status"] == "waiting"
+    assert matchmaker.tickets["alice"] is alice
+    assert "carol" not in matchmaker.tickets
+
+
+def test_requeue_skips_users_who_moved_on():
+    async def on_paired(a, b):
+        pass
+
+    matchmaker = Matchmaker(on_paired)
+    old = matchmaker.join("alice", 1500, KEY)
+    matchmaker.leave("alice")
+    new = matchmaker.join("alice", 1500, (9, 300, 30, 3))
+    matchmaker.requeue(old)
+    assert matchmaker.tickets["alice"] is new
+
+    matchmaker.leave("alice")
+    matchmaker.record_result("alice", {"match_id": "m1"})
+    matchmaker.requeue(old)
+    assert "alice" not in matchmaker.tickets
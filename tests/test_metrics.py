@@ -0,0 +1,59 @@
+# tests/test_metrics.py
+
+import threading
+
+from backend.services.metrics import MetricsRegistry
+
+THREADS = 8
+PER_THREAD = 5000
+
+
+def _hammer(fn):
+    barrier = threading.Barrier(THREADS)
+
+    def worker():
+        barrier.wait()
+        for _ in range(PER_THREAD):
+            fn()
+
+    threads = [threading.Thread(target=worker) for _ in range(THREADS)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+
+
+def test_concurrent_updates_are_not_lost():
+    registry = MetricsRegistry()
+    counter = registry.counter("c_total", "test", ["event"])
+    histogram = registry.histogram("h_seconds", "test", buckets=(0.5, 1.0))
+
+    def update():
+        counter.labels("move").inc()
+        histogram.observe(0.25)
+
+    _hammer(update)
+    total = THREADS * PER_THREAD
+    assert counter.labels("move").value == total
+    assert histogram.count == total and histogram.counts[0] == total
+    assert len(counter._children) == 1
+
+
+def test_render_while_updating():
+    registry = MetricsRegistry()
+    counter = registry.counter("c_total", "test", ["event"])
+    errors = []
+
+    def render():
+        try:
+            registry.render()
+        except Exception as e:  # 迭代期间字典被修改等
+            errors.append(e)
+
+    reader = threading.Thread(target=lambda: [render() for _ in range(200)])
+    reader.start()
+    _hammer(lambda: counter.labels(threading.get_ident() % 1000).inc())
+    reader.join()
+    assert errors == []
+    text = registry.render()
+    assert "# TYPE c_total counter" in text
@@ -0,0 +1,35 @@
+# tests/test_password_hasher.py
+
+import asyncio
+
+import pytest
+
+from backend.services import password_hasher as hasher_module
+from backend.services.password_hasher import PasswordHasher, close_password_hasher
+
+
+class _BrokenContext:
+    def hash(self, password):
+        return "hashed:" + password
+
+    def verify(self, password, hashed):
+        raise ValueError("hash could not be identified")
+
+
+def test_failed_verify_is_counted():
+    hasher = PasswordHasher(_BrokenContext(), workers=1)
+    try:
+        assert asyncio.run(hasher.hash("pw")) == "hashed:pw"
+        with pytest.raises(ValueError):
+            asyncio.run(hasher.verify("pw", "garbage"))
+        stats = hasher.stats()
+        assert stats["completed"] == 2
+        assert stats["pending"] == 0
+    finally:
+        hasher.close()
+
+
+def test_close_does_not_create_instance(monkeypatch):
+    monkeypatch.setattr(hasher_module, "password_hasher", None)
+    close_password_hasher()
+    assert hasher_module.password_hasher is None
@@ -0,0 +1,47 @@
+# tests/test_rate_limiter.py
+
+from backend.services import outbound_queue, rate_limiter
+from backend.services.rate_limiter import RateLimiter, notify_rejected
+
+
+def test_bucket_limits_and_forget():
+    limiter = RateLimiter({"move_stone": (0.001, 2)})
+    limiter.register("sid-a", "alice")
+    assert limiter.allow("sid-a", "move_stone")
+    assert limiter.allow("sid-a", "move_stone")
+    assert not limiter.allow("sid-a", "move_stone")
+    assert limiter.allow("sid-b", "move_stone")
+
+    limiter.forget("sid-a")
+    assert "sid-a" not in limiter._sid_buckets
+    assert "sid-b" in limiter._sid_buckets
+    # 用户桶按用户保留，换一个 sid 不能绕过限额
+    limiter.register("sid-c", "alice")
+    limiter.allow("sid-c", "move_stone")
+    limiter.allow("sid-c", "move_stone")
+    assert not limiter.allow("sid-c", "move_stone")
+
+
+def test_prune_drops_idle_buckets():
+    limiter = RateLimiter()
+    limiter.allow("sid-a", "move_stone")
+    limiter._prune(now=limiter._sid_buckets["sid-a"]["move_stone"].updated + rate_limiter.BUCKET_IDLE_SECONDS + 1)
+    assert limiter._sid_buckets == {}
+
+
+class _Recorder:
+    def __init__(self):
+        self.sent = []
+
+    def send(self, sid, event, data, key=None):
+        self.sent.append((sid, event, data))
+
+
+def test_notify_rejected_with_zero_rate(monkeypatch):
+    recorder = _Recorder()
+    monkeypatch.setattr(outbound_queue, "outbound", recorder)
+    monkeypatch.setattr(rate_limiter, "rate_limiter", RateLimiter({"resign": (0, 1)}))
+    notify_rejected("sid-a", "resign")
+    notify_rejected("sid-a", "move_stone")
+    assert recorder.sent[0] == ("sid-a", "rate_limited", {"event": "resign", "retry_after": None})
+    assert recorder.sent[1][2]["retry_after"] == 0.25
@@ -0,0 +1,61 @@
+# tests/test_ratings.py
+
+import asyncio
+import json
+
+import pytest
+
+from backend.services import ratings
+from backend.services.finalization import FinishedGame
+from backend.services.go_game import GoGame
+
+
+def _finished(match_id, black="alice", white="bob", moves=1):
+    game = GoGame(board_size=9)
+    game.black_player, game.white_player = black, white
+    for i in range(moves):
+        game.play_move(i, 0)
+    game.winner = "black wins by resignation"
+    return FinishedGame(match_id, game, 1_000_000.0)
+
+
+@pytest.fixture
+def engine(monkeypatch, tmp_path):
+    monkeypatch.setattr(ratings, "rating_engine", ratings.RatingEngine())
+    monkeypatch.setattr(ratings, "RATINGS_PATH", str(tmp_path / "ratings.jsonl"))
+    return ratings.rating_engine
+
+
+def test_retry_after_write_failure_rates_once(engine, monkeypatch):
+    batch = [_finished("m1")]
+    real_append = ratings._append_lines
+    calls = []
+
+    def flaky_append(path, lines):
+        calls.append(lines)
+        if len(calls) == 1:
+            raise OSError("disk full")
+        real_append(path, lines)
+
+    monkeypatch.setattr(ratings, "_append_lines", flaky_append)
+    with pytest.raises(OSError):
+        asyncio.run(ratings.rate_games(batch))
+    after_first = engine.get("alice").to_list()
+
+    asyncio.run(ratings.rate_games(batch))
+    assert engine.get("alice").to_list() == after_first
+    assert engine.get("alice").games == 1
+    assert calls[0] == calls[1]
+
+
+def test_recompute_skips_games_without_moves(engine, tmp_path):
+    archive = tmp_path / "archive.jsonl"
+    records = [_finished("m1").to_record(), _finished("m2", moves=0).to_record()]
+    archive.write_text("".join(json.dumps(r) + "\n" for r in records))
+
+    recomputed = ratings.recompute_from_archive(str(archive))
+    assert recomputed.get("alice").games == 1
+
+    asyncio.run(ratings.rate_games([_finished("m1"), _finished("m2", moves=0)]))
+    assert engine.get("alice").games == 1
+    assert round(engine.get("alice").rating, 6) == round(recomputed.get("alice").rating, 6)
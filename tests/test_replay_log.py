@@ -0,0 +1,80 @@
+# tests/test_replay_log.py
+
+import json
+
+from backend.services.go_game import GoGame
+from backend.services.hibernation import hibernate_game, is_hibernated
+from backend.services.replay_log import ReplayLog, get_replay_log, publish_game_update, resync_message
+
+MOVES = [(2, 2), (6, 6), (2, 6), (6, 2), (4, 4)]
+
+
+def _played(moves=MOVES):
+    game = GoGame(board_size=9, black_player="a", white_player="b")
+    for x, y in moves:
+        assert game.play_move(x, y)[0]
+        publish_game_update("m1", game)
+    return game
+
+
+def _message(payload):
+    return json.loads(payload.raw)
+
+
+def test_since_returns_only_missing_events():
+    game = _played()
+    log = get_replay_log(game)
+    assert log.seq == len(MOVES)
+
+    deltas = log.since(2)
+    assert [d["seq"] for d in deltas] == [3, 4, 5]
+    assert deltas[0]["changes"] == [[2, 6, "black"]]
+    assert log.since(log.seq) == []
+    assert log.since(log.seq + 1) is None
+    assert log.since(-1) is None
+
+    message = _message(resync_message("m1", game, 2))
+    assert message["type"] == "game_replay"
+    assert (message["from_seq"], message["seq"]) == (2, 5)
+    assert message["deltas"] == deltas
+
+
+def test_gap_falls_back_to_snapshot():
+    game = GoGame(board_size=9)
+    game._replay = ReplayLog(game, size=2)
+    for x, y in MOVES:
+        game.play_move(x, y)
+        publish_game_update("m1", game)
+
+    log = get_replay_log(game)
+    assert log.since(2) is None
+    assert [d["seq"] for d in log.since(3)] == [4, 5]
+
+    message = _message(resync_message("m1", game, 2))
+    assert message["type"] == "game_update"
+    assert message["seq"] == 5
+    assert message["board"] == game.board
+
+
+def test_resync_after_rehydrate_keeps_seq():
+    game = _played()
+    assert hibernate_game(game) > 0
+    assert is_hibernated(game)
+
+    # 恢复后 seq 保留，但增量缓冲是空的
+    log = get_replay_log(game)
+    assert log.seq == len(MOVES)
+    assert len(log.events) == 0
+
+    caught_up = _message(resync_message("m1", game, log.seq))
+    assert caught_up["type"] == "game_replay"
+    assert caught_up["deltas"] == []
+
+    behind = _message(resync_message("m1", game, log.seq - 1))
+    assert behind["type"] == "game_update"
+    assert behind["seq"] == log.seq
+
+    # 恢复之后的新事件照常从 seq + 1 开始记录
+    game.play_move(0, 0)
+    publish_game_update("m1", game)
+    assert [d["seq"] for d in get_replay_log(game).since(len(MOVES))] == [len(MOVES) + 1]
@@ -0,0 +1,87 @@
+# tests/test_room_reaper.py
+
+import asyncio
+import json
+
+from backend.routers import rooms as rooms_router
+from backend.services import outbound_queue, websocket_manager
+from backend.services.room_reaper import ROOM_TTL_ABANDONED, ROOM_TTL_FINISHED, ROOM_TTL_WAITING, RoomReaper
+
+
+def _room(players, started=False, match_id=None):
+    return {
+        "players": list(players), "ready": {}, "started": started, "match_id": match_id,
+        "timer": 1000.0, "eloMin": 0, "eloMax": 3000, "timeRule": "byoyomi", "mainTime": 600,
+        "byoYomiPeriods": 3, "byoYomiTime": 30, "whoIsBlack": "random",
+    }
+
+
+def _reaper(rooms):
+    async def on_removed(removed):
+        pass
+    return RoomReaper(rooms, on_removed)
+
+
+def test_finished_room_kept_while_player_online():
+    rooms = {"r1": _room(["alice"], match_id="m1")}
+    reaper = _reaper(rooms)
+    reaper.user_online("alice")
+    reaper._touched["r1"] = 1000.0
+
+    assert reaper.deadline("r1", rooms["r1"]) == 1000.0 + ROOM_TTL_WAITING
+    reaper._schedule("r1")
+    assert reaper.reap(now=1000.0 + ROOM_TTL_FINISHED + 1) == {}
+    assert "r1" in rooms
+
+
+def test_finished_room_reaped_after_players_leave():
+    rooms = {"r1": _room(["alice"], match_id="m1")}
+    reaper = _reaper(rooms)
+    reaper._touched["r1"] = 1000.0
+    reaper._offline_since["alice"] = 1100.0
+
+    assert reaper.deadline("r1", rooms["r1"]) == min(1100.0 + ROOM_TTL_ABANDONED, 1000.0 + ROOM_TTL_FINISHED)
+    reaper._schedule("r1")
+    removed = reaper.reap(now=1000.0 + ROOM_TTL_FINISHED)
+    assert list(removed) == ["r1"] and removed["r1"]["deleting"]
+    assert "r1" not in rooms
+
+
+class _Recorder:
+    def __init__(self):
+        self.sent = []
+
+    def broadcast(self, sids, event, data, key=None):
+        self.sent.append((list(sids), event, json.loads(data.raw)))
+
+
+class _Manager:
+    def __init__(self, connections):
+        self.active_connections = connections
+
+
+def test_reaped_room_members_get_deleting_update(monkeypatch):
+    recorder = _Recorder()
+    manager = _Manager({"r1": ["sid-a"], "lobby": []})
+    monkeypatch.setattr(outbound_queue, "outbound", recorder)
+    monkeypatch.setattr(websocket_manager, "room_manager", manager)
+
+    room = _room(["alice"], match_id="m1")
+    room["deleting"] = True
+    asyncio.run(rooms_router.on_rooms_reaped({"r1": room}))
+
+    sids, event, message = recorder.sent[0]
+    assert (sids, event) == (["sid-a"], "room_update")
+    assert message["data"]["deleting"] is True
+    assert "r1" not in manager.active_connections
+
+
+def test_user_offline_reports_last_connection():
+    reaper = _reaper({})
+    reaper.user_online("alice")
+    reaper.user_online("alice")
+    assert reaper.is_online("alice")
+    assert reaper.user_offline("alice") is False
+    assert reaper.is_online("alice")
+    assert reaper.user_offline("alice") is True
+    assert not reaper.is_online("alice")
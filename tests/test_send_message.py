@@ -0,0 +1,62 @@
+# tests/test_send_message.py
+
+import asyncio
+
+import pytest
+import socketio
+
+from backend.services.go_game import GoGame
+from backend.services.replay_log import publish_game_update
+from backend.services.websocket_manager import SocketIOManager
+
+
+class _Recorder:
+    def __init__(self):
+        self.sent = []
+
+    def send(self, sid, event, data, key=None):
+        self.sent.append((sid, event, data, key))
+
+    def broadcast(self, sids, event, data, key=None):
+        for sid in sids:
+            self.send(sid, event, data, key)
+
+
+@pytest.fixture
+def manager():
+    manager = SocketIOManager(socketio.AsyncServer(async_mode="asgi"))
+    manager.outbound = _Recorder()
+    manager.active_connections["m1"] = ["sid-a"]
+    return manager
+
+
+def _send(manager, message, **kwargs):
+    asyncio.run(manager.send_message("m1", message, **kwargs))
+    return manager.outbound.sent[-1]
+
+
+def test_snapshot_collapses(manager):
+    game = GoGame(board_size=9)
+    _, event, _, key = _send(manager, publish_game_update("m1", game))
+    assert event == "game_update"
+    assert key == ("game_update", "m1")
+
+
+def test_scoring_update_is_not_collapsed(manager):
+    game = GoGame(board_size=9)
+    update = publish_game_update("m1", game, scoring_data={"dead_stones": []})
+    _, event, _, key = _send(manager, update)
+    assert event == "game_update"
+    assert key is None
+
+
+def test_relayed_messages_are_not_collapsed(manager):
+    _, event, _, key = _send(manager, {"type": "game_update", "match_id": "m1", "action": "pass"}, relayed=True)
+    assert (event, key) == ("game_update", None)
+
+    _, event, _, key = _send(manager, {"type": "chat", "match_id": "m1"}, relayed=True)
+    assert (event, key) == ("message", None)
+
+    # 不经过快照构造的 game_update 也不合并
+    _, event, _, key = _send(manager, {"type": "game_update", "match_id": "m1"})
+    assert key is None
@@ -0,0 +1,76 @@
+# tests/test_socket_dispatch.py
+
+import asyncio
+
+import pytest
+
+from backend.models import MoveEvent
+from backend.services import socket_dispatch
+from backend.services.go_game import GoGame
+from backend.services.rate_limiter import RateLimiter
+from backend.services.socket_dispatch import SocketDispatcher
+
+
+class _FakeSio:
+    def __init__(self):
+        self.handlers = {}
+
+    def on(self, event, handler):
+        self.handlers[event] = handler
+
+    async def get_session(self, sid):
+        raise KeyError(sid)
+
+
+@pytest.fixture
+def setup(monkeypatch):
+    game = GoGame(board_size=9, black_player="alice", white_player="bob")
+    limiter = RateLimiter({"move_stone": (0.001, 3)})
+    rejected = []
+    monkeypatch.setattr(socket_dispatch, "get_rate_limiter", lambda: limiter)
+    monkeypatch.setattr(socket_dispatch, "notify_rejected", lambda sid, event: rejected.append((sid, event)))
+    monkeypatch.setattr(socket_dispatch, "get_match", lambda match_id: game if match_id == "m1" else None)
+
+    sio = _FakeSio()
+    dispatcher = SocketDispatcher(sio)
+    calls = []
+
+    @dispatcher.event(schema=MoveEvent, match="player")
+    async def move_stone(req):
+        calls.append((req.username, req.data.x, req.data.y, req.colors))
+
+    return sio.handlers["move_stone"], dispatcher, calls, rejected
+
+
+def test_invalid_payload_never_reaches_handler(setup):
+    handler, dispatcher, calls, rejected = setup
+    dispatcher.open_session("sid-a", "alice")
+    asyncio.run(handler("sid-a", {"match_id": "m1", "x": "not a number", "y": 3}))
+    asyncio.run(handler("sid-a", None))
+    assert calls == []
+
+    asyncio.run(handler("sid-a", {"match_id": "m1", "x": 3, "y": 3}))
+    assert calls == [("alice", 3, 3, ("black",))]
+    assert rejected == []
+
+
+def test_non_player_is_rejected(setup):
+    handler, dispatcher, calls, rejected = setup
+    dispatcher.open_session("sid-c", "carol")
+    asyncio.run(handler("sid-c", {"match_id": "m1", "x": 3, "y": 3}))
+    assert calls == []
+    assert dispatcher.sessions["sid-c"].matches["m1"][1] == ()
+
+    # 对局不存在时同样不进 handler
+    dispatcher.open_session("sid-a", "alice")
+    asyncio.run(handler("sid-a", {"match_id": "missing", "x": 3, "y": 3}))
+    assert calls == []
+
+
+def test_rate_limited_event_notifies_client(setup):
+    handler, dispatcher, calls, rejected = setup
+    dispatcher.open_session("sid-a", "alice")
+    for _ in range(4):
+        asyncio.run(handler("sid-a", {"match_id": "m1", "x": 3, "y": 3}))
+    assert len(calls) == 3
+    assert rejected == [("sid-a", "move_stone")]
@@ -0,0 +1,40 @@
+# tests/test_spectator_hub.py
+
+import asyncio
+
+import socketio
+
+from backend.services.finalization import FinishedGame
+from backend.services.go_game import GoGame
+from backend.services.spectator_hub import SpectatorHub
+
+
+def _hub(match_id, game):
+    hub = SpectatorHub(socketio.AsyncServer(async_mode="asgi"))
+    hub.counts[match_id] = 1
+    hub._baseline[match_id] = hub._state_of(game)
+    return hub
+
+
+def test_timeout_reaches_spectators():
+    game = GoGame(board_size=9)
+    hub = _hub("m1", game)
+
+    # 超时判负不经过落子路径，由终局流水线的阶段通知
+    game.timers["black"].main_time = 0
+    game.timers["black"].byo_yomi = 1
+    game.timers["black"].periods = 1
+    game.timers["black"].last_update = 1.0
+    game.update_timers()
+    assert game.game_over
+
+    asyncio.run(hub.on_games_finished([FinishedGame("m1", game, 0.0)]))
+    delta = hub._build_delta("m1", hub._dirty.pop("m1"))
+    assert delta["game_over"] is True
+    assert delta["winner"] == "white wins by timeout"
+
+
+def test_finished_game_without_spectators_is_ignored():
+    hub = SpectatorHub(socketio.AsyncServer(async_mode="asgi"))
+    asyncio.run(hub.on_games_finished([FinishedGame("m2", GoGame(board_size=9), 0.0)]))
+    assert hub._dirty == {}
@@ -0,0 +1,24 @@
+# tests/test_startup.py
+
+import os
+
+from benchmarks.startup_bench import _env, measure_import, measure_ready
+
+ROUNDS = 3
+# 取几轮中的最小值：机器抖动只会让某一轮变慢，真正的回归会让每一轮都变慢
+IMPORT_BUDGET_MS = float(os.getenv("STARTUP_IMPORT_BUDGET_MS", "800"))
+READY_BUDGET_MS = float(os.getenv("STARTUP_READY_BUDGET_MS", "1000"))
+
+
+def test_import_is_lazy_and_within_budget():
+    env = _env()
+    measure_import(env)  # 生成 .pyc
+    probes = [measure_import(env) for _ in range(ROUNDS)]
+    assert probes[-1]["loaded"] == []
+    assert probes[-1]["threads"] == []
+    assert min(p["import_ms"] for p in probes) < IMPORT_BUDGET_MS
+
+
+def test_server_ready_within_budget():
+    env = _env()
+    assert min(measure_ready(env) for _ in range(ROUNDS)) < READY_BUDGET_MS
@@ -0,0 +1,71 @@
+# tests/test_user_store.py
+
+import asyncio
+import sqlite3
+
+import pytest
+
+from backend.services import user_store
+from backend.services.user_store import DynamoUserRepository, SQLiteUserRepository, UserRepository
+
+
+def _user(name):
+    return {"username": name, "email": f"{name}@example.com", "password": "hash"}
+
+
+def test_repository_interface_is_abstract():
+    with pytest.raises(TypeError):
+        UserRepository()
+
+
+def test_sqlite_round_trip_and_close(tmp_path):
+    repo = SQLiteUserRepository(str(tmp_path / "users.db"), pool_size=2)
+
+    async def scenario():
+        assert await repo.create_user(_user("alice"))
+        assert not await repo.create_user(_user("alice"))
+        assert await repo.put_users([_user(f"u{i}") for i in range(100)]) == 100
+        assert (await repo.get_user("alice"))["email"] == "alice@example.com"
+        found = await repo.get_users(["alice", "u5", "u99", "nobody", "alice"])
+        assert sorted(found) == ["alice", "u5", "u99"]
+        assert await repo.get_users([]) == {}
+
+    asyncio.run(scenario())
+    connections = list(repo._connections)
+    assert connections
+    repo.close()
+    assert repo._connections == []
+    for conn in connections:
+        with pytest.raises(sqlite3.ProgrammingError):
+            conn.execute("SELECT 1")
+
+
+class _ThrottledResource:
+    """第一次只返回一半的 key，其余放进 UnprocessedKeys"""
+
+    def __init__(self, table):
+        self.table = table
+        self.calls = 0
+
+    def batch_get_item(self, RequestItems):
+        self.calls += 1
+        keys = RequestItems[self.table]["Keys"]
+        done, rest = (keys[: len(keys) // 2], keys[len(keys) // 2:]) if self.calls == 1 else (keys, [])
+        response = {"Responses": {self.table: [dict(k, email="e", password="p") for k in done]}}
+        if rest:
+            response["UnprocessedKeys"] = {self.table: {"Keys": rest}}
+        return response
+
+
+def test_dynamo_batch_get_retries_unprocessed_keys_with_backoff(monkeypatch):
+    sleeps = []
+    monkeypatch.setattr(user_store.time, "sleep", sleeps.append)
+    repo = DynamoUserRepository(table_name="users", pool_size=1)
+    resource = _ThrottledResource("users")
+    monkeypatch.setattr(repo, "_connection", lambda: resource)
+
+    found = repo._get_users([f"u{i}" for i in range(10)])
+    assert sorted(found) == sorted(f"u{i}" for i in range(10))
+    assert resource.calls == 2
+    assert len(sleeps) == 1 and 0 < sleeps[0] <= user_store.DYNAMODB_BACKOFF_BASE
+    repo.close()